@@ -0,0 +1,157 @@
+"""Тренды по трекерам зависимостей: суммы по неделям и месяцам, скользящее среднее,
+серии дней, сравнение с предыдущим периодом и график PNG.
+
+История за HISTORY_DAYS дней разворачивается в плотный ряд "значение за каждый день"
+(телефон — часы, сладкое и плохие слова — число записей), дальше всё считается
+над массивами NumPy. matplotlib необязателен (requirements-charts.txt): без него
+отчёт отправляется текстом без графика.
+"""
+import datetime
+import io
+
+import numpy as np
+
+try:
+    from matplotlib.figure import Figure
+except ImportError:
+    Figure = None
+
+HISTORY_DAYS = 365
+MOVING_WINDOW = 7
+CHART_DAYS = 90
+CHART_WEEKS = 26
+
+# Вид -> (название, единица, что считается хорошим днём)
+TRACKERS = {
+    "phone": ("Телефон", "ч", "не больше среднего"),
+    "sweets": ("Сладкое", "шт.", "без сладкого"),
+    "badwords": ("Плохие слова", "шт.", "без плохих слов"),
+}
+
+
+def charts_available() -> bool:
+    return Figure is not None
+
+
+# ---------------------- Расчёт ----------------------
+def dense_series(rows, start: datetime.date, days: int):
+    """[("YYYY-MM-DD", значение)] → массив значений за каждый из days дней начиная со start."""
+    values = np.zeros(days)
+    if rows:
+        dates, amounts = zip(*rows)
+        index = (np.array(dates, dtype="datetime64[D]") - np.datetime64(start, "D")).astype(np.int64)
+        np.add.at(values, index, np.asarray(amounts, dtype=float))
+    return values
+
+
+def _runs(good) -> tuple:
+    """(текущая серия в конце ряда, самая длинная серия) для массива bool."""
+    edges = np.diff(np.concatenate(([0], good.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if not len(starts):
+        return 0, 0
+    lengths = ends - starts
+    current = int(lengths[-1]) if ends[-1] == len(good) else 0
+    return current, int(lengths.max())
+
+
+def _delta(values, length: int) -> tuple:
+    """Сумма за последние length дней, за length дней до них и изменение в процентах."""
+    current = float(values[-length:].sum())
+    previous = float(values[-2 * length:-length].sum())
+    percent = (current - previous) / previous * 100 if previous else None
+    return current, previous, percent
+
+
+def compute(kind: str, values, start: datetime.date) -> dict:
+    """Показатели по плотному ряду values (последний элемент — сегодня)."""
+    days = len(values)
+    dates = np.datetime64(start, "D") + np.arange(days)
+    # Недели с понедельника: ряд дополняется нулями до начала первой недели и конца последней
+    lead = start.weekday()
+    padded = np.concatenate((np.zeros(lead), values, np.zeros(-(days + lead) % 7)))
+    weekly = padded.reshape(-1, 7).sum(axis=1)
+    week_starts = [start - datetime.timedelta(days=lead) + datetime.timedelta(weeks=i)
+                   for i in range(len(weekly))]
+    months = dates.astype("datetime64[M]")
+    bounds = np.flatnonzero(np.concatenate(([True], months[1:] != months[:-1])))
+    monthly = np.add.reduceat(values, bounds)
+    month_starts = [str(month) for month in months[bounds]]
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    moving = (cumulative[MOVING_WINDOW:] - cumulative[:-MOVING_WINDOW]) / MOVING_WINDOW
+    recorded = values[values > 0]
+    mean = float(recorded.mean()) if len(recorded) else 0.0
+    good = values <= mean if kind == "phone" else values == 0
+    current_streak, longest_streak = _runs(good)
+    return {
+        "kind": kind,
+        "start": start,
+        "total": float(values.sum()),
+        "active_days": len(recorded),
+        "mean": mean,
+        "weekly": list(zip(week_starts, weekly.tolist())),
+        "monthly": list(zip(month_starts, monthly.tolist())),
+        "moving": moving.tolist(),
+        "current_streak": current_streak,
+        "longest_streak": longest_streak,
+        "week_delta": _delta(values, 7),
+        "month_delta": _delta(values, 30),
+    }
+
+
+# ---------------------- Вывод ----------------------
+def _format_delta(label: str, delta: tuple, unit: str) -> str:
+    current, previous, percent = delta
+    change = f"{percent:+.0f}%" if percent is not None else "нет данных для сравнения"
+    return f"{label}: {current:g} {unit} (было {previous:g}, {change})"
+
+
+def summary(trends: dict) -> str:
+    """Текстовая сводка; укладывается в подпись к фото (1024 символа)."""
+    title, unit, good = TRACKERS[trends["kind"]]
+    lines = [f"{title}: тренды за {HISTORY_DAYS} дней"]
+    if not trends["active_days"]:
+        lines.append("Записей пока нет.")
+        return "\n".join(lines)
+    lines += [
+        f"Всего: {trends['total']:g} {unit}, дней с записями: {trends['active_days']}",
+        f"В среднем за день с записями: {trends['mean']:.1f} {unit}",
+        f"Среднее за {MOVING_WINDOW} дней: {trends['moving'][-1]:.1f} {unit}/день",
+        _format_delta("Последние 7 дней", trends["week_delta"], unit),
+        _format_delta("Последние 30 дней", trends["month_delta"], unit),
+        f"Серия дней «{good}»: сейчас {trends['current_streak']}, рекорд {trends['longest_streak']}",
+        "По месяцам: " + ", ".join(f"{month[5:7]}.{month[2:4]} — {value:g}"
+                                   for month, value in trends["monthly"][-6:]),
+    ]
+    return "\n".join(lines)
+
+
+def render_chart(trends: dict, values) -> bytes:
+    """PNG: значения по дням со скользящим средним и суммы по неделям. Нужен matplotlib;
+    использует объектный API без pyplot, поэтому безопасен в рабочем потоке."""
+    title, unit, _ = TRACKERS[trends["kind"]]
+    figure = Figure(figsize=(8, 6), dpi=100)
+    daily_axes, weekly_axes = figure.subplots(2, 1)
+    shown = min(CHART_DAYS, len(values))
+    days = np.arange(len(values) - shown, len(values))
+    dates = np.datetime64(trends["start"], "D") + days
+    daily_axes.bar(dates, values[-shown:], color="#9ecae1", label="за день")
+    moving = np.asarray(trends["moving"])
+    offset = MOVING_WINDOW - 1
+    visible = days >= offset
+    daily_axes.plot(dates[visible], moving[days[visible] - offset], color="#08519c",
+                    label=f"среднее за {MOVING_WINDOW} дн.")
+    daily_axes.set_title(f"{title}: последние {shown} дней")
+    daily_axes.set_ylabel(unit)
+    daily_axes.legend(loc="upper left")
+    weeks = trends["weekly"][-CHART_WEEKS:]
+    weekly_axes.bar([np.datetime64(week, "D") for week, _ in weeks], [value for _, value in weeks],
+                    width=5, color="#fdae6b")
+    weekly_axes.set_title("По неделям")
+    weekly_axes.set_ylabel(unit)
+    for axes in (daily_axes, weekly_axes):
+        axes.tick_params(axis="x", labelrotation=30)
+    figure.tight_layout()
+    output = io.BytesIO()
+    figure.savefig(output, format="png")
+    return output.getvalue()
@@ -0,0 +1,155 @@
+"""Пакетный ввод: одно сообщение — много записей.
+
+    Понедельник: Зарядка, работа      расписание; строки без дня продолжают
+    2026-10-20: Врач                  текст предыдущего дня
+    2026-10-12 3.5                    телефон; без даты — за сегодня
+    вчера шоколадка                   сладкое и плохие слова; без даты — за сегодня
+
+Каждая строка разбирается в формат storage.bulk_insert, всё сообщение записывается
+одной транзакцией.
+"""
+import datetime
+import re
+
+from transfer import WEEKDAYS
+
+# Названия видов в команде /batch
+KIND_ALIASES = {
+    "schedule": "schedule", "расписание": "schedule",
+    "events": "events", "события": "events",
+    "questions": "questions", "вопросы": "questions",
+    "phone": "phone", "телефон": "phone",
+    "sweets": "sweets", "сладкое": "sweets",
+    "badwords": "badwords", "слова": "badwords",
+}
+KIND_TITLES = {"schedule": "расписание", "events": "события", "questions": "вопросы",
+               "phone": "телефон", "sweets": "сладкое", "badwords": "плохие слова"}
+
+WEEKDAY_BY_LOWER = {day.lower(): day for day in WEEKDAYS}
+RELATIVE_DAYS = {"сегодня": 0, "вчера": 1, "позавчера": 2}
+
+# Дата в начале строки и необязательный разделитель после неё
+DATE_PREFIX = re.compile(r"^(\d{4}-\d{2}-\d{2}|сегодня|вчера|позавчера)(?:\s*[:—–-]\s*|\s+|$)", re.IGNORECASE)
+DAY_PREFIX = re.compile(r"^([А-Яа-яЁё]+|\d{4}-\d{2}-\d{2})\s*[:—–-]\s*(.*)$")
+HOURS = re.compile(r"^(\d+(?:[.,]\d+)?)\s*(?:ч|час|часа|часов)?\.?$", re.IGNORECASE)
+
+
+class EntryError(ValueError):
+    pass
+
+
+def split_date(line: str, today: datetime.date) -> tuple:
+    """Отделяет дату в начале строки: (дата или None, остаток строки)."""
+    match = DATE_PREFIX.match(line)
+    if match is None:
+        return None, line
+    token = match.group(1).lower()
+    if token in RELATIVE_DAYS:
+        date = today - datetime.timedelta(days=RELATIVE_DAYS[token])
+    else:
+        try:
+            date = datetime.date.fromisoformat(token)
+        except ValueError:
+            raise EntryError(f"неверная дата {token}")
+    return date, line[match.end():].strip()
+
+
+def looks_like_batch(text: str, today: datetime.date) -> bool:
+    """Несколько строк или дата в начале — сообщение из диалога ввода разбирается как пакет."""
+    if "\n" in text.strip():
+        return True
+    try:
+        return split_date(text.strip(), today)[0] is not None
+    except EntryError:
+        return True
+
+
+def parse_hours(text: str) -> float:
+    """Часы телефона: неотрицательное конечное число, "3.5", "3,5" или "2 ч"."""
+    match = HOURS.match(text.strip())
+    if match is None:
+        raise EntryError(f"ожидается число часов, получено «{text.strip()}»")
+    return float(match.group(1).replace(",", "."))
+
+
+def parse_schedule(lines, today):
+    entries = {}
+    day = None
+    for number, line in lines:
+        match = DAY_PREFIX.match(line)
+        key = match and (WEEKDAY_BY_LOWER.get(match.group(1).lower()) or match.group(1))
+        if match and (key in WEEKDAYS or re.fullmatch(r"\d{4}-\d{2}-\d{2}", key)):
+            if key not in WEEKDAYS:
+                try:
+                    key = datetime.date.fromisoformat(key).isoformat()
+                except ValueError:
+                    yield number, EntryError(f"неверная дата {key}")
+                    day = None
+                    continue
+            day = key
+            entries[day] = [match.group(2).strip()] if match.group(2).strip() else []
+        elif day is not None:
+            entries[day].append(line)
+        else:
+            yield number, EntryError("не указан день (например, «Понедельник: …»)")
+    for day, parts in entries.items():
+        if parts:
+            yield None, (day, "\n".join(parts))
+        else:
+            yield None, EntryError(f"пустое расписание для {day}")
+
+
+def parse_line(kind: str, line: str, today: datetime.date) -> tuple:
+    if kind == "questions":
+        return (line,)
+    date, rest = split_date(line, today)
+    if kind == "events":
+        if date is None:
+            raise EntryError("нужна дата в начале строки (YYYY-MM-DD)")
+        if not rest:
+            raise EntryError("пустое описание")
+        return date.isoformat(), rest
+    date = date or today
+    if kind == "phone":
+        return date.isoformat(), parse_hours(rest)
+    if not rest:
+        raise EntryError("пустая запись")
+    return date.isoformat(), rest
+
+
+def parse_batch(kind: str, text: str, today: datetime.date) -> tuple:
+    """Разбирает сообщение: ([строки для bulk_insert], [(номер строки, ошибка)])."""
+    lines = [(number, line.strip()) for number, line in enumerate(text.splitlines(), 1) if line.strip()]
+    rows, errors = [], []
+    if kind == "schedule":
+        for number, result in parse_schedule(lines, today):
+            if isinstance(result, EntryError):
+                errors.append((number, str(result)))
+            else:
+                rows.append(result)
+        return rows, errors
+    for number, line in lines:
+        try:
+            rows.append(parse_line(kind, line, today))
+        except EntryError as exc:
+            errors.append((number, str(exc)))
+    return rows, errors
+
+
+def summarize(kind: str, rows: list, errors: list, max_errors: int = 5) -> str:
+    """Текст единственного ответа на пакет (без разметки)."""
+    if not rows:
+        lines = ["Ничего не записано."]
+    elif kind == "schedule":
+        lines = [f"Расписание установлено: {', '.join(day for day, _ in rows)}."]
+    elif kind == "phone":
+        dates = sorted(date for date, _ in rows)
+        span = dates[0] if dates[0] == dates[-1] else f"{dates[0]} — {dates[-1]}"
+        lines = [f"Записано часов телефона: {len(rows)} (за {span}, всего {sum(h for _, h in rows):g} ч)."]
+    else:
+        lines = [f"Записано ({KIND_TITLES[kind]}): {len(rows)}."]
+    if errors:
+        lines.append(f"Пропущено строк: {len(errors)}")
+        lines.extend(f"строка {number}: {message}" if number else message
+                     for number, message in errors[:max_errors])
+    return "\n".join(lines)
@@ -0,0 +1,335 @@
+"""Замер производительности бота без Telegram.
+
+Настоящие обработчики из bot.py получают синтетические обновления и отвечают
+локальному имитатору Bot API (fake_api.py). Каждый сценарий запускается в отдельном
+процессе, чтобы пиковая память не смешивалась между сценариями. Печатаются
+обновлений в секунду, p50/p99 задержки (от постановки в очередь до конца обработки
+и время самих обработчиков) и пиковая память; строки дописываются в bench_output.txt
+вместе с коммитом, чтобы сравнивать результаты между изменениями.
+
+    python bench.py                                # все сценарии, хранилище в памяти
+    python bench.py --db sqlite --scenario reports --scale 2
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+OUTPUT_FILE = "bench_output.txt"
+WEEKDAYS = ("Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье")
+
+
+# ---------------------- Синтетические обновления ----------------------
+class UpdateFactory:
+    def __init__(self):
+        self.update_id = 0
+
+    def _next(self) -> int:
+        self.update_id += 1
+        return self.update_id
+
+    @staticmethod
+    def _user(chat_id: int) -> dict:
+        return {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+
+    def message(self, chat_id: int, text: str) -> dict:
+        update_id = self._next()
+        message = {"message_id": update_id, "date": 0, "chat": {"id": chat_id, "type": "private"},
+                   "from": self._user(chat_id), "text": text}
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": update_id, "message": message}
+
+    def press(self, chat_id: int, data: str, message_id: int = 1) -> dict:
+        update_id = self._next()
+        message = {"message_id": message_id, "date": 0, "chat": {"id": chat_id, "type": "private"},
+                   "from": {"id": 1, "is_bot": True, "first_name": "Bench"}, "text": "…"}
+        return {"update_id": update_id, "callback_query": {
+            "id": str(update_id), "chat_instance": str(chat_id), "from": self._user(chat_id),
+            "data": data, "message": message}}
+
+
+def interleave(sessions: list) -> list:
+    """Чередует обновления разных чатов: сначала первые шаги всех чатов, затем вторые и т.д."""
+    result = []
+    for step in range(max(map(len, sessions), default=0)):
+        result.extend(session[step] for session in sessions if step < len(session))
+    return result
+
+
+# ---------------------- Сценарии ----------------------
+# Сценарий получает хранилище (для наполнения историей), фабрику обновлений и масштаб
+# и возвращает список обновлений в порядке поступления.
+MENU_PATH = ("menu:schedule", "sched:day:Понедельник", "menu:schedule", "menu:main", "menu:events",
+             "menu:main", "menu:questions", "menu:main", "menu:dependencies", "menu:dep_phone",
+             "menu:dependencies", "menu:dep_sweets", "menu:dependencies", "menu:main")
+
+
+async def scenario_menu(storage, factory: UpdateFactory, scale: float) -> list:
+    """Навигация по меню: /start и нажатия кнопок в 50 чатах."""
+    sessions = []
+    for chat_id in range(1, int(50 * scale) + 1):
+        session = [factory.message(chat_id, "/start")]
+        session.extend(factory.press(chat_id, MENU_PATH[i % len(MENU_PATH)]) for i in range(40))
+        sessions.append(session)
+    return interleave(sessions)
+
+
+async def scenario_phone_burst(storage, factory: UpdateFactory, scale: float) -> list:
+    """Серии ввода часов телефона (dep_phone_input_received) в 20 чатах."""
+    sessions = []
+    for chat_id in range(1, int(20 * scale) + 1):
+        session = []
+        for i in range(100):
+            session.append(factory.press(chat_id, "phone:add"))
+            session.append(factory.message(chat_id, f"{1 + i % 7}.5"))
+        sessions.append(session)
+    return interleave(sessions)
+
+
+async def scenario_reports(storage, factory: UpdateFactory, scale: float) -> list:
+    """Отчёты по большой истории: 5 чатов, в каждом тысячи событий, вопросов и записей
+    зависимостей за два года; листание страниц и запись, сбрасывающая кэш отчёта."""
+    today = datetime.date.today()
+    size = int(2000 * scale)
+    sessions = []
+    for chat_id in range(1, 6):
+        event_ids = []
+        for i in range(size):
+            event_ids.append(await storage.add_event(
+                chat_id, today + datetime.timedelta(days=i % 365), f"Событие {i}"))
+            await storage.add_question(chat_id, f"Вопрос номер {i}?")
+            day = today - datetime.timedelta(days=i % 730)
+            await storage.add_phone_usage(chat_id, day, 1 + i % 5)
+            await storage.add_sweets_entry(chat_id, day, f"конфета {i % 40}")
+            await storage.add_bad_word(chat_id, day, f"слово{i % 25}")
+        session = []
+        for round_ in range(20):
+            cursor = event_ids[(round_ * 10) % len(event_ids)]
+            session.append(factory.press(chat_id, f"events:view:{cursor}"))
+            session.append(factory.press(chat_id, "ques:view"))
+            session.append(factory.press(chat_id, "phone:view"))
+            session.append(factory.press(chat_id, "sweets:view"))
+            session.append(factory.press(chat_id, "badwords:view"))
+            session.append(factory.press(chat_id, "phone:add"))
+            session.append(factory.message(chat_id, "0.5"))
+        sessions.append(session)
+    if hasattr(storage, "flush"):
+        await storage.flush()
+    return interleave(sessions)
+
+
+async def scenario_concurrent(storage, factory: UpdateFactory, scale: float) -> list:
+    """Много одновременных чатов: 1000 коротких сессий вперемешку."""
+    sessions = []
+    for chat_id in range(1, int(1000 * scale) + 1):
+        day = WEEKDAYS[chat_id % 7]
+        sessions.append([
+            factory.message(chat_id, "/start"),
+            factory.press(chat_id, "menu:dependencies"),
+            factory.press(chat_id, "menu:dep_phone"),
+            factory.press(chat_id, "phone:add"),
+            factory.message(chat_id, "1.5"),
+            factory.press(chat_id, "phone:view"),
+            factory.press(chat_id, "menu:schedule"),
+            factory.press(chat_id, f"sched:day:{day}"),
+            factory.press(chat_id, f"sched:add:{day}"),
+            factory.message(chat_id, "Зарядка, работа, спорт"),
+        ])
+    return interleave(sessions)
+
+
+SCENARIOS = {
+    "menu": scenario_menu,
+    "phone_burst": scenario_phone_burst,
+    "reports": scenario_reports,
+    "concurrent": scenario_concurrent,
+}
+
+
+# ---------------------- Прогон одного сценария ----------------------
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run_scenario(name: str, args) -> dict:
+    import bot
+    from config import parse_config
+    from fake_api import FakeBotAPI
+    from storage import create_storage
+    from telegram import Update
+
+    logging.getLogger().setLevel(logging.WARNING)
+    api = FakeBotAPI(latency=args.api_latency)
+    await api.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = "memory" if args.db == "memory" else os.path.join(tmp, "bench.db")
+        config = parse_config(["--token", "1:bench", "--db", db_path, "--api-base-url", api.base_url,
+                               "--global-rate", "0", "--concurrency", str(args.concurrency)])
+        bot.use_storage(create_storage(config.db_path))
+        app = bot.build_application(config)
+
+        errors = []
+
+        async def on_error(update, context) -> None:
+            errors.append(repr(context.error))
+        app.add_error_handler(on_error)
+
+        await app.initialize()
+        await app.post_init(app)
+        raw = await SCENARIOS[name](bot.storage, UpdateFactory(), args.scale)
+        updates = [Update.de_json(item, app.bot) for item in raw]
+
+        # Задержки меряются обёртками вокруг обработчика обновлений
+        queued_at = {}
+        latencies = []
+        service = []
+        processor = app.update_processor
+        process_update = processor.process_update
+        do_process_update = processor.do_process_update
+
+        async def timed_process_update(update, coroutine):
+            try:
+                await process_update(update, coroutine)
+            finally:
+                latencies.append(time.perf_counter() - queued_at.pop(update.update_id))
+
+        async def timed_do_process_update(update, coroutine):
+            started = time.perf_counter()
+            try:
+                await do_process_update(update, coroutine)
+            finally:
+                service.append(time.perf_counter() - started)
+
+        processor.process_update = timed_process_update
+        processor.do_process_update = timed_do_process_update
+
+        await app.start()
+        if args.tracemalloc:
+            tracemalloc.start()
+        started = time.perf_counter()
+        for update in updates:
+            queued_at[update.update_id] = time.perf_counter()
+            app.update_queue.put_nowait(update)
+        await app.update_queue.join()
+        elapsed = time.perf_counter() - started
+        traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+        tracemalloc.stop()
+
+        await app.stop()
+        await app.shutdown()
+        await app.post_shutdown(app)
+    await api.stop()
+
+    result = {
+        "scenario": name,
+        "updates": len(updates),
+        "seconds": round(elapsed, 3),
+        "updates_per_sec": round(len(updates) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "handler_p50_ms": round(percentile(service, 0.50) * 1000, 2),
+        "handler_p99_ms": round(percentile(service, 0.99) * 1000, 2),
+        # ru_maxrss в Linux — килобайты
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "api_calls": sum(api.calls.values()),
+        "errors": len(errors),
+    }
+    if traced_peak is not None:
+        result["traced_peak_mb"] = round(traced_peak / 2 ** 20, 1)
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+# ---------------------- Отчёт ----------------------
+def git_revision() -> str:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return revision + ("+" if dirty else "")
+
+
+COLUMNS = (("scenario", "сценарий", 12), ("updates", "обновл.", 8), ("updates_per_sec", "обн/с", 9),
+           ("p50_ms", "p50 мс", 8), ("p99_ms", "p99 мс", 8), ("handler_p50_ms", "обр.p50", 8),
+           ("handler_p99_ms", "обр.p99", 8), ("peak_rss_mb", "RSS МБ", 8), ("errors", "ошибки", 7))
+
+
+def format_report(results: list, args) -> str:
+    header = (f"# {datetime.datetime.now():%Y-%m-%d %H:%M} commit={git_revision()} db={args.db} "
+              f"scale={args.scale} concurrency={args.concurrency} api_latency={args.api_latency} "
+              f"python={platform.python_version()}")
+    lines = [header, " ".join(title.rjust(width) for _, title, width in COLUMNS)]
+    for result in results:
+        lines.append(" ".join(str(result.get(key, "")).rjust(width) for key, _, width in COLUMNS))
+        if result.get("first_error"):
+            lines.append(f"  первая ошибка: {result['first_error']}")
+    return "\n".join(lines)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Замер производительности обработчиков бота")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="сценарий (можно несколько раз); по умолчанию все")
+    parser.add_argument("--db", choices=("memory", "sqlite"), default="memory", help="хранилище")
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель размера сценариев")
+    parser.add_argument("--concurrency", type=int, default=16, help="как --concurrency у бота")
+    parser.add_argument("--api-latency", type=float, default=0.0,
+                        help="задержка ответа имитатора Bot API, секунды")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="дополнительно мерить пик памяти Python через tracemalloc (медленнее)")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="куда дописывать результаты")
+    parser.add_argument("--json", action="store_true", help="печатать результаты в JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser
+
+
+def child_args(args) -> list:
+    argv = ["--db", args.db, "--scale", str(args.scale), "--concurrency", str(args.concurrency),
+            "--api-latency", str(args.api_latency)]
+    if args.tracemalloc:
+        argv.append("--tracemalloc")
+    return argv
+
+
+def main(argv=None) -> None:
+    args = build_parser().parse_args(argv)
+    if args.child:
+        print(json.dumps(asyncio.run(run_scenario(args.child, args)), ensure_ascii=False))
+        return
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for name in args.scenario or list(SCENARIOS):
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name,
+                                    *child_args(args)], cwd=here, capture_output=True, text=True)
+        if completed.returncode != 0:
+            sys.stderr.write(completed.stderr)
+            results.append({"scenario": name, "errors": "сбой"})
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    report = format_report(results, args)
+    print(json.dumps(results, ensure_ascii=False, indent=2) if args.json else report)
+    with open(os.path.join(here, args.output) if not os.path.isabs(args.output) else args.output,
+              "a", encoding="utf-8") as output:
+        output.write(report + "\n\n")
+
+
+if __name__ == "__main__":
+    main()
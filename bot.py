@@ -1,7 +1,12 @@
 import logging
 import datetime
 import asyncio
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import html
+import os
+import sys
+import tempfile
+from contextlib import aclosing
+from telegram import Update
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -11,26 +16,68 @@ from telegram.ext import (
     ContextTypes,
     filters,
 )
+from config import parse_config
+from storage import MemoryStorage, create_storage
+from report_cache import ReportCache
+from reminders import ReminderScheduler
+from retention import RetentionEngine
+from menus import MENUS, back_keyboard, day_keyboard, page_keyboard
+from router import CallbackRouter, answer_callback_query, answer_handler, callback_arg, parse_callback
+from message_cache import RenderedMessages
+from update_processor import ChatOrderedUpdateProcessor
+from rate_limiter import PriorityRateLimiter, PRIORITY_NAMES
+from metrics import Metrics, MetricsServer, TimedRequest
+from persistence import JournalPersistence
+from webhook import run_webhook
+from sharding import run_sharded
+import transfer
+import batch_entry
+from search_index import SearchIndex
+import analytics
 
 # ---------------------- Настройка логирования ----------------------
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
 )
+# httpx пишет каждый запрос с URL, а в URL Bot API есть токен
+logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
-# ---------------------- Глобальные хранилища данных ----------------------
-# Расписание: ключ – день недели (например, "Понедельник") или точная дата "YYYY-MM-DD"
-schedule_data = {}
-# События: список событий (dict: date, description, chat_id)
-events = []
-# Вопросы (Входящие)
-questions = []
+# ---------------------- Хранилище данных ----------------------
+# Хранятся: расписание (день недели или точная дата "YYYY-MM-DD"), события,
+# вопросы (Входящие) и записи зависимостей (телефон, сладкое, плохие слова).
+# Хранилище выбирается при запуске (--db), до этого данные живут в памяти.
+storage = MemoryStorage()
 
-# Зависимости:
-phone_usage = {}      # Ключ: дата (YYYY-MM-DD), значение: список часов (float)
-sweets_entries = []   # Список записей: {"date": "YYYY-MM-DD", "item": описание}
-bad_words_entries = []  # Список записей: {"date": "YYYY-MM-DD", "word": слово}
+# Кэш готовых отчётов: запись в хранилище сбрасывает отчёты этого чата того же вида
+report_cache = ReportCache()
+
+# Обратный индекс для /search: каждая запись в хранилище сразу попадает в индекс чата
+search_index = SearchIndex()
+
+def on_storage_change(chat_id: int, kind: str, record) -> None:
+    report_cache.invalidate(chat_id, kind)
+    search_index.on_storage_change(chat_id, kind, record)
+
+storage.add_listener(on_storage_change)
+
+def use_storage(new_storage) -> None:
+    global storage
+    storage = new_storage
+    storage.add_listener(on_storage_change)
+
+# Последнее показанное содержимое сообщений бота — чтобы не править их впустую
+rendered = RenderedMessages()
+
+# Метрики обработчиков и запросов к Bot API (эндпоинт — --metrics-port)
+metrics = Metrics()
+
+# Напоминания о событиях; создаются при запуске приложения
+reminders = None
+
+# Фоновое сжатие старой истории; создаётся при запуске приложения
+retention = None
 
 # ---------------------- Состояния для ConversationHandler ----------------------
 SCHEDULE_INPUT = 1         # Ввод расписания (add/edit)
@@ -38,92 +85,69 @@ EXACT_DATE_INPUT = 2       # Ввод точной даты при выборе
 EVENT_DATE, EVENT_DESCRIPTION = range(10, 12)  # Для событий
 QUESTION_INPUT = 20        # Для вопросов
 PHONE_INPUT, SWEETS_INPUT, BADWORDS_INPUT = range(100, 103)
+IMPORT_INPUT = 200         # Ожидание файла для /import
+
+# Имена состояний для меток метрик
+STATE_NAMES = {SCHEDULE_INPUT: "SCHEDULE_INPUT", EXACT_DATE_INPUT: "EXACT_DATE_INPUT",
+               EVENT_DATE: "EVENT_DATE", EVENT_DESCRIPTION: "EVENT_DESCRIPTION",
+               QUESTION_INPUT: "QUESTION_INPUT", PHONE_INPUT: "PHONE_INPUT",
+               SWEETS_INPUT: "SWEETS_INPUT", BADWORDS_INPUT: "BADWORDS_INPUT",
+               IMPORT_INPUT: "IMPORT_INPUT"}
 
 # ---------------------- Главное меню ----------------------
+async def show(update: Update, payload: dict) -> None:
+    """Показывает экран: по нажатию кнопки — правкой того же сообщения (без запроса,
+    если содержимое не изменилось), в ответ на сообщение или команду — новым."""
+    if update.callback_query:
+        await rendered.edit(update.callback_query, **payload)
+    elif update.message:
+        await rendered.reply(update.message, **payload)
+
 async def main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    keyboard = [
-        [InlineKeyboardButton("📅 Расписание", callback_data="menu_schedule"),
-         InlineKeyboardButton("📌 События", callback_data="menu_events")],
-        [InlineKeyboardButton("📥 Входящие", callback_data="menu_questions"),
-         InlineKeyboardButton("🚭 Зависимости", callback_data="menu_dependencies")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    if update.message:
-        await update.message.reply_text("<b>Главное меню</b>\nВыберите раздел:", parse_mode="HTML", reply_markup=reply_markup)
-    elif update.callback_query:
-        await update.callback_query.edit_message_text("<b>Главное меню</b>\nВыберите раздел:", parse_mode="HTML", reply_markup=reply_markup)
+    await show(update, MENUS["main"])
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await main_menu(update, context)
 
 # ---------------------- Расписание ----------------------
 async def schedule_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    # Обратите внимание: исправил "Пончик" на "Понедельник" и добавил префикс "day_"
-    keyboard = [
-        [
-            InlineKeyboardButton("Понедельник", callback_data="day_Понедельник"),
-            InlineKeyboardButton("Вторник", callback_data="day_Вторник"),
-            InlineKeyboardButton("Среда", callback_data="day_Среда"),
-            InlineKeyboardButton("Четверг", callback_data="day_Четверг")
-        ],
-        [
-            InlineKeyboardButton("Пятница", callback_data="day_Пятница"),
-            InlineKeyboardButton("Суббота", callback_data="day_Суббота"),
-            InlineKeyboardButton("Воскресенье", callback_data="day_Воскресенье"),
-            InlineKeyboardButton("Дата", callback_data="day_Дата")
-        ],
-        [
-            InlineKeyboardButton("Назад", callback_data="back_main")
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.callback_query.edit_message_text("Выберите день:", reply_markup=reply_markup)
+    await show(update, MENUS["schedule"])
 
 async def day_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
-    data = query.data  # Формат: "day_Понедельник", "day_Дата" и т.д.
-    # Если выбрана "Дата", работа переходит в другой ConversationHandler
-    if data == "day_Дата":
-        # Запускаем отдельный диалог для ввода точной даты
-        await exact_date_input_entry(update, context)
-        return
-    # Иначе обрабатываем как обычный день
-    _, day = data.split("_", 1)
+    day = callback_arg(update)  # Формат: "sched:day:Понедельник"; "Дата" обрабатывает отдельный диалог
     context.user_data["selected_day"] = day
-    if day in schedule_data and schedule_data[day].strip() != "":
-        keyboard = [
-            [InlineKeyboardButton("Просмотреть", callback_data=f"view_{day}"),
-             InlineKeyboardButton("Изменить", callback_data=f"edit_{day}")],
-            [InlineKeyboardButton("Назад", callback_data="menu_schedule")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(f"Для {day} установлено расписание.", reply_markup=reply_markup)
+    current = await storage.get_schedule(update.effective_chat.id, day)
+    if current and current.strip() != "":
+        await rendered.edit(query, f"Для {day} установлено расписание.", reply_markup=day_keyboard(day, True))
     else:
-        keyboard = [
-            [InlineKeyboardButton("Добавить", callback_data=f"add_{day}")],
-            [InlineKeyboardButton("Назад", callback_data="menu_schedule")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(f"Расписание для {day} отсутствует.", reply_markup=reply_markup)
+        await rendered.edit(query, f"Расписание для {day} отсутствует.", reply_markup=day_keyboard(day, False))
+
+async def render_schedule_report(chat_id: int, day: str) -> dict:
+    text = await storage.get_schedule(chat_id, day)
+    if text is None:
+        text = "Нет расписания."
+    return {"text": f"Расписание на {day}:\n\n{text}", "reply_markup": back_keyboard("menu:schedule")}
 
 async def view_schedule(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
-    _, day = query.data.split("_", 1)
-    text = schedule_data.get(day, "Нет расписания.")
-    keyboard = [[InlineKeyboardButton("Назад", callback_data="menu_schedule")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(f"Расписание на {day}:\n\n{text}", reply_markup=reply_markup)
+    chat_id = update.effective_chat.id
+    day = callback_arg(update)
+    payload = await report_cache.get_or_render(
+        chat_id, "schedule", lambda: render_schedule_report(chat_id, day), key=day)
+    await rendered.edit(query, **payload)
 
 async def schedule_input_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
-    data = query.data  # Формат: "add_Понедельник" или "edit_Понедельник" (также для точных дат)
-    _, day = data.split("_", 1)
+    # Формат: "sched:add:Понедельник" или "sched:edit:Понедельник" (также для точных дат)
+    day = callback_arg(update)
     context.user_data["selected_day"] = day
-    if data.startswith("add_"):
+    if query.data.startswith("sched:add:"):
         prompt = f"Введите расписание для {day}:"
     else:
-        current = schedule_data.get(day, "(пусто)")
+        current = await storage.get_schedule(update.effective_chat.id, day)
+        if current is None:
+            current = "(пусто)"
         prompt = f"Введите новое расписание для {day}.\nТекущее: {current}\nВведите новый текст:"
     await query.message.reply_text(prompt)
     return SCHEDULE_INPUT
@@ -134,7 +158,7 @@ async def schedule_input_received(update: Update, context: ContextTypes.DEFAULT_
         await update.message.reply_text("Ошибка: день не выбран.")
         return ConversationHandler.END
     text = update.message.text.strip()
-    schedule_data[day] = text
+    await storage.set_schedule(update.effective_chat.id, day, text)
     await update.message.reply_text(f"Расписание для {day} установлено:\n\n{text}")
     await main_menu(update, context)
     return ConversationHandler.END
@@ -142,8 +166,7 @@ async def schedule_input_received(update: Update, context: ContextTypes.DEFAULT_
 # ConversationHandler для обработки "Дата" (точной даты)
 async def exact_date_input_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
-    await query.edit_message_text("Введите точную дату в формате YYYY-MM-DD:")
+    await rendered.edit(query, "Введите точную дату в формате YYYY-MM-DD:")
     return EXACT_DATE_INPUT
 
 async def process_exact_date_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -155,37 +178,54 @@ async def process_exact_date_input(update: Update, context: ContextTypes.DEFAULT
         return EXACT_DATE_INPUT
     date_str = date_obj.strftime("%Y-%m-%d")
     context.user_data["selected_day"] = date_str
-    if date_str in schedule_data and schedule_data[date_str].strip() != "":
-        keyboard = [
-            [InlineKeyboardButton("Просмотреть", callback_data=f"view_{date_str}"),
-             InlineKeyboardButton("Изменить", callback_data=f"edit_{date_str}")],
-            [InlineKeyboardButton("Назад", callback_data="menu_schedule")]
-        ]
+    current = await storage.get_schedule(update.effective_chat.id, date_str)
+    has_schedule = bool(current and current.strip() != "")
+    if has_schedule:
         msg = f"Для {date_str} установлено расписание."
     else:
-        keyboard = [
-            [InlineKeyboardButton("Добавить", callback_data=f"add_{date_str}")],
-            [InlineKeyboardButton("Назад", callback_data="menu_schedule")]
-        ]
         msg = f"Расписание для {date_str} отсутствует."
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text(msg, reply_markup=reply_markup)
+    await update.message.reply_text(msg, reply_markup=day_keyboard(date_str, has_schedule))
     return ConversationHandler.END
 
+# ---------------------- Постраничный вывод ----------------------
+# Длинные списки показываются страницами: не больше PAGE_SIZE записей и PAGE_TEXT_LIMIT
+# символов (лимит Telegram — 4096). Курсор страницы — id первой записи; он помещается
+# в аргумент callback_data кнопок "◀"/"▶". Из хранилища читается только нужная страница.
+PAGE_SIZE = 10
+PAGE_TEXT_LIMIT = 3500
+
+async def collect_page(rows, fmt) -> tuple:
+    """Берёт из асинхронного генератора записи одной страницы.
+    Возвращает список (id, строка) и id первой не вошедшей записи (или None)."""
+    page = []
+    size = 0
+    async with aclosing(rows):
+        async for row in rows:
+            line = fmt(row)[:PAGE_TEXT_LIMIT]
+            if len(page) == PAGE_SIZE or (page and size + len(line) > PAGE_TEXT_LIMIT):
+                return page, row[0]
+            page.append((row[0], line))
+            size += len(line) + 1
+    return page, None
+
+def page_cursor(token: str) -> list:
+    # Токен "<курсор>[_<номер>]" → [курсор, номер]; пустой или испорченный
+    # (устаревшая или подделанная кнопка) — первая страница
+    try:
+        parts = [int(part) for part in token.split("_")] if token else []
+    except ValueError:
+        parts = []
+    if not 1 <= len(parts) <= 2 or min(parts) < 0:
+        return [0, 1]
+    return parts + [1] * (2 - len(parts))
+
 # ---------------------- События ----------------------
 async def events_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    keyboard = [
-        [InlineKeyboardButton("Добавить событие", callback_data="events_add")],
-        [InlineKeyboardButton("Просмотреть события", callback_data="events_view")],
-        [InlineKeyboardButton("Назад", callback_data="back_main")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.callback_query.edit_message_text("События:", reply_markup=reply_markup)
+    await show(update, MENUS["events"])
 
 async def event_input_date_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
-    await query.edit_message_text("Введите дату события в формате YYYY-MM-DD:")
+    await rendered.edit(query, "Введите дату события в формате YYYY-MM-DD:")
     return EVENT_DATE
 
 async def event_date_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -206,332 +246,583 @@ async def event_description_received(update: Update, context: ContextTypes.DEFAU
         await update.message.reply_text("Ошибка: дата не задана.")
         return ConversationHandler.END
     chat_id = update.effective_chat.id
-    event = {"date": event_date, "description": description, "chat_id": chat_id}
-    events.append(event)
+    await storage.add_event(chat_id, event_date, description)
     await update.message.reply_text(f"Событие добавлено: {description} на {event_date}")
     await main_menu(update, context)
     return ConversationHandler.END
 
+def format_event(row) -> str:
+    _, date, description = row
+    return f"{date}: {description}"
+
+async def render_events_report(chat_id: int, cursor: int = 0) -> dict:
+    page, next_cursor = await collect_page(storage.iter_events(chat_id, cursor), format_event)
+    if not page:
+        return {"text": "Нет запланированных событий."}
+    prev_page, _ = await collect_page(storage.iter_events(chat_id, page[0][0], reverse=True), format_event)
+    prev_cursor = prev_page[-1][0] if prev_page else None
+    lines = ["Запланированные события:"]
+    lines.extend(line for _, line in page)
+    return {"text": "\n".join(lines),
+            "reply_markup": page_keyboard("events:view:", prev_cursor, next_cursor, "menu:events")}
+
 async def events_view_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
-    if not events:
-        await query.edit_message_text("Нет запланированных событий.")
-        return
-    msg = "Запланированные события:\n"
-    for event in events:
-        msg += f"{event['date']}: {event['description']}\n"
-    keyboard = [[InlineKeyboardButton("Назад", callback_data="menu_events")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(msg, reply_markup=reply_markup)
+    chat_id = update.effective_chat.id
+    cursor = page_cursor(callback_arg(update))[0]
+    payload = await report_cache.get_or_render(
+        chat_id, "events", lambda: render_events_report(chat_id, cursor), key=cursor)
+    await rendered.edit(query, **payload)
 
 # ---------------------- Входящие (Вопросы) ----------------------
 async def questions_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    keyboard = [
-        [InlineKeyboardButton("Добавить вопрос", callback_data="ques_add")],
-         [InlineKeyboardButton("Просмотреть входящие", callback_data="ques_view")],
-        [InlineKeyboardButton("Назад", callback_data="back_main")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.callback_query.edit_message_text("Входящие:", reply_markup=reply_markup)
+    await show(update, MENUS["questions"])
 
 async def question_input_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
-    await query.edit_message_text("Введите ваш вопрос:")
+    await rendered.edit(query, "Введите ваш вопрос:")
     return QUESTION_INPUT
 
 async def question_input_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     text = update.message.text.strip()
-    questions.append(text)
+    await storage.add_question(update.effective_chat.id, text)
     await update.message.reply_text("Вопрос добавлен.")
     await main_menu(update, context)
     return ConversationHandler.END
 
+def format_question(row) -> str:
+    return row[1]
+
+async def render_questions_report(chat_id: int, cursor: int = 0, number: int = 1) -> dict:
+    # number — порядковый номер первого вопроса страницы, передаётся в токене страницы
+    page, next_cursor = await collect_page(storage.iter_questions(chat_id, cursor), format_question)
+    if not page:
+        return {"text": "Нет входящих вопросов."}
+    prev_page, _ = await collect_page(storage.iter_questions(chat_id, page[0][0], reverse=True), format_question)
+    prev_token = f"{prev_page[-1][0]}_{number - len(prev_page)}" if prev_page else None
+    next_token = f"{next_cursor}_{number + len(page)}" if next_cursor is not None else None
+    lines = ["Входящие:"]
+    lines.extend(f"{i}. {q}" for i, (_, q) in enumerate(page, start=number))
+    return {"text": "\n".join(lines),
+            "reply_markup": page_keyboard("ques:view:", prev_token, next_token, "menu:questions")}
+
 async def questions_view_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
-    if not questions:
-        await query.edit_message_text("Нет входящих вопросов.")
-        return
-    msg = "Входящие:\n"
-    for i, q in enumerate(questions, start=1):
-        msg += f"{i}. {q}\n"
-    keyboard = [[InlineKeyboardButton("Назад", callback_data="menu_questions")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(msg, reply_markup=reply_markup)
+    chat_id = update.effective_chat.id
+    cursor, number = page_cursor(callback_arg(update))
+    payload = await report_cache.get_or_render(
+        chat_id, "questions", lambda: render_questions_report(chat_id, cursor, number), key=cursor)
+    await rendered.edit(query, **payload)
 
 # ---------------------- Зависимости ----------------------
 async def dependencies_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    keyboard = [
-        [InlineKeyboardButton("Телефон", callback_data="dep_phone_menu")],
-        [InlineKeyboardButton("Сладкое", callback_data="dep_sweets_menu")],
-        [InlineKeyboardButton("Плохие слова", callback_data="dep_badwords_menu")],
-        [InlineKeyboardButton("Назад", callback_data="back_main")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.callback_query.edit_message_text("Меню зависимостей:", reply_markup=reply_markup)
+    await show(update, MENUS["dependencies"])
 
 # ----- Телефон -----
 async def dep_phone_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    keyboard = [
-        [InlineKeyboardButton("Добавить запись", callback_data="dep_phone_add")],
-        [InlineKeyboardButton("Просмотреть отчёт", callback_data="dep_phone_view")],
-        [InlineKeyboardButton("Назад", callback_data="menu_dependencies")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.callback_query.edit_message_text("Телефон: выберите действие:", reply_markup=reply_markup)
+    await show(update, MENUS["dep_phone"])
 
 async def dep_phone_input_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
-    await query.message.reply_text("Введите количество часов использования телефона за сегодня (например, 3.5):")
+    await query.message.reply_text("Введите количество часов использования телефона за сегодня (например, 3.5).\n"
+                                   "За другие дни — с датой, по строке на день: 2026-10-12 3.5")
     return PHONE_INPUT
 
 async def dep_phone_input_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     logging.info("Вошли в dep_phone_input_received")
     text = update.message.text.strip()
+    if batch_entry.looks_like_batch(text, datetime.date.today()):
+        await apply_batch(update, "phone", text)
+        return ConversationHandler.END
     try:
-        hours = float(text)
-    except ValueError:
-        await update.message.reply_text("Ошибка: введите число (например, 3.5). Попробуйте ещё раз:")
+        # Тот же разбор, что и в пакетном вводе: nan, inf и отрицательные числа не принимаются
+        hours = batch_entry.parse_hours(text)
+    except batch_entry.EntryError:
+        await update.message.reply_text("Ошибка: введите число часов (например, 3.5). Попробуйте ещё раз:")
         return PHONE_INPUT
-    today = datetime.date.today().strftime("%Y-%m-%d")
-    phone_usage.setdefault(today, []).append(hours)
+    today = datetime.date.today()
+    await storage.add_phone_usage(update.effective_chat.id, today, hours)
     await update.message.reply_text(f"Записано: {hours} часов за {today}.")
     await main_menu(update, context)
     return ConversationHandler.END
 
-async def dep_phone_view_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    query = update.callback_query
-    today = datetime.date.today()
-    week_entries = {}
-    month_entries = {}
-    for date_str, hours_list in phone_usage.items():
-        try:
-            d = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-        except Exception:
-            continue
-        if (today - d).days < 7:
-            week_entries[date_str] = sum(hours_list)
-        if (today - d).days < 30:
-            month_entries[date_str] = sum(hours_list)
-    report = "<b>Телефон - Отчёт за неделю:</b>\n"
+async def render_phone_report(chat_id: int, today: datetime.date) -> dict:
+    week_start = today - datetime.timedelta(days=6)
+    month_start = today - datetime.timedelta(days=29)
+    # Неделя — хвост месячного окна, поэтому достаточно одного запроса
+    month_entries = await storage.phone_daily_totals(chat_id, month_start, today)
+    week_from = week_start.isoformat()
+    week_entries = [(d, total) for d, total in month_entries if d >= week_from]
+    lines = ["<b>Телефон - Отчёт за неделю:</b>"]
     if week_entries:
-        for d, total in sorted(week_entries.items()):
-            report += f"{d}: {total} часов\n"
+        lines.extend(f"{d}: {total} часов" for d, total in week_entries)
+        lines.append(f"Всего: {await storage.phone_total(chat_id, week_start, today)} часов")
     else:
-        report += "Нет записей за неделю.\n"
-    report += "\n<b>Отчёт за месяц:</b>\n"
+        lines.append("Нет записей за неделю.")
+    lines.append("")
+    lines.append("<b>Отчёт за месяц:</b>")
     if month_entries:
-        for d, total in sorted(month_entries.items()):
-            report += f"{d}: {total} часов\n"
+        lines.extend(f"{d}: {total} часов" for d, total in month_entries)
+        lines.append(f"Всего: {await storage.phone_total(chat_id, month_start, today)} часов")
     else:
-        report += "Нет записей за месяц."
-    keyboard = [[InlineKeyboardButton("Назад", callback_data="dep_phone_menu")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(report, parse_mode="HTML", reply_markup=reply_markup)
+        lines.append("Нет записей за месяц.")
+    return {"text": "\n".join(lines), "parse_mode": "HTML", "reply_markup": back_keyboard("menu:dep_phone")}
+
+async def dep_phone_view_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    chat_id = update.effective_chat.id
+    today = datetime.date.today()
+    payload = await report_cache.get_or_render(
+        chat_id, "phone", lambda: render_phone_report(chat_id, today), day=today.toordinal())
+    await rendered.edit(query, **payload)
 
 # ----- Сладкое -----
 async def dep_sweets_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    keyboard = [
-        [InlineKeyboardButton("Добавить запись", callback_data="dep_sweets_add")],
-        [InlineKeyboardButton("Просмотреть записи", callback_data="dep_sweets_view")],
-        [InlineKeyboardButton("Назад", callback_data="menu_dependencies")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.callback_query.edit_message_text("Сладкое: выберите действие:", reply_markup=reply_markup)
+    await show(update, MENUS["dep_sweets"])
 
 async def dep_sweets_input_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
     await query.message.reply_text("Введите, что именно вы съели (например, \"шоколадка Milka\"):")
     return SWEETS_INPUT
 
 async def dep_sweets_input_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     text = update.message.text.strip()
-    today = datetime.date.today().strftime("%Y-%m-%d")
-    sweets_entries.append({"date": today, "item": text})
+    if batch_entry.looks_like_batch(text, datetime.date.today()):
+        await apply_batch(update, "sweets", text)
+        return ConversationHandler.END
+    today = datetime.date.today()
+    await storage.add_sweets_entry(update.effective_chat.id, today, text)
     await update.message.reply_text(f"Записано: {text} за {today}.")
     await main_menu(update, context)
     return ConversationHandler.END
 
+async def render_sweets_report(chat_id: int, today: datetime.date) -> dict:
+    entries = await storage.list_sweets_entries(chat_id, today - datetime.timedelta(days=6), today)
+    if not entries:
+        text = "Нет записей по сладкому за последние 7 дней."
+    else:
+        lines = ["<b>Сладкое - записи за неделю:</b>"]
+        lines.extend(f"{d}: {item}" for d, item in entries)
+        text = "\n".join(lines)
+    return {"text": text, "parse_mode": "HTML", "reply_markup": back_keyboard("menu:dep_sweets")}
+
 async def dep_sweets_view_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
+    chat_id = update.effective_chat.id
     today = datetime.date.today()
-    entries = [entry for entry in sweets_entries
-               if (today - datetime.datetime.strptime(entry["date"], "%Y-%m-%d").date()).days < 7]
-    if not entries:
-        report = "Нет записей по сладкому за последние 7 дней."
-    else:
-        report = "<b>Сладкое - записи за неделю:</b>\n"
-        for entry in entries:
-            report += f"{entry['date']}: {entry['item']}\n"
-    keyboard = [[InlineKeyboardButton("Назад", callback_data="dep_sweets_menu")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(report, parse_mode="HTML", reply_markup=reply_markup)
+    payload = await report_cache.get_or_render(
+        chat_id, "sweets", lambda: render_sweets_report(chat_id, today), day=today.toordinal())
+    await rendered.edit(query, **payload)
 
 # ----- Плохие слова -----
 async def dep_badwords_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    keyboard = [
-        [InlineKeyboardButton("Добавить запись", callback_data="dep_badwords_add")],
-        [InlineKeyboardButton("Просмотреть записи", callback_data="dep_badwords_view")],
-        [InlineKeyboardButton("Назад", callback_data="menu_dependencies")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.callback_query.edit_message_text("Плохие слова: выберите действие:", reply_markup=reply_markup)
+    await show(update, MENUS["dep_badwords"])
 
 async def dep_badwords_input_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
     await query.message.reply_text("Введите плохое слово, которое вы сказали:")
     return BADWORDS_INPUT
 
 async def dep_badwords_input_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     text = update.message.text.strip()
-    today = datetime.date.today().strftime("%Y-%m-%d")
-    bad_words_entries.append({"date": today, "word": text})
+    if batch_entry.looks_like_batch(text, datetime.date.today()):
+        await apply_batch(update, "badwords", text)
+        return ConversationHandler.END
+    today = datetime.date.today()
+    await storage.add_bad_word(update.effective_chat.id, today, text)
     await update.message.reply_text(f"Записано: \"{text}\" за {today}.")
     await main_menu(update, context)
     return ConversationHandler.END
 
+async def render_badwords_report(chat_id: int, today: datetime.date) -> dict:
+    entries = await storage.list_bad_words(chat_id, today - datetime.timedelta(days=6), today)
+    if not entries:
+        text = "Нет записей по плохим словам за последние 7 дней."
+    else:
+        lines = ["<b>Плохие слова - записи за неделю:</b>"]
+        lines.extend(f"{d}: {word}" for d, word in entries)
+        text = "\n".join(lines)
+    return {"text": text, "parse_mode": "HTML", "reply_markup": back_keyboard("menu:dep_badwords")}
+
 async def dep_badwords_view_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
+    chat_id = update.effective_chat.id
     today = datetime.date.today()
-    entries = [entry for entry in bad_words_entries
-               if (today - datetime.datetime.strptime(entry["date"], "%Y-%m-%d").date()).days < 7]
-    if not entries:
-        report = "Нет записей по плохим словам за последние 7 дней."
+    payload = await report_cache.get_or_render(
+        chat_id, "badwords", lambda: render_badwords_report(chat_id, today), day=today.toordinal())
+    await rendered.edit(query, **payload)
+
+# ----- Тренды (телефон, сладкое, плохие слова) -----
+async def render_trends(chat_id: int, kind: str, today: datetime.date) -> dict:
+    start = today - datetime.timedelta(days=analytics.HISTORY_DAYS - 1)
+    if kind == "phone":
+        rows = await storage.phone_daily_totals(chat_id, start, today)
     else:
-        report = "<b>Плохие слова - записи за неделю:</b>\n"
-        for entry in entries:
-            report += f"{entry['date']}: {entry['word']}\n"
-    keyboard = [[InlineKeyboardButton("Назад", callback_data="dep_badwords_menu")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(report, parse_mode="HTML", reply_markup=reply_markup)
+        rows = await storage.daily_counts(chat_id, kind, start, today)
+    values = analytics.dense_series(rows, start, analytics.HISTORY_DAYS)
+    trends = analytics.compute(kind, values, start)
+    payload = {"caption": analytics.summary(trends)}
+    if analytics.charts_available() and trends["active_days"]:
+        payload["photo"] = await asyncio.to_thread(analytics.render_chart, trends, values)
+    return payload
+
+async def dep_trends_view(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    # Формат: "phone:trends", "sweets:trends", "badwords:trends". Отчёт лежит в кэше отчётов
+    # до первой записи этого вида или смены дня; без matplotlib — только текст
+    query = update.callback_query
+    kind = parse_callback(query.data)[0]
+    chat_id = update.effective_chat.id
+    today = datetime.date.today()
+    payload = await report_cache.get_or_render(
+        chat_id, kind, lambda: render_trends(chat_id, kind, today), key="trends", day=today.toordinal())
+    if "photo" not in payload:
+        await rendered.edit(query, payload["caption"], reply_markup=back_keyboard(f"menu:dep_{kind}"))
+        return
+    message = await query.message.reply_photo(payload["photo"], caption=payload["caption"])
+    # Повторные показы отправляют уже загруженный файл по file_id, без отрисовки и загрузки
+    report_cache.put(chat_id, kind, {**payload, "photo": message.photo[-1].file_id},
+                     key="trends", day=today.toordinal())
 
 # ---------------------- Обработчики "Назад" ----------------------
-async def back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    query = update.callback_query
-    await query.answer()
+# Служат и выходом из диалогов по /cancel: тогда вместо правки приходит новое сообщение
+async def back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await main_menu(update, context)
+    return ConversationHandler.END
 
-async def back_to_dependencies_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    query = update.callback_query
-    await query.answer()
+async def back_to_dependencies_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await dependencies_menu(update, context)
+    return ConversationHandler.END
 
-async def back_to_schedule_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    query = update.callback_query
-    await query.answer()
+async def back_to_schedule_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await schedule_menu(update, context)
+    return ConversationHandler.END
 
-async def back_to_events_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    query = update.callback_query
-    await query.answer()
+async def back_to_events_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await events_menu(update, context)
+    return ConversationHandler.END
 
-async def back_to_questions_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    query = update.callback_query
-    await query.answer()
+async def back_to_questions_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await questions_menu(update, context)
+    return ConversationHandler.END
+
+# ---------------------- Поиск ----------------------
+SEARCH_QUERY_LIMIT = 100
+SEARCH_HIT_LIMIT = 200
+
+def format_hit(hit) -> str:
+    kind, date, text = hit
+    text = " ".join(text.split())
+    if len(text) > SEARCH_HIT_LIMIT:
+        text = text[:SEARCH_HIT_LIMIT] + "…"
+    title = batch_entry.KIND_TITLES[kind]
+    return f"[{title}] {date}: {text}" if date else f"[{title}] {text}"
+
+async def render_search_results(chat_id: int, query: str, offset: int = 0) -> dict:
+    total, hits = await search_index.search(storage, chat_id, query, offset, PAGE_SIZE)
+    if not total:
+        return {"text": f"По запросу «{query}» ничего не найдено.", "reply_markup": back_keyboard("menu:main")}
+    lines = [f"Найдено по запросу «{query}»: {total}"]
+    lines.extend(f"{i}. {format_hit(hit)}" for i, hit in enumerate(hits, start=offset + 1))
+    prev_offset = max(offset - PAGE_SIZE, 0) if offset else None
+    next_offset = offset + PAGE_SIZE if offset + PAGE_SIZE < total else None
+    return {"text": "\n".join(lines),
+            "reply_markup": page_keyboard("search:page:", prev_offset, next_offset, "menu:main")}
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = " ".join(context.args)[:SEARCH_QUERY_LIMIT]
+    if not query:
+        await update.message.reply_text(
+            "Поиск по вопросам, событиям, расписанию, сладкому и плохим словам: /search <слова>\n"
+            "Находятся записи, где есть все слова в любой форме.")
+        return
+    # Запрос запоминается для листания страниц: в callback_data помещается только смещение
+    context.user_data["search_query"] = query
+    await rendered.reply(update.message, **await render_search_results(update.effective_chat.id, query))
+
+async def search_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = context.user_data.get("search_query")
+    if query is None:
+        await rendered.edit(update.callback_query, "Поиск устарел — повторите /search.")
+        return
+    offset = page_cursor(callback_arg(update))[0]
+    payload = await render_search_results(update.effective_chat.id, query, offset)
+    await rendered.edit(update.callback_query, **payload)
+
+# ---------------------- Пакетный ввод ----------------------
+BATCH_USAGE = (
+    "Пакетный ввод: /batch <вид>, записи — со следующей строки, по одной на строку.\n"
+    "Виды: расписание, события, вопросы, телефон, сладкое, слова.\n\n"
+    "/batch расписание\nПонедельник: Зарядка, работа\nВторник: Бассейн\n\n"
+    "/batch телефон\n2026-10-12 3.5\nвчера 2\n\n"
+    "Без даты запись идёт за сегодня; события требуют дату."
+)
+
+async def apply_batch(update: Update, kind: str, text: str) -> None:
+    """Записывает все строки сообщения одной транзакцией и отвечает одним сообщением
+    со сводкой и главным меню."""
+    rows, errors = batch_entry.parse_batch(kind, text, datetime.date.today())
+    if rows:
+        await storage.bulk_insert(update.effective_chat.id, {kind: rows})
+    summary = html.escape(batch_entry.summarize(kind, rows, errors))
+    menu = MENUS["main"]
+    await rendered.reply(update.message, f"{summary}\n\n{menu['text']}",
+                         reply_markup=menu["reply_markup"], parse_mode=menu.get("parse_mode"))
+
+async def batch_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    # "/batch телефон\n2026-10-12 3.5\n..." — вид после команды, записи до конца сообщения
+    parts = update.message.text.split(maxsplit=2)
+    kind = batch_entry.KIND_ALIASES.get(parts[1].lower()) if len(parts) > 1 else None
+    if kind is None or len(parts) < 3:
+        await update.message.reply_text(BATCH_USAGE)
+        return
+    await apply_batch(update, kind, parts[2])
+
+# ---------------------- Импорт и выгрузка ----------------------
+# Bot API отдаёт боту файлы до 20 МБ и принимает до 50 МБ
+IMPORT_MAX_BYTES = 20 * 1024 * 1024
+EXPORT_MAX_BYTES = 50 * 1024 * 1024
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/export [виды...] [csv|jsonl] — по умолчанию все виды в CSV."""
+    kinds = [arg for arg in context.args if arg in transfer.KINDS] or list(transfer.KINDS)
+    fmt = next((arg for arg in context.args if arg in transfer.FORMATS), "csv")
+    unknown = [arg for arg in context.args if arg not in transfer.KINDS and arg not in transfer.FORMATS]
+    if unknown:
+        await update.message.reply_text(
+            f"Неизвестно: {', '.join(unknown)}.\n"
+            f"Использование: /export [{' '.join(transfer.KINDS)}] [csv|jsonl]")
+        return
+    with tempfile.TemporaryFile() as target:
+        count = await transfer.export_to_file(storage, update.effective_chat.id, kinds, fmt, target)
+        if target.tell() > EXPORT_MAX_BYTES:
+            await update.message.reply_text("Выгрузка больше 50 МБ — выберите меньше видов данных.")
+            return
+        target.seek(0)
+        await update.message.reply_document(target, filename=f"export-{datetime.date.today()}.{fmt}",
+                                            caption=f"Строк: {count}")
+
+async def import_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await update.message.reply_text(
+        "Отправьте файл CSV или JSON Lines (поля kind, date, text, value), как его выдаёт /export.\n"
+        "Данные добавляются к имеющимся; строки, которые уже есть, пропускаются, поэтому "
+        "повторная загрузка того же файла ничего не удвоит. Часы телефона в файле — суммы за день.\n"
+        "/cancel — отмена.")
+    return IMPORT_INPUT
+
+async def import_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    document = update.message.document
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        await update.message.reply_text("Файл больше 20 МБ — разделите его на части. Пришлите другой файл или /cancel:")
+        return IMPORT_INPUT
+    descriptor, path = tempfile.mkstemp(suffix=".import")
+    os.close(descriptor)
+    try:
+        file = await document.get_file()
+        await file.download_to_drive(path)
+        with open(path, "rb") as source:
+            head = source.read(64)
+        fmt = transfer.detect_format(document.file_name, head)
+        totals, reader, skipped = await transfer.import_file(storage, update.effective_chat.id, path, fmt)
+    finally:
+        os.remove(path)
+    lines = [f"{kind}: {count}" for kind, count in totals.items() if count]
+    summary = "Загружено:\n" + "\n".join(lines) if lines else "Ничего не загружено."
+    if skipped:
+        summary += f"\nУже были, пропущено: {skipped}"
+    if reader.errors:
+        summary += f"\nПропущено строк с ошибками: {reader.errors}\n" + "\n".join(reader.error_samples)
+    await update.message.reply_text(summary)
+    await main_menu(update, context)
+    return ConversationHandler.END
+
+# ---------------------- Служебные команды ----------------------
+async def queue_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if context.bot.rate_limiter is None:
+        await update.message.reply_text("Ограничение отправки выключено (--global-rate 0).")
+        return
+    stats = context.bot.rate_limiter.snapshot()
+    await update.message.reply_text(
+        "Очередь отправки:\n"
+        f"ждут: {stats['queued']['interactive']} ответов, {stats['queued']['background']} фоновых\n"
+        f"отправлено: {stats['sent']['interactive']} ответов, {stats['sent']['background']} фоновых\n"
+        f"повторов после RetryAfter: {stats['retries']}\n"
+        f"наибольшее ожидание: {stats['max_wait']} с\n"
+        f"чатов с лимитом: {stats['chats']}"
+    )
 
 # ---------------------- Основной запуск приложения ----------------------
-def main():
-    app = ApplicationBuilder().token("7570387816:AAHmvRjsdqOyjjr1iTzFhB9_yB-rVRyGyuU").build()
+def build_application(config):
+    metrics_server = MetricsServer(metrics) if config.metrics_port else None
+
+    async def on_startup(app) -> None:
+        global reminders, retention
+        await storage.open()
+        reminders = ReminderScheduler(storage, app.bot, config.remind_at)
+        await reminders.start()
+        retention = RetentionEngine(storage, config.retention_raw_days, config.retention_weekly_days,
+                                    config.retention_events_days, config.retention_interval,
+                                    config.retention_chats, config.retention_rows)
+        await retention.start()
+        if metrics_server is not None:
+            await metrics_server.start(config.metrics_listen, config.metrics_port)
+
+    async def on_shutdown(app) -> None:
+        if metrics_server is not None:
+            await metrics_server.stop()
+        if retention is not None:
+            await retention.stop()
+        if reminders is not None:
+            await reminders.stop()
+        await storage.close()
+
+    builder = ApplicationBuilder().token(config.token).request(TimedRequest(metrics))
+    if config.api_base_url:
+        builder = builder.base_url(config.api_base_url)
+    if config.global_rate:
+        builder = builder.rate_limiter(PriorityRateLimiter(config.global_rate))
+    if config.state_path:
+        builder = builder.persistence(JournalPersistence(config.state_path, config.state_interval))
+    app = (
+        builder
+        .concurrent_updates(ChatOrderedUpdateProcessor(config.concurrency))
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
+    text_input = filters.TEXT & ~filters.COMMAND
+
+    # Ответ на каждое нажатие кнопки — раньше всех остальных обработчиков
+    app.add_handler(answer_handler(), group=-1)
 
     # Главное меню
     app.add_handler(CommandHandler("start", start))
-    app.add_handler(CallbackQueryHandler(back_to_main, pattern="^back_main$"))
-    
-    # Меню разделов
-    app.add_handler(CallbackQueryHandler(schedule_menu, pattern="^menu_schedule$"))
-    app.add_handler(CallbackQueryHandler(events_menu, pattern="^menu_events$"))
-    app.add_handler(CallbackQueryHandler(questions_menu, pattern="^menu_questions$"))
-    app.add_handler(CallbackQueryHandler(dependencies_menu, pattern="^menu_dependencies$"))
-    
-    # Расписание: выбор дня (для дней, не равных "Дата")
-    app.add_handler(CallbackQueryHandler(day_selected, pattern="^day_(?!Дата$).*"))
-    # ConversationHandler для обработки "Дата"
-    exact_date_conv = ConversationHandler(
-        entry_points=[CallbackQueryHandler(exact_date_input_entry, pattern="^day_Дата$")],
-        states={
-            EXACT_DATE_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, process_exact_date_input)]
-        },
-        fallbacks=[CommandHandler("cancel", back_to_main)]
-    )
-    app.add_handler(exact_date_conv)
-    
-    # Просмотр и изменение расписания
-    app.add_handler(CallbackQueryHandler(view_schedule, pattern="^view_"))
-    app.add_handler(CallbackQueryHandler(schedule_input_entry, pattern="^(add_|edit_)"))
-    schedule_conv = ConversationHandler(
-        entry_points=[CallbackQueryHandler(schedule_input_entry, pattern="^(add_|edit_)")],
-        states={
-            SCHEDULE_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, schedule_input_received)]
-        },
-        fallbacks=[CommandHandler("cancel", back_to_main)]
-    )
-    app.add_handler(schedule_conv)
-    
+    # Состояние очереди отправки — только для администраторов (--admin-ids)
+    app.add_handler(CommandHandler("queue", queue_status, filters=filters.User(user_id=config.admin_ids)))
+
+    # Поиск по всем данным чата
+    app.add_handler(CommandHandler("search", search_command))
+
+    # Много записей одним сообщением
+    app.add_handler(CommandHandler("batch", batch_command))
+
+    # Выгрузка и загрузка данных файлом
+    app.add_handler(CommandHandler("export", export_command))
+    app.add_handler(ConversationHandler(
+        entry_points=[CommandHandler("import", import_entry)],
+        states={IMPORT_INPUT: [MessageHandler(filters.Document.ALL, import_received)]},
+        fallbacks=[CommandHandler("cancel", back_to_main)],
+        allow_reentry=True,
+        name="import",
+        persistent=bool(config.state_path),
+    ))
+
+    # Диалоги ввода. Точки входа — кнопки; фильтр разбирает callback_data тем же
+    # кэшированным парсером, что и маршрутизатор. allow_reentry позволяет начать
+    # диалог заново повторным нажатием кнопки. Если ведётся журнал состояний
+    # (--state-path), диалоги переживают перезапуск; имя диалога — его точка входа.
+    def conversation(entry_callback, namespace, actions, states, cancel):
+        if isinstance(actions, str):
+            actions = (actions,)
+        return ConversationHandler(
+            entry_points=[CallbackQueryHandler(entry_callback, pattern=CallbackRouter.matcher(namespace, *actions))],
+            states=states,
+            fallbacks=[CommandHandler("cancel", cancel)],
+            allow_reentry=True,
+            name=f"{namespace}:{'+'.join(actions)}",
+            persistent=bool(config.state_path),
+        )
+
+    # Расписание: ввод точной даты ("Дата") и добавление/изменение расписания дня
+    app.add_handler(conversation(exact_date_input_entry, "sched", "date", {
+        EXACT_DATE_INPUT: [MessageHandler(text_input, process_exact_date_input)]
+    }, back_to_main))
+    app.add_handler(conversation(schedule_input_entry, "sched", ("add", "edit"), {
+        SCHEDULE_INPUT: [MessageHandler(text_input, schedule_input_received)]
+    }, back_to_main))
+
     # События
-    app.add_handler(CallbackQueryHandler(events_view_handler, pattern="^events_view$"))
-    event_conv = ConversationHandler(
-        entry_points=[CallbackQueryHandler(event_input_date_entry, pattern="^events_add$")],
-        states={
-            EVENT_DATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, event_date_received)],
-            EVENT_DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, event_description_received)]
-        },
-        fallbacks=[CommandHandler("cancel", back_to_events_menu)]
-    )
-    app.add_handler(event_conv)
-    
+    app.add_handler(conversation(event_input_date_entry, "events", "add", {
+        EVENT_DATE: [MessageHandler(text_input, event_date_received)],
+        EVENT_DESCRIPTION: [MessageHandler(text_input, event_description_received)]
+    }, back_to_events_menu))
+
     # Вопросы
-    app.add_handler(CallbackQueryHandler(questions_view_handler, pattern="^ques_view$"))
-    question_conv = ConversationHandler(
-        entry_points=[CallbackQueryHandler(question_input_entry, pattern="^ques_add$")],
-        states={
-            QUESTION_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, question_input_received)]
-        },
-        fallbacks=[CommandHandler("cancel", back_to_questions_menu)]
-    )
-    app.add_handler(question_conv)
-    
-    # Зависимости - Телефон
-    app.add_handler(CallbackQueryHandler(dep_phone_menu, pattern="^dep_phone_menu$"))
-    app.add_handler(CallbackQueryHandler(lambda u, c: dep_phone_view_report(u, c), pattern="^dep_phone_view$"))
-    phone_conv = ConversationHandler(
-        entry_points=[CallbackQueryHandler(dep_phone_input_entry, pattern="^dep_phone_add$")],
-        states={
-            PHONE_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, dep_phone_input_received)]
-        },
-        fallbacks=[CommandHandler("cancel", back_to_dependencies_menu)]
-    )
-    app.add_handler(phone_conv)
-    
-    # Зависимости - Сладкое
-    app.add_handler(CallbackQueryHandler(dep_sweets_menu, pattern="^dep_sweets_menu$"))
-    app.add_handler(CallbackQueryHandler(lambda u, c: dep_sweets_view_report(u, c), pattern="^dep_sweets_view$"))
-    sweets_conv = ConversationHandler(
-        entry_points=[CallbackQueryHandler(dep_sweets_input_entry, pattern="^dep_sweets_add$")],
-        states={
-            SWEETS_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, dep_sweets_input_received)]
-        },
-        fallbacks=[CommandHandler("cancel", back_to_dependencies_menu)]
-    )
-    app.add_handler(sweets_conv)
-    
-    # Зависимости - Плохие слова
-    app.add_handler(CallbackQueryHandler(dep_badwords_menu, pattern="^dep_badwords_menu$"))
-    app.add_handler(CallbackQueryHandler(lambda u, c: dep_badwords_view_report(u, c), pattern="^dep_badwords_view$"))
-    badwords_conv = ConversationHandler(
-        entry_points=[CallbackQueryHandler(dep_badwords_input_entry, pattern="^dep_badwords_add$")],
-        states={
-            BADWORDS_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, dep_badwords_input_received)]
-        },
-        fallbacks=[CommandHandler("cancel", back_to_dependencies_menu)]
-    )
-    app.add_handler(badwords_conv)
-    
-    app.run_polling()
+    app.add_handler(conversation(question_input_entry, "ques", "add", {
+        QUESTION_INPUT: [MessageHandler(text_input, question_input_received)]
+    }, back_to_questions_menu))
+
+    # Зависимости
+    app.add_handler(conversation(dep_phone_input_entry, "phone", "add", {
+        PHONE_INPUT: [MessageHandler(text_input, dep_phone_input_received)]
+    }, back_to_dependencies_menu))
+    app.add_handler(conversation(dep_sweets_input_entry, "sweets", "add", {
+        SWEETS_INPUT: [MessageHandler(text_input, dep_sweets_input_received)]
+    }, back_to_dependencies_menu))
+    app.add_handler(conversation(dep_badwords_input_entry, "badwords", "add", {
+        BADWORDS_INPUT: [MessageHandler(text_input, dep_badwords_input_received)]
+    }, back_to_dependencies_menu))
+
+    # Остальные кнопки — через единый маршрутизатор
+    router = CallbackRouter()
+    router.route("menu", "main", back_to_main)
+    router.route("menu", "schedule", schedule_menu)
+    router.route("menu", "events", events_menu)
+    router.route("menu", "questions", questions_menu)
+    router.route("menu", "dependencies", dependencies_menu)
+    router.route("menu", "dep_phone", dep_phone_menu)
+    router.route("menu", "dep_sweets", dep_sweets_menu)
+    router.route("menu", "dep_badwords", dep_badwords_menu)
+    router.route("sched", "day", day_selected)
+    router.route("sched", "view", view_schedule)
+    router.route("events", "view", events_view_handler)
+    router.route("ques", "view", questions_view_handler)
+    router.route("phone", "view", dep_phone_view_report)
+    router.route("sweets", "view", dep_sweets_view_report)
+    router.route("badwords", "view", dep_badwords_view_report)
+    router.route("search", "page", search_page)
+    for kind in analytics.TRACKERS:
+        router.route(kind, "trends", dep_trends_view)
+    router.wrap_routes(metrics.timed)
+    app.add_handler(router.handler())
+
+    # Все обработчики пишут время и исключения в метрики. Маршруты кнопок уже обёрнуты
+    # выше, а мгновенный ответ на нажатие — не работа обработчика: их не считаем повторно
+    metrics.instrument(app, STATE_NAMES, skip=(router.dispatch, answer_callback_query))
+    register_gauges(app, router)
+    return app
+
+def register_gauges(app, router) -> None:
+    limiter = app.bot.rate_limiter
+    if limiter is not None:
+        metrics.gauge("bot_send_queue_depth", "Запросы в очереди отправки",
+                      lambda: {(("priority", PRIORITY_NAMES[p]),): n for p, n in limiter.depth.items()})
+        metrics.gauge("bot_send_total", "Отправлено через очередь", kind="counter",
+                      read=lambda: {(("priority", PRIORITY_NAMES[p]),): n for p, n in limiter.sent.items()})
+        metrics.gauge("bot_send_retries_total", "Повторы после RetryAfter", lambda: limiter.retries, "counter")
+    metrics.gauge("bot_report_cache_hits_total", "Попадания в кэш отчётов", lambda: report_cache.hits, "counter")
+    metrics.gauge("bot_report_cache_misses_total", "Промахи кэша отчётов", lambda: report_cache.misses, "counter")
+    metrics.gauge("bot_edits_skipped_total", "Пропущенные правки без изменений", lambda: rendered.skipped, "counter")
+    metrics.gauge("bot_unroutable_callbacks_total", "Нажатия без маршрута", lambda: router.unroutable, "counter")
+    metrics.gauge("bot_search_index_chats", "Чаты с построенным поисковым индексом", lambda: len(search_index))
+    metrics.gauge("bot_retention_rows_total", "Свёрнутые и перенесённые в архив строки истории", kind="counter",
+                  read=lambda: {(("kind", kind),): n
+                                for kind, n in (retention.compacted if retention is not None else {}).items()})
+    metrics.gauge("bot_retention_passes_total", "Завершённые проходы сжатия по всем чатам",
+                  lambda: retention.passes if retention is not None else 0, "counter")
+    metrics.gauge("bot_reminders_pending", "Запланированные напоминания",
+                  lambda: len(reminders) if reminders is not None else 0)
+
+def main(argv=None):
+    config = parse_config(argv)
+    if config.workers > 1:
+        run_sharded(config)
+        return
+    use_storage(create_storage(config.db_path))
+    app = build_application(config)
+    if config.mode == "webhook":
+        run_webhook(app, config)
+    else:
+        app.run_polling()
 
 if __name__ == '__main__':
-    main()
+    main(sys.argv[1:])
@@ -0,0 +1,127 @@
+import argparse
+import datetime
+import os
+
+from persistence import state_path_for
+
+
+# ---------------------- Настройки запуска ----------------------
+def parse_time(value: str) -> datetime.time:
+    try:
+        return datetime.datetime.strptime(value, "%H:%M").time()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается время HH:MM, получено {value!r}")
+
+
+def parse_ids(value: str) -> frozenset:
+    try:
+        return frozenset(int(part) for part in value.replace(",", " ").split())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается список id через запятую, получено {value!r}")
+
+
+# Каждый параметр задаётся флагом командной строки; значение по умолчанию берётся
+# из переменной окружения, если она задана.
+def build_parser() -> argparse.ArgumentParser:
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description="Телеграм-бот: расписание, события, входящие, зависимости")
+    parser.add_argument("--token", default=env("BOT_TOKEN", ""),
+                        help="токен бота, обязателен (BOT_TOKEN)")
+    parser.add_argument("--db", dest="db_path", default=env("BOT_DB_PATH", "bot.db"),
+                        help='путь к базе SQLite или "memory" (BOT_DB_PATH)')
+    parser.add_argument("--mode", choices=("polling", "webhook"), default=env("BOT_MODE", "polling"),
+                        help="способ получения обновлений (BOT_MODE)")
+    parser.add_argument("--concurrency", type=int, default=int(env("BOT_CONCURRENCY", "16")),
+                        help="сколько обновлений обрабатывать одновременно; порядок внутри чата "
+                             "сохраняется (BOT_CONCURRENCY)")
+    parser.add_argument("--workers", type=int, default=int(env("BOT_WORKERS", "1")),
+                        help="число рабочих процессов; обновления делятся между ними по chat_id, "
+                             "у каждого своя часть базы (BOT_WORKERS)")
+    parser.add_argument("--remind-at", type=parse_time, default=parse_time(env("BOT_REMIND_AT", "09:00")),
+                        help="время напоминания о событиях в день события, HH:MM (BOT_REMIND_AT)")
+    parser.add_argument("--admin-ids", type=parse_ids, default=parse_ids(env("BOT_ADMIN_IDS", "")),
+                        help="id пользователей, которым доступны служебные команды, через запятую "
+                             "(BOT_ADMIN_IDS)")
+    parser.add_argument("--api-base-url", default=env("BOT_API_BASE_URL", ""),
+                        help="адрес Bot API вместо https://api.telegram.org/bot, например локальный "
+                             "тестовый сервер (BOT_API_BASE_URL)")
+    parser.add_argument("--global-rate", type=float, default=float(env("BOT_GLOBAL_RATE", "30")),
+                        help="сколько сообщений в секунду бот отправляет всего; 0 — без ограничений, "
+                             "например для локального Bot API (BOT_GLOBAL_RATE)")
+
+    parser.add_argument("--state-path", default=env("BOT_STATE_PATH", ""),
+                        help="журнал состояний диалогов и user_data; по умолчанию рядом с базой "
+                             "(bot.db → bot.state.jsonl), для --db memory не ведётся; "
+                             '"off" — не сохранять (BOT_STATE_PATH)')
+    parser.add_argument("--state-interval", type=float, default=float(env("BOT_STATE_INTERVAL", "10")),
+                        help="как часто, в секундах, записывать изменения состояний (BOT_STATE_INTERVAL)")
+
+    history = parser.add_argument_group("хранение истории")
+    history.add_argument("--retention-raw-days", type=int, default=int(env("BOT_RETENTION_RAW_DAYS", "365")),
+                         help="через сколько дней записи сладкого и плохих слов остаются только числом "
+                              "по дням, а отдельные часы телефона — суммой за день; 0 — хранить всё "
+                              "(BOT_RETENTION_RAW_DAYS)")
+    history.add_argument("--retention-weekly-days", type=int,
+                         default=int(env("BOT_RETENTION_WEEKLY_DAYS", "730")),
+                         help="через сколько дней суммы по дням сводятся в суммы по неделям; 0 — не сводить "
+                              "(BOT_RETENTION_WEEKLY_DAYS)")
+    history.add_argument("--retention-events-days", type=int,
+                         default=int(env("BOT_RETENTION_EVENTS_DAYS", "30")),
+                         help="через сколько дней после даты событие уходит в архив (остаётся в выгрузке "
+                              "и поиске); 0 — не архивировать (BOT_RETENTION_EVENTS_DAYS)")
+    history.add_argument("--retention-interval", type=float,
+                         default=float(env("BOT_RETENTION_INTERVAL", "60")),
+                         help="пауза между тактами сжатия, секунды (BOT_RETENTION_INTERVAL)")
+    history.add_argument("--retention-chats", type=int, default=int(env("BOT_RETENTION_CHATS", "50")),
+                         help="сколько чатов сжимать за такт (BOT_RETENTION_CHATS)")
+    history.add_argument("--retention-rows", type=int, default=int(env("BOT_RETENTION_ROWS", "5000")),
+                         help="сколько строк каждого вида сжимать в одном чате за такт (BOT_RETENTION_ROWS)")
+
+    monitoring = parser.add_argument_group("метрики")
+    monitoring.add_argument("--metrics-listen", default=env("BOT_METRICS_LISTEN", "127.0.0.1"),
+                            help="адрес HTTP-эндпоинта метрик (BOT_METRICS_LISTEN)")
+    monitoring.add_argument("--metrics-port", type=int, default=int(env("BOT_METRICS_PORT", "0")),
+                            help="порт эндпоинта /metrics в формате Prometheus; 0 — не запускать "
+                                 "(BOT_METRICS_PORT)")
+
+    webhook = parser.add_argument_group("вебхук")
+    webhook.add_argument("--webhook-listen", default=env("BOT_WEBHOOK_LISTEN", "0.0.0.0"),
+                         help="адрес, на котором слушает HTTP-сервер (BOT_WEBHOOK_LISTEN)")
+    webhook.add_argument("--webhook-port", type=int, default=int(env("BOT_WEBHOOK_PORT", "8443")),
+                         help="порт HTTP-сервера (BOT_WEBHOOK_PORT)")
+    webhook.add_argument("--webhook-path", default=env("BOT_WEBHOOK_PATH", "/telegram"),
+                         help="путь, на который Telegram присылает обновления (BOT_WEBHOOK_PATH)")
+    webhook.add_argument("--webhook-url", default=env("BOT_WEBHOOK_URL", ""),
+                         help="публичный URL вебхука; если пусто, setWebhook не вызывается — "
+                              "удобно для локальной проверки (BOT_WEBHOOK_URL)")
+    webhook.add_argument("--webhook-secret", default=env("BOT_WEBHOOK_SECRET", ""),
+                         help="секрет для заголовка X-Telegram-Bot-Api-Secret-Token (BOT_WEBHOOK_SECRET)")
+    return parser
+
+
+def parse_config(argv=None) -> argparse.Namespace:
+    config = build_parser().parse_args(argv)
+    if not config.token:
+        build_parser().error("не задан токен бота: --token или переменная BOT_TOKEN")
+    if config.concurrency < 1:
+        build_parser().error("--concurrency должно быть не меньше 1")
+    if config.workers < 1:
+        build_parser().error("--workers должно быть не меньше 1")
+    if config.global_rate < 0:
+        build_parser().error("--global-rate не может быть отрицательным")
+    if min(config.retention_raw_days, config.retention_weekly_days, config.retention_events_days) < 0:
+        build_parser().error("горизонты хранения не могут быть отрицательными")
+    # Отчёты смотрят на 30 дней назад, тренды — на год по дням
+    if config.retention_raw_days and config.retention_raw_days < 31:
+        build_parser().error("--retention-raw-days должно быть 0 или не меньше 31")
+    if config.retention_weekly_days and config.retention_weekly_days < 366:
+        build_parser().error("--retention-weekly-days должно быть 0 или не меньше 366")
+    if config.retention_interval <= 0 or config.retention_chats < 1 or config.retention_rows < 1:
+        build_parser().error("--retention-interval, --retention-chats и --retention-rows должны быть больше 0")
+    if not config.state_path:
+        config.state_path = state_path_for(config.db_path)
+    elif config.state_path == "off":
+        config.state_path = ""
+    if not config.webhook_path.startswith("/"):
+        config.webhook_path = "/" + config.webhook_path
+    return config
@@ -0,0 +1,86 @@
+"""Локальный имитатор Telegram Bot API для проверок и замеров без сети.
+
+Отвечает на любые методы успешно: sendMessage и editMessageText возвращают сообщение
+с переданным текстом, sendPhoto и sendDocument — ещё и file_id отправленного файла,
+остальные — True. Бот подключается к нему через
+--api-base-url http://127.0.0.1:<порт>/bot.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qsl
+
+from httpd import HTTPServer, Response
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+MESSAGE_METHODS = frozenset({"sendMessage", "sendPhoto", "sendDocument",
+                             "editMessageText", "editMessageReplyMarkup"})
+
+
+class FakeBotAPI:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency  # искусственная задержка ответа, секунды
+        self.calls = Counter()
+        self._message_ids = itertools.count(1000)
+        self.http = HTTPServer(self.handle)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.http.port}/bot"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        await self.http.start(host, port)
+
+    async def stop(self) -> None:
+        await self.http.stop()
+
+    @staticmethod
+    def parse_body(request) -> dict:
+        if not request.body:
+            return {}
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("application/json"):
+            return json.loads(request.body)
+        if content_type.startswith("multipart/form-data"):
+            # Загрузка файла: поля формы — строки, файлы — байты
+            form = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + request.body)
+            return {part.get_param("name", header="content-disposition"):
+                    part.get_content() if part.get_filename() is None else part.get_payload(decode=True)
+                    for part in form.iter_parts()}
+        return dict(parse_qsl(request.body.decode()))
+
+    def message(self, data: dict) -> dict:
+        chat_id = int(data.get("chat_id", 0))
+        message = {
+            "message_id": int(data.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+            "from": BOT_USER,
+            "text": data.get("text") or data.get("caption") or "",
+        }
+        for field in ("photo", "document"):
+            if field in data:
+                file = {"file_id": f"{field}-{message['message_id']}", "file_unique_id": str(message["message_id"])}
+                message[field] = [dict(file, width=800, height=600)] if field == "photo" else file
+        markup = data.get("reply_markup")
+        if markup:
+            message["reply_markup"] = json.loads(markup) if isinstance(markup, str) else markup
+        return message
+
+    async def handle(self, request) -> Response:
+        method = request.path.rsplit("/", 1)[-1]
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method == "getMe":
+            result = BOT_USER
+        elif method in MESSAGE_METHODS:
+            result = self.message(self.parse_body(request))
+        else:
+            result = True
+        return Response(200, json.dumps({"ok": True, "result": result}).encode(), "application/json")
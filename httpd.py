@@ -0,0 +1,132 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Ограничения на входящие запросы
+MAX_HEADER_LINES = 100
+MAX_BODY_SIZE = 10 * 1024 * 1024
+READ_TIMEOUT = 30.0
+
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+# ---------------------- Минимальный HTTP/1.1 сервер ----------------------
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method: str, target: str, headers: dict, body: bytes):
+        self.method = method
+        self.path, _, self.query = target.partition("?")
+        self.headers = headers  # имена заголовков в нижнем регистре
+        self.body = body
+
+
+class Response:
+    __slots__ = ("status", "body", "content_type")
+
+    def __init__(self, status: int = 200, body: bytes = b"", content_type: str = "text/plain; charset=utf-8"):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+
+
+class HTTPServer:
+    """Небольшой асинхронный HTTP-сервер на asyncio.start_server без внешних зависимостей.
+
+    Поддерживает keep-alive и тела запросов с Content-Length — этого достаточно для
+    вебхука Telegram, эндпоинта метрик и локального тестового Bot API.
+    handler(request) — корутина, возвращающая Response."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._server = None
+        self._connections = {}  # writer -> задача соединения
+
+    async def start(self, host: str, port: int) -> None:
+        self._server = await asyncio.start_server(self._serve_connection, host, port)
+        logger.info("HTTP-сервер слушает %s:%s", host, port)
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # Открытые keep-alive соединения закрываем сами, иначе их задачи
+            # повиснут до завершения цикла событий
+            tasks = list(self._connections.values())
+            for writer in list(self._connections):
+                writer.close()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve_connection(self, reader, writer):
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), READ_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                if isinstance(request, Response):
+                    await self._write_response(writer, request, keep_alive=False)
+                    break
+                try:
+                    response = await self.handler(request)
+                except Exception:
+                    logger.exception("Ошибка обработки запроса %s %s", request.method, request.path)
+                    response = Response(500)
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await self._write_response(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            return Response(400)
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            return Response(400)
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            return Response(400)
+        if length < 0:
+            return Response(400)
+        if length > MAX_BODY_SIZE:
+            return Response(413)
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, headers, body)
+
+    @staticmethod
+    async def _write_response(writer, response: Response, keep_alive: bool):
+        head = (f"HTTP/1.1 {response.status} {REASONS.get(response.status, 'OK')}\r\n"
+                f"Content-Type: {response.content_type}\r\n"
+                f"Content-Length: {len(response.body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + response.body)
+        await writer.drain()
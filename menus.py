@@ -0,0 +1,122 @@
+from functools import lru_cache
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+
+# ---------------------- Готовые клавиатуры ----------------------
+class FrozenKeyboard(InlineKeyboardMarkup):
+    """Неизменяемая клавиатура, сериализованная один раз при создании.
+    to_dict() отдаёт готовый словарь вместо обхода кнопок при каждом запросе."""
+
+    __slots__ = ("_serialized",)
+
+    def __init__(self, inline_keyboard):
+        super().__init__(inline_keyboard)
+        with self._unfrozen():
+            self._serialized = super().to_dict()
+
+    def to_dict(self, recursive: bool = True) -> dict:
+        return self._serialized
+
+
+def build_keyboard(rows) -> FrozenKeyboard:
+    """rows — список рядов из пар (текст кнопки, callback_data)."""
+    return FrozenKeyboard([[InlineKeyboardButton(text, callback_data=data) for text, data in row]
+                           for row in rows])
+
+
+# ---------------------- Описание статических меню ----------------------
+# Имя меню -> (текст сообщения, parse_mode, ряды кнопок)
+MENU_SPECS = {
+    "main": ("<b>Главное меню</b>\nВыберите раздел:", "HTML", [
+        [("📅 Расписание", "menu:schedule"), ("📌 События", "menu:events")],
+        [("📥 Входящие", "menu:questions"), ("🚭 Зависимости", "menu:dependencies")],
+    ]),
+    "schedule": ("Выберите день:", None, [
+        [("Понедельник", "sched:day:Понедельник"), ("Вторник", "sched:day:Вторник"),
+         ("Среда", "sched:day:Среда"), ("Четверг", "sched:day:Четверг")],
+        [("Пятница", "sched:day:Пятница"), ("Суббота", "sched:day:Суббота"),
+         ("Воскресенье", "sched:day:Воскресенье"), ("Дата", "sched:date")],
+        [("Назад", "menu:main")],
+    ]),
+    "events": ("События:", None, [
+        [("Добавить событие", "events:add")],
+        [("Просмотреть события", "events:view")],
+        [("Назад", "menu:main")],
+    ]),
+    "questions": ("Входящие:", None, [
+        [("Добавить вопрос", "ques:add")],
+        [("Просмотреть входящие", "ques:view")],
+        [("Назад", "menu:main")],
+    ]),
+    "dependencies": ("Меню зависимостей:", None, [
+        [("Телефон", "menu:dep_phone")],
+        [("Сладкое", "menu:dep_sweets")],
+        [("Плохие слова", "menu:dep_badwords")],
+        [("Назад", "menu:main")],
+    ]),
+    "dep_phone": ("Телефон: выберите действие:", None, [
+        [("Добавить запись", "phone:add")],
+        [("Просмотреть отчёт", "phone:view")],
+        [("📈 Тренды", "phone:trends")],
+        [("Назад", "menu:dependencies")],
+    ]),
+    "dep_sweets": ("Сладкое: выберите действие:", None, [
+        [("Добавить запись", "sweets:add")],
+        [("Просмотреть записи", "sweets:view")],
+        [("📈 Тренды", "sweets:trends")],
+        [("Назад", "menu:dependencies")],
+    ]),
+    "dep_badwords": ("Плохие слова: выберите действие:", None, [
+        [("Добавить запись", "badwords:add")],
+        [("Просмотреть записи", "badwords:view")],
+        [("📈 Тренды", "badwords:trends")],
+        [("Назад", "menu:dependencies")],
+    ]),
+}
+
+
+def build_menus(specs) -> dict:
+    """Собирает готовые ответы меню: имя -> аргументы для reply_text/edit_message_text."""
+    menus = {}
+    for name, (text, parse_mode, rows) in specs.items():
+        payload = {"text": text, "reply_markup": build_keyboard(rows)}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        menus[name] = payload
+    return menus
+
+
+# Строятся один раз при импорте и дальше только переиспользуются
+MENUS = build_menus(MENU_SPECS)
+
+
+@lru_cache(maxsize=None)
+def back_keyboard(callback_data: str) -> FrozenKeyboard:
+    """Клавиатура из одной кнопки "Назад"."""
+    return build_keyboard([[("Назад", callback_data)]])
+
+
+# ---------------------- Шаблоны динамических клавиатур ----------------------
+@lru_cache(maxsize=1024)
+def day_keyboard(day: str, has_schedule: bool) -> FrozenKeyboard:
+    """Кнопки для выбранного дня расписания (день недели или дата "YYYY-MM-DD")."""
+    if has_schedule:
+        rows = [[("Просмотреть", f"sched:view:{day}"), ("Изменить", f"sched:edit:{day}")]]
+    else:
+        rows = [[("Добавить", f"sched:add:{day}")]]
+    rows.append([("Назад", "menu:schedule")])
+    return build_keyboard(rows)
+
+
+@lru_cache(maxsize=1024)
+def page_keyboard(prefix: str, prev_token, next_token, back: str) -> FrozenKeyboard:
+    """Кнопки листания "◀"/"▶" (callback_data — prefix + токен страницы) и "Назад"."""
+    nav = []
+    if prev_token is not None:
+        nav.append(("◀", f"{prefix}{prev_token}"))
+    if next_token is not None:
+        nav.append(("▶", f"{prefix}{next_token}"))
+    rows = [nav] if nav else []
+    rows.append([("Назад", back)])
+    return build_keyboard(rows)
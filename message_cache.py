@@ -0,0 +1,71 @@
+import logging
+from collections import OrderedDict
+
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+
+def markup_key(markup) -> tuple:
+    if markup is None:
+        return ()
+    return tuple(tuple((button.text, button.callback_data, button.url) for button in row)
+                 for row in markup.inline_keyboard)
+
+
+def fingerprint(text: str, reply_markup=None, parse_mode=None) -> int:
+    return hash((text, parse_mode, markup_key(reply_markup)))
+
+
+# ---------------------- Что показано в сообщениях бота ----------------------
+class RenderedMessages:
+    """Помнит отпечаток (хэш текста и клавиатуры) последнего содержимого каждого
+    сообщения бота, чтобы не вызывать editMessageText, когда ничего не меняется:
+    повторное нажатие той же кнопки больше не тратит запрос и не приводит к ошибке
+    "message is not modified".
+
+    Если сообщения нет в памяти (например, после перезапуска), содержимое сверяется
+    с сообщением, пришедшим вместе с нажатием."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._fingerprints = OrderedDict()  # (chat_id, message_id) -> отпечаток
+        self.skipped = 0
+
+    def remember(self, message, value: int) -> None:
+        key = (message.chat_id, message.message_id)
+        self._fingerprints[key] = value
+        self._fingerprints.move_to_end(key)
+        if len(self._fingerprints) > self.max_entries:
+            self._fingerprints.popitem(last=False)
+
+    def unchanged(self, message, value: int, text: str, reply_markup, parse_mode) -> bool:
+        known = self._fingerprints.get((message.chat_id, message.message_id))
+        if known is not None:
+            return known == value
+        # Текст с разметкой Telegram возвращает уже без неё — такие не сверяем
+        return parse_mode is None and message.text == text and message.reply_markup == reply_markup
+
+    async def edit(self, query, text: str, reply_markup=None, parse_mode=None):
+        message = query.message
+        if message is None:  # inline-сообщение: содержимое неизвестно
+            return await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        value = fingerprint(text, reply_markup, parse_mode)
+        if self.unchanged(message, value, text, reply_markup, parse_mode):
+            self.skipped += 1
+            self.remember(message, value)
+            return None
+        try:
+            result = await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        except BadRequest as exc:
+            if "not modified" not in exc.message.lower():
+                raise
+            self.skipped += 1
+            result = None
+        self.remember(message, value)
+        return result
+
+    async def reply(self, message, text: str, reply_markup=None, parse_mode=None):
+        sent = await message.reply_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        self.remember(sent, fingerprint(text, reply_markup, parse_mode))
+        return sent
@@ -0,0 +1,205 @@
+import functools
+import logging
+import time
+from bisect import bisect_left
+
+from telegram.ext import ConversationHandler
+from telegram.request import HTTPXRequest
+
+from httpd import HTTPServer, Response
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм, секунды
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ---------------------- Гистограмма ----------------------
+class Histogram:
+    """Гистограмма в духе Prometheus: наблюдение — один bisect и два сложения,
+    накопленные суммы по корзинам считаются только при выгрузке."""
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # последняя корзина — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def format_labels(labels: tuple, names: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{escape(value)}"' for name, value in zip(names, labels)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ---------------------- Реестр метрик ----------------------
+class Metrics:
+    """Метрики бота: время и число вызовов обработчиков (по обработчику и состоянию
+    диалога), исключения, время запросов к Bot API, а также значения, которые
+    считываются в момент выгрузки (глубина очереди отправки, попадания в кэш и т.п.)."""
+
+    def __init__(self):
+        self.handler_seconds = {}  # (обработчик, состояние) -> Histogram
+        self.handler_errors = {}   # (обработчик, состояние, исключение) -> число
+        self.api_seconds = {}      # метод -> Histogram
+        self.api_errors = {}       # (метод, код) -> число
+        self._gauges = []          # (имя, описание, тип, функция -> {метки: значение} или число)
+
+    def gauge(self, name: str, description: str, read, kind: str = "gauge") -> None:
+        self._gauges.append((name, description, kind, read))
+
+    def observe_handler(self, handler: str, state: str, seconds: float) -> None:
+        histogram = self.handler_seconds.get((handler, state))
+        if histogram is None:
+            histogram = self.handler_seconds[(handler, state)] = Histogram()
+        histogram.observe(seconds)
+
+    def count_handler_error(self, handler: str, state: str, exc: BaseException) -> None:
+        key = (handler, state, type(exc).__name__)
+        self.handler_errors[key] = self.handler_errors.get(key, 0) + 1
+
+    def observe_api(self, method: str, seconds: float, status) -> None:
+        histogram = self.api_seconds.get(method)
+        if histogram is None:
+            histogram = self.api_seconds[method] = Histogram()
+        histogram.observe(seconds)
+        if status != 200:
+            key = (method, str(status))
+            self.api_errors[key] = self.api_errors.get(key, 0) + 1
+
+    # ----- Обёртки -----
+    def timed(self, callback, state: str = ""):
+        """Оборачивает обработчик: время, число вызовов и исключения под именем функции."""
+        name = getattr(callback, "__name__", repr(callback))
+
+        @functools.wraps(callback)
+        async def wrapper(update, context):
+            started = time.perf_counter()
+            try:
+                return await callback(update, context)
+            except Exception as exc:
+                self.count_handler_error(name, state, exc)
+                raise
+            finally:
+                self.observe_handler(name, state, time.perf_counter() - started)
+        return wrapper
+
+    def instrument(self, application, state_names: dict = None, skip=()) -> None:
+        """Оборачивает обработчики всех зарегистрированных в приложении хендлеров.
+        У обработчиков диалогов меткой состояния служит имя состояния из state_names,
+        "entry" для точек входа и "fallback" для запасных обработчиков. Обработчики
+        из skip не оборачиваются — например, диспетчер, маршруты которого уже
+        обёрнуты по отдельности, иначе одно нажатие считалось бы несколько раз."""
+        state_names = state_names or {}
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                if isinstance(handler, ConversationHandler):
+                    for entry in handler.entry_points:
+                        entry.callback = self.timed(entry.callback, "entry")
+                    for state, state_handlers in handler.states.items():
+                        for state_handler in state_handlers:
+                            state_handler.callback = self.timed(
+                                state_handler.callback, state_names.get(state, str(state)))
+                    for fallback in handler.fallbacks:
+                        fallback.callback = self.timed(fallback.callback, "fallback")
+                elif handler.callback not in skip:
+                    handler.callback = self.timed(handler.callback)
+
+    # ----- Выгрузка в текстовом формате Prometheus -----
+    @staticmethod
+    def _histogram_lines(name: str, label_names: tuple, histograms: dict) -> list:
+        lines = []
+        for labels, histogram in sorted(histograms.items()):
+            labels = labels if isinstance(labels, tuple) else (labels,)
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{format_labels(labels, label_names, le)} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels, label_names)} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{format_labels(labels, label_names)} {histogram.count}")
+        return lines
+
+    def render(self) -> str:
+        lines = [
+            "# HELP bot_handler_seconds Время работы обработчика",
+            "# TYPE bot_handler_seconds histogram",
+        ]
+        lines += self._histogram_lines("bot_handler_seconds", ("handler", "state"), self.handler_seconds)
+        lines += ["# HELP bot_handler_errors_total Исключения в обработчиках",
+                  "# TYPE bot_handler_errors_total counter"]
+        lines += [f"bot_handler_errors_total{format_labels(key, ('handler', 'state', 'exception'))} {value}"
+                  for key, value in sorted(self.handler_errors.items())]
+        lines += ["# HELP bot_api_request_seconds Время запроса к Bot API",
+                  "# TYPE bot_api_request_seconds histogram"]
+        lines += self._histogram_lines("bot_api_request_seconds", ("method",), self.api_seconds)
+        lines += ["# HELP bot_api_errors_total Неуспешные ответы Bot API и сетевые ошибки",
+                  "# TYPE bot_api_errors_total counter"]
+        lines += [f"bot_api_errors_total{format_labels(key, ('method', 'status'))} {value}"
+                  for key, value in sorted(self.api_errors.items())]
+        for name, description, kind, read in self._gauges:
+            try:
+                value = read()
+            except Exception:
+                logger.exception("Не удалось считать метрику %s", name)
+                continue
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            if isinstance(value, dict):
+                # {(("метка", "значение"), ...): число}
+                for labels, number in value.items():
+                    label_text = ",".join(f'{key}="{escape(val)}"' for key, val in labels)
+                    lines.append(f"{name}{{{label_text}}} {number}")
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# ---------------------- Запросы к Bot API ----------------------
+class TimedRequest(HTTPXRequest):
+    """HTTPXRequest, который записывает время каждого запроса по имени метода."""
+
+    def __init__(self, metrics: Metrics, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        endpoint = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        status = "error"
+        try:
+            status, payload = await super().do_request(url, method, request_data, *args, **kwargs)
+            return status, payload
+        finally:
+            self.metrics.observe_api(endpoint, time.perf_counter() - started, status)
+
+
+# ---------------------- HTTP-эндпоинт ----------------------
+class MetricsServer:
+    """Отдаёт метрики по GET /metrics."""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self.http = HTTPServer(self.handle)
+
+    async def handle(self, request) -> Response:
+        if request.path != "/metrics":
+            return Response(404)
+        if request.method != "GET":
+            return Response(405)
+        return Response(200, self.metrics.render().encode(), "text/plain; version=0.0.4; charset=utf-8")
+
+    async def start(self, host: str, port: int) -> None:
+        await self.http.start(host, port)
+
+    async def stop(self) -> None:
+        await self.http.stop()
@@ -0,0 +1,271 @@
+import asyncio
+import datetime
+import json
+import logging
+import os
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+# Журнал уплотняется, когда строк в нём больше COMPACT_RATIO × живых записей
+COMPACT_RATIO = 2
+COMPACT_MIN_LINES = 1000
+
+
+# ---------------------- Сериализация user_data ----------------------
+def encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Не сериализуется: {type(value).__name__}")
+
+
+def decode_value(obj: dict):
+    if "$date" in obj:
+        return datetime.date.fromisoformat(obj["$date"])
+    if "$datetime" in obj:
+        return datetime.datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+def dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=encode_value)
+
+
+def loads(text: str):
+    return json.loads(text, object_hook=decode_value)
+
+
+# ---------------------- Журнал состояний ----------------------
+class JournalPersistence(BasePersistence):
+    """Хранит состояния ConversationHandler и user_data в журнале, куда только дописывают.
+
+    Строки журнала:
+        u <user_id> <json>                    — user_data пользователя ("-" — удалены)
+        c <имя диалога> <ключ> <json>         — состояние диалога ("null" — диалог завершён)
+    Пишутся только изменившиеся записи: Application сам отмечает затронутых
+    пользователей и изменённые ключи диалогов, а журнал дополнительно сравнивает
+    user_data с последней записанной версией. Когда строк становится заметно больше,
+    чем живых записей, журнал переписывается начисто (запись во временный файл и
+    атомарная замена).
+
+    При запуске читаются только префиксы строк: для user_data запоминается смещение
+    последней записи, а сами данные разбираются при первом обновлении от пользователя
+    (refresh_user_data). Состояния диалогов — небольшие числа, они загружаются сразу."""
+
+    def __init__(self, path: str, update_interval: float = 10):
+        super().__init__(store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True,
+                                                     callback_data=False),
+                         update_interval=update_interval)
+        self.path = path
+        self._file = None
+        self._lines = 0
+        self._user_offsets = {}  # user_id -> смещение строки с данными, ещё не восстановленными
+        self._user_written = {}  # user_id -> хэш последней записанной версии
+        self._user_lines = {}    # user_id -> смещение последней строки пользователя
+        self._conversations = {}  # имя -> {ключ: состояние}
+        self._lock = asyncio.Lock()
+        self._loaded = False
+        self.restored = 0
+
+    # ----- Чтение журнала -----
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if os.path.exists(self.path):
+            with open(self.path, "rb+") as journal:
+                offset = 0
+                good = 0
+                for raw in journal:
+                    if not raw.endswith(b"\n"):
+                        break  # недописанная строка после сбоя
+                    self._index_line(raw, offset)
+                    offset += len(raw)
+                    good = offset
+                journal.truncate(good)
+        self._file = open(self.path, "ab")
+        logger.info("Журнал состояний %s: %d строк, пользователей %d, диалогов %d", self.path,
+                    self._lines, len(self._user_lines),
+                    sum(len(states) for states in self._conversations.values()))
+
+    def _index_line(self, raw: bytes, offset: int) -> None:
+        self._lines += 1
+        kind, _, rest = raw.partition(b" ")
+        try:
+            if kind == b"u":
+                user_id, _, payload = rest.partition(b" ")
+                user_id = int(user_id)
+                if payload.strip() == b"-":
+                    self._user_offsets.pop(user_id, None)
+                    self._user_lines.pop(user_id, None)
+                else:
+                    self._user_offsets[user_id] = offset
+                    self._user_lines[user_id] = offset
+                    self._user_written.pop(user_id, None)
+            elif kind == b"c":
+                name, key, payload = rest.decode().split(" ", 2)
+                key = tuple(int(part) for part in key.split(","))
+                state = json.loads(payload)
+                states = self._conversations.setdefault(name, {})
+                if state is None:
+                    states.pop(key, None)
+                else:
+                    states[key] = state
+        except ValueError:
+            logger.warning("Пропущена повреждённая строка журнала по смещению %d", offset)
+
+    def _read_user(self, offset: int) -> dict:
+        with open(self.path, "rb") as journal:
+            journal.seek(offset)
+            raw = journal.readline()
+        return loads(raw.split(b" ", 2)[2])
+
+    # ----- Запись -----
+    def _append(self, line: str) -> int:
+        offset = self._file.tell()
+        self._file.write(line.encode() + b"\n")
+        self._file.flush()
+        self._lines += 1
+        return offset
+
+    def _live_records(self) -> int:
+        return len(self._user_lines) + sum(len(states) for states in self._conversations.values())
+
+    def _needs_compaction(self) -> bool:
+        return self._lines > COMPACT_MIN_LINES and self._lines > COMPACT_RATIO * self._live_records()
+
+    def _compact(self) -> None:
+        """Переписывает журнал, оставляя только последние версии записей.
+        Строки user_data копируются как есть, без разбора."""
+        temporary = self.path + ".tmp"
+        self._file.flush()
+        offsets = {}
+        lines = 0
+        with open(self.path, "rb") as source, open(temporary, "wb") as target:
+            for user_id, offset in self._user_lines.items():
+                source.seek(offset)
+                offsets[user_id] = target.tell()
+                target.write(source.readline())
+                lines += 1
+            for name, states in self._conversations.items():
+                for key, state in states.items():
+                    target.write(f"c {name} {','.join(map(str, key))} {json.dumps(state)}\n".encode())
+                    lines += 1
+            target.flush()
+            os.fsync(target.fileno())
+        self._file.close()
+        os.replace(temporary, self.path)
+        self._file = open(self.path, "ab")
+        for user_id in self._user_offsets:
+            self._user_offsets[user_id] = offsets[user_id]
+        self._user_lines = offsets
+        logger.info("Журнал состояний уплотнён: %d → %d строк", self._lines, lines)
+        self._lines = lines
+
+    async def _maybe_compact(self) -> None:
+        if self._needs_compaction():
+            await asyncio.to_thread(self._compact)
+
+    # ----- user_data -----
+    async def get_user_data(self) -> dict:
+        self._load()
+        return {}  # данные подгружаются по одному пользователю в refresh_user_data
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        if user_id not in self._user_offsets:
+            return
+        async with self._lock:
+            offset = self._user_offsets.pop(user_id, None)
+            if offset is None:
+                return
+            stored = self._read_user(offset)
+        # То, что уже успели записать в user_data в этом процессе, новее журнала
+        for key, value in stored.items():
+            user_data.setdefault(key, value)
+        self._user_written[user_id] = hash(dumps(stored))
+        self.restored += 1
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        if user_id in self._user_offsets:
+            return  # пользователь ещё не восстановлен — в журнале актуальная версия
+        text = dumps(data)
+        if self._user_written.get(user_id) == hash(text):
+            return
+        if not data and user_id not in self._user_lines:
+            return
+        async with self._lock:
+            self._user_lines[user_id] = self._append(f"u {user_id} {text}")
+            self._user_written[user_id] = hash(text)
+            await self._maybe_compact()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        async with self._lock:
+            self._user_offsets.pop(user_id, None)
+            self._user_written.pop(user_id, None)
+            if self._user_lines.pop(user_id, None) is not None:
+                self._append(f"u {user_id} -")
+
+    # ----- Состояния диалогов -----
+    async def get_conversations(self, name: str) -> dict:
+        self._load()
+        return dict(self._conversations.get(name, {}))
+
+    async def update_conversation(self, name: str, key: tuple, new_state) -> None:
+        async with self._lock:
+            states = self._conversations.setdefault(name, {})
+            if states.get(key) == new_state:
+                return
+            if new_state is None:
+                if key not in states:
+                    return
+                del states[key]
+            else:
+                states[key] = new_state
+            self._append(f"c {name} {','.join(map(str, key))} {json.dumps(new_state)}")
+            await self._maybe_compact()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if self._file is not None:
+                if self._needs_compaction():
+                    self._compact()
+                self._file.close()
+                self._file = None
+
+    # ----- Не используются: chat_data, bot_data и callback_data не сохраняются -----
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+
+def state_path_for(db_path: str) -> str:
+    """bot.db → bot.state.jsonl; для хранилища в памяти журнал не ведётся."""
+    if db_path == "memory":
+        return ""
+    return os.path.splitext(db_path)[0] + ".state.jsonl"
@@ -0,0 +1,194 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты исходящих запросов: меньше — раньше
+INTERACTIVE = 0  # ответы пользователю (по умолчанию)
+BACKGROUND = 1   # напоминания и прочие фоновые рассылки
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Лимиты Telegram: ~30 сообщений в секунду всего, ~1 в секунду в личный чат,
+# ~20 в минуту в группу
+GLOBAL_RATE = 30.0
+PRIVATE_RATE = 1.0
+PRIVATE_BURST = 3
+GROUP_RATE = 20 / 60
+GROUP_BURST = 5
+
+# Общий лимит касается методов, которые отправляют или меняют сообщения, лимит чата —
+# только новых сообщений (правка меню по нажатию кнопки не ждёт секунду);
+# answerCallbackQuery, getMe и т.п. проходят сразу
+LIMITED_PREFIXES = ("send", "edit", "copy", "forward")
+CHAT_LIMITED_PREFIXES = ("send", "copy", "forward")
+
+
+# ---------------------- Корзина токенов ----------------------
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "stamp")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def delay(self, now: float) -> float:
+        """Сколько секунд ждать до появления целого токена."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def reserve(self, now: float) -> float:
+        """Забирает токен "в долг" и возвращает, сколько ждать до его появления.
+        Запросы одного чата так выстраиваются в очередь без отдельного списка."""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, now: float, seconds: float) -> None:
+        """Ответ RetryAfter: ни одного токена в ближайшие seconds секунд."""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+# ---------------------- Очередь исходящих запросов ----------------------
+class PriorityRateLimiter(BaseRateLimiter):
+    """Ограничитель исходящих запросов к Bot API.
+
+    Сначала запрос ждёт токен своего чата (порядок внутри чата сохраняется), затем —
+    общий токен. Общие токены раздаются по приоритету: ответы пользователям обгоняют
+    фоновые рассылки, внутри приоритета — по очереди. Приоритет задаётся через
+    rate_limit_args={"priority": BACKGROUND}. На RetryAfter запрос повторяется после
+    паузы (для чата или, если чата нет, для всех), не больше max_retries раз."""
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, max_retries: int = 3):
+        self.global_rate = global_rate
+        self.max_retries = max_retries
+        self._global = None
+        self._chats = {}   # chat_id -> TokenBucket
+        self._waiters = []  # куча (приоритет, порядковый номер, future)
+        self._seq = itertools.count()
+        self._pump = None
+        # Метрики
+        self.depth = dict.fromkeys(PRIORITY_NAMES, 0)
+        self.sent = dict.fromkeys(PRIORITY_NAMES, 0)
+        self.retries = 0
+        self.max_wait = 0.0
+
+    async def initialize(self) -> None:
+        self._global = TokenBucket(self.global_rate, self.global_rate)
+
+    async def shutdown(self) -> None:
+        if self._pump is not None:
+            self._pump.cancel()
+            self._pump = None
+        for _, _, future in self._waiters:
+            future.cancel()
+        self._waiters.clear()
+
+    def snapshot(self) -> dict:
+        return {
+            "queued": {PRIORITY_NAMES[p]: n for p, n in self.depth.items()},
+            "sent": {PRIORITY_NAMES[p]: n for p, n in self.sent.items()},
+            "retries": self.retries,
+            "max_wait": round(self.max_wait, 3),
+            "chats": len(self._chats),
+        }
+
+    def _chat_bucket(self, chat_id, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10000:
+                # Забываем чаты с полной корзиной — их состояние ничем не отличается от нового
+                self._chats = {key: b for key, b in self._chats.items() if not b.idle(now)}
+            group = isinstance(chat_id, str) or chat_id < 0
+            bucket = self._chats[chat_id] = (TokenBucket(GROUP_RATE, GROUP_BURST) if group
+                                             else TokenBucket(PRIVATE_RATE, PRIVATE_BURST))
+        return bucket
+
+    async def _acquire_global(self, priority: int) -> None:
+        if not self._waiters and self._global.delay(time.monotonic()) == 0:
+            self._global.take(time.monotonic())
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run_pump(), name="rate-limiter")
+        await future
+
+    async def _run_pump(self) -> None:
+        waiters = self._waiters
+        while waiters:
+            if waiters[0][2].done():  # ожидающий отменён
+                heapq.heappop(waiters)
+                continue
+            delay = self._global.delay(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            self._global.take(time.monotonic())
+            heapq.heappop(waiters)[2].set_result(None)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if not endpoint.startswith(LIMITED_PREFIXES):
+            return await callback(*args, **kwargs)
+        priority = (rate_limit_args or {}).get("priority", INTERACTIVE)
+        target = data.get("chat_id")
+        chat_id = target if endpoint.startswith(CHAT_LIMITED_PREFIXES) else None
+        started = time.monotonic()
+        queued = True
+        self.depth[priority] += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                if chat_id is not None:
+                    now = time.monotonic()
+                    delay = self._chat_bucket(chat_id, now).reserve(now)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await self._acquire_global(priority)
+                if queued:
+                    queued = False
+                    self.depth[priority] -= 1
+                    self.max_wait = max(self.max_wait, time.monotonic() - started)
+                try:
+                    result = await callback(*args, **kwargs)
+                except RetryAfter as exc:
+                    if attempt == self.max_retries:
+                        raise
+                    self.retries += 1
+                    # Каждая следующая попытка ждёт чуть дольше запрошенного
+                    pause = exc.retry_after
+                    pause = (pause.total_seconds() if hasattr(pause, "total_seconds") else float(pause))
+                    pause *= 1 + 0.5 * attempt
+                    logger.warning("RetryAfter для %s (чат %s): пауза %.1f с", endpoint, target, pause)
+                    now = time.monotonic()
+                    if target is None:
+                        self._global.pause(now, pause)
+                    else:
+                        self._chat_bucket(target, now).pause(now, pause)
+                        if chat_id is None:  # правки не ждут токен чата — ждём паузу сами
+                            await asyncio.sleep(pause)
+                    continue
+                self.sent[priority] += 1
+                return result
+        finally:
+            if queued:  # запрос отменён, не дождавшись очереди
+                self.depth[priority] -= 1
@@ -0,0 +1,120 @@
+import asyncio
+import datetime
+import heapq
+import logging
+import time
+from itertools import groupby
+from operator import itemgetter
+
+from rate_limiter import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------- Напоминания о событиях ----------------------
+class ReminderScheduler:
+    """Планировщик напоминаний на min-куче по времени срабатывания.
+
+    Элемент кучи — (время, id события, chat_id, описание). Задача спит до ближайшего
+    срабатывания (или до появления более раннего события) и за один проход
+    отправляет все напоминания, время которых наступило: по одному сообщению на чат.
+    При запуске куча строится из хранилища одним heapify за O(n)."""
+
+    def __init__(self, storage, bot, remind_at: datetime.time = datetime.time(9, 0)):
+        self.storage = storage
+        self.bot = bot
+        self.remind_at = remind_at
+        self._heap = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def due_time(self, date: datetime.date) -> float:
+        return datetime.datetime.combine(date, self.remind_at).timestamp()
+
+    def schedule(self, chat_id: int, event_id: int, date: str, description: str) -> None:
+        day = datetime.date.fromisoformat(date)
+        if day < datetime.date.today():
+            return
+        due = self.due_time(day)
+        heapq.heappush(self._heap, (due, event_id, chat_id, description))
+        if self._heap[0][1] == event_id:
+            # Новое событие раньше всех остальных — будим задачу, чтобы пересчитать сон
+            self._wakeup.set()
+
+    def on_storage_change(self, chat_id: int, kind: str, record) -> None:
+        if kind == "events" and record is not None:
+            event_id, date, description = record
+            self.schedule(chat_id, event_id, date, description)
+
+    async def start(self) -> None:
+        today = datetime.date.today()
+        now = time.time()
+        rows = await self.storage.list_upcoming_events(today)
+        due_time = self.due_time
+        fromisoformat = datetime.date.fromisoformat
+        # Уже прошедшие сегодня напоминания не повторяем после перезапуска
+        heap = [(due_time(fromisoformat(date)), event_id, chat_id, description)
+                for chat_id, event_id, date, description in rows]
+        self._heap = [item for item in heap if item[0] > now]
+        heapq.heapify(self._heap)
+        self.storage.add_listener(self.on_storage_change)
+        self._task = asyncio.create_task(self._run(), name="reminders")
+        logger.info("Запланировано напоминаний: %d", len(self._heap))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def pop_due(self, now: float) -> list:
+        """Снимает с кучи все напоминания со временем не позже now."""
+        batch = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            batch.append(heapq.heappop(heap))
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            batch = self.pop_due(time.time())
+            try:
+                await self.deliver(batch)
+            except Exception:
+                logger.exception("Ошибка отправки напоминаний")
+
+    async def deliver(self, batch: list) -> None:
+        batch.sort(key=itemgetter(2, 0, 1))
+        sends = []
+        for chat_id, items in groupby(batch, key=itemgetter(2)):
+            lines = ["🔔 Напоминание о событиях на сегодня:"]
+            lines.extend(f"• {description}" for _, _, _, description in items)
+            sends.append(self._send(chat_id, "\n".join(lines)))
+        await asyncio.gather(*sends)
+
+    async def _send(self, chat_id: int, text: str) -> None:
+        try:
+            # Напоминания — фоновая рассылка: ответы пользователям идут раньше
+            if getattr(self.bot, "rate_limiter", None) is not None:
+                await self.bot.send_message(chat_id, text, rate_limit_args={"priority": BACKGROUND})
+            else:
+                await self.bot.send_message(chat_id, text)
+        except Exception as exc:
+            logger.warning("Не удалось отправить напоминание в чат %s: %s", chat_id, exc)
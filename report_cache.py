@@ -0,0 +1,50 @@
+from collections import OrderedDict
+
+
+# ---------------------- Кэш готовых отчётов ----------------------
+class ReportCache:
+    """Кэш отрисованных ответов (текст и клавиатура) по чату и виду отчёта.
+
+    Вид отчёта совпадает с видом данных хранилища ("events", "phone", ...), поэтому
+    запись в хранилище сбрасывает ровно те отчёты, которые от неё зависят.
+    Внутри вида ответы различаются ключом (день расписания, страница списка).
+    Отчёты за скользящее окно дат запоминают день отрисовки и устаревают
+    при смене дня."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (chat_id, view) -> {key: (day, payload)}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chat_id: int, view: str, key=None, day=None):
+        bucket = self._entries.get((chat_id, view))
+        if bucket is not None:
+            cached = bucket.get(key)
+            if cached is not None and cached[0] == day:
+                self._entries.move_to_end((chat_id, view))
+                self.hits += 1
+                return cached[1]
+        self.misses += 1
+        return None
+
+    def put(self, chat_id: int, view: str, payload, key=None, day=None) -> None:
+        bucket = self._entries.get((chat_id, view))
+        if bucket is None:
+            bucket = self._entries[(chat_id, view)] = {}
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end((chat_id, view))
+        bucket[key] = (day, payload)
+
+    def invalidate(self, chat_id: int, view: str) -> None:
+        self._entries.pop((chat_id, view), None)
+
+    async def get_or_render(self, chat_id: int, view: str, render, key=None, day=None):
+        """Возвращает ответ из кэша или отрисовывает его через await render()."""
+        payload = self.get(chat_id, view, key, day)
+        if payload is None:
+            payload = await render()
+            self.put(chat_id, view, payload, key, day)
+        return payload
@@ -0,0 +1,83 @@
+import asyncio
+import datetime
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Меньше любого chat_id (в том числе отрицательных id групп): начало обхода
+MIN_CHAT_ID = -(2 ** 63)
+
+
+# ---------------------- Сжатие истории ----------------------
+class RetentionEngine:
+    """Фоновое сжатие истории по storage.compact.
+
+    Раз в interval секунд обрабатывает следующие chats_per_tick чатов (по возрастанию
+    chat_id, после последнего — снова с начала), в каждом — не больше rows_per_chat
+    строк каждого вида. Работа за такт ограничена, поэтому отчёты и запись не ждут
+    сжатия; большая накопленная история сворачивается за несколько проходов.
+    Нулевой горизонт отключает соответствующий шаг."""
+
+    def __init__(self, storage, raw_days: int, weekly_days: int, events_days: int,
+                 interval: float = 60, chats_per_tick: int = 50, rows_per_chat: int = 5000):
+        self.storage = storage
+        self.raw_days = raw_days
+        self.weekly_days = weekly_days
+        self.events_days = events_days
+        self.interval = interval
+        self.chats_per_tick = chats_per_tick
+        self.rows_per_chat = rows_per_chat
+        self._cursor = MIN_CHAT_ID
+        self._task = None
+        self.compacted = Counter()  # вид -> свёрнуто или перенесено строк
+        self.passes = 0             # завершённые проходы по всем чатам
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.raw_days or self.weekly_days or self.events_days)
+
+    def cutoffs(self, today: datetime.date) -> tuple:
+        """(raw_before, weekly_before, events_before) для storage.compact; weekly_before —
+        понедельник, чтобы недели сворачивались целиком."""
+        raw_before = today - datetime.timedelta(days=self.raw_days) if self.raw_days else None
+        weekly_before = None
+        if self.weekly_days:
+            weekly_before = today - datetime.timedelta(days=self.weekly_days)
+            weekly_before -= datetime.timedelta(days=weekly_before.weekday())
+        events_before = today - datetime.timedelta(days=self.events_days) if self.events_days else None
+        return raw_before, weekly_before, events_before
+
+    async def tick(self, today: datetime.date = None) -> int:
+        """Один такт: сжимает очередную порцию чатов; возвращает число обработанных чатов."""
+        cutoffs = self.cutoffs(today or datetime.date.today())
+        chats = await self.storage.chats_after(self._cursor, self.chats_per_tick)
+        for chat_id in chats:
+            self.compacted.update(await self.storage.compact(chat_id, *cutoffs, self.rows_per_chat))
+        if len(chats) < self.chats_per_tick:
+            self._cursor = MIN_CHAT_ID
+            self.passes += 1
+        else:
+            self._cursor = chats[-1]
+        return len(chats)
+
+    async def start(self) -> None:
+        if self.enabled:
+            self._task = asyncio.create_task(self._run(), name="retention")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Ошибка сжатия истории")
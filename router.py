@@ -0,0 +1,84 @@
+import logging
+from functools import lru_cache
+
+from telegram import Update
+from telegram.ext import CallbackQueryHandler, ContextTypes
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------- Формат callback_data ----------------------
+# callback_data кнопок имеет вид "раздел:действие[:аргумент]", например
+# "menu:events", "sched:view:Понедельник", "events:view:42".
+@lru_cache(maxsize=4096)
+def parse_callback(data: str) -> tuple:
+    """Разбирает callback_data в (раздел, действие, аргумент); аргумент — "" если его нет."""
+    namespace, _, rest = data.partition(":")
+    action, _, arg = rest.partition(":")
+    return namespace, action, arg
+
+
+def callback_arg(update: Update) -> str:
+    return parse_callback(update.callback_query.data)[2]
+
+
+# ---------------------- Ответ на нажатие ----------------------
+# Telegram показывает "часики" на кнопке, пока бот не вызовет answerCallbackQuery.
+# Обработчик регистрируется в группе -1 и отвечает на каждое нажатие сразу, не дожидаясь
+# обработчиков в других группах, — отдельные обработчики query.answer() не вызывают.
+async def answer_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    context.application.create_task(update.callback_query.answer(), update=update)
+
+
+def answer_handler() -> CallbackQueryHandler:
+    return CallbackQueryHandler(answer_callback_query)
+
+
+# ---------------------- Маршрутизатор ----------------------
+class CallbackRouter:
+    """Единая точка диспетчеризации нажатий кнопок.
+
+    Вместо цепочки CallbackQueryHandler с регулярными выражениями callback_data
+    разбирается один раз, а обработчик ищется в словаре по (раздел, действие).
+    Нажатия без маршрута логируются и подсчитываются."""
+
+    def __init__(self):
+        self._routes = {}
+        self.unroutable = 0
+
+    def route(self, namespace: str, action: str, callback) -> None:
+        key = (namespace, action)
+        if key in self._routes:
+            raise ValueError(f"Маршрут {namespace}:{action} уже зарегистрирован")
+        self._routes[key] = callback
+
+    def wrap_routes(self, wrap) -> None:
+        """Заменяет каждый обработчик маршрута на wrap(обработчик), например для метрик."""
+        self._routes = {key: wrap(callback) for key, callback in self._routes.items()}
+
+    @staticmethod
+    def matcher(namespace: str, *actions: str):
+        """Фильтр callback_data для точек входа ConversationHandler."""
+        def match(data) -> bool:
+            if not isinstance(data, str):
+                return False
+            parsed = parse_callback(data)
+            return parsed[0] == namespace and parsed[1] in actions
+        return match
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        namespace, action, _ = parse_callback(query.data or "")
+        callback = self._routes.get((namespace, action))
+        if callback is None:
+            self.unroutable += 1
+            logger.warning("Нет маршрута для callback_data %r (chat %s)", query.data,
+                           update.effective_chat.id if update.effective_chat else None)
+            # На нажатие уже ответил answer_callback_query, поэтому пишем сообщением
+            if query.message is not None:
+                await query.message.reply_text("Эта кнопка больше не работает. Откройте меню заново: /start")
+            return None
+        return await callback(update, context)
+
+    def handler(self) -> CallbackQueryHandler:
+        return CallbackQueryHandler(self.dispatch)
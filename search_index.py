@@ -0,0 +1,155 @@
+import re
+from collections import OrderedDict
+
+# Окончания, которые отбрасываются при нормализации слова (сначала длинные).
+# Это не полноценный стеммер: цель — чтобы "торт", "торта" и "тортами" совпадали.
+REFLEXIVE = ("ся", "сь")
+ENDINGS = tuple(sorted((
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ией",
+    "ать", "ять", "еть", "ить", "ем", "им", "ый", "ий", "ой", "ая", "яя", "ое", "ее", "ые", "ие",
+    "ых", "их", "ую", "юю", "ом", "ам", "ям", "ах", "ях", "ов", "ев", "ей", "ия", "ью", "ию", "ть",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й", "s",
+), key=len, reverse=True))
+MIN_STEM = 3
+WORD = re.compile(r"\w+")
+
+# Виды данных с текстом; телефон (только часы) не индексируется
+INDEXED_KINDS = ("schedule", "events", "questions", "sweets", "badwords")
+
+
+def stem(word: str) -> str:
+    for suffix in REFLEXIVE:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            word = word[:-len(suffix)]
+            break
+    for suffix in ENDINGS:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def terms(text: str) -> set:
+    """Нормализованные слова текста: нижний регистр, ё → е, без окончаний."""
+    return {stem(word) for word in WORD.findall(text.lower().replace("ё", "е"))}
+
+
+def document(kind: str, record) -> tuple:
+    """Запись хранилища (формат подписчика или bulk_insert) → (вид, дата, текст);
+    None, если искать в ней нечего."""
+    if kind == "schedule":
+        return kind, record[0], record[1]
+    if kind == "events":
+        return kind, record[-2], record[-1]
+    if kind == "questions":
+        return kind, "", record[-1]
+    if kind in ("sweets", "badwords"):
+        return kind, record[0], record[1]
+    return None
+
+
+class ChatIndex:
+    """Обратный индекс одного чата: слово → номера документов. Номера растут в порядке
+    индексации (при построении — по видам, дальше — по мере записи), выдача идёт
+    по убыванию номера: сначала добавленное позже."""
+    __slots__ = ("postings", "docs", "schedule_docs", "next_id")
+
+    def __init__(self):
+        self.postings = {}       # слово -> set(номер документа)
+        self.docs = {}           # номер -> (вид, дата, текст)
+        self.schedule_docs = {}  # день расписания -> номер (расписание дня перезаписывается)
+        self.next_id = 0
+
+    def add(self, doc: tuple) -> None:
+        kind, date, text = doc
+        if kind == "schedule":
+            old = self.schedule_docs.pop(date, None)
+            if old is not None:
+                self.remove(old)
+        doc_id = self.next_id
+        self.next_id += 1
+        self.docs[doc_id] = doc
+        if kind == "schedule":
+            self.schedule_docs[date] = doc_id
+        for term in terms(text):
+            self.postings.setdefault(term, set()).add(doc_id)
+
+    def remove(self, doc_id: int) -> None:
+        _, _, text = self.docs.pop(doc_id)
+        for term in terms(text):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.discard(doc_id)
+                if not postings:
+                    del self.postings[term]
+
+    def search(self, query_terms: set) -> list:
+        """Номера документов, где есть все слова запроса, по убыванию."""
+        if not query_terms:
+            return []
+        postings = [self.postings.get(term) for term in query_terms]
+        if not all(postings):
+            return []
+        postings.sort(key=len)
+        found = postings[0].intersection(*postings[1:])
+        return sorted(found, reverse=True)
+
+
+# ---------------------- Поиск по всем данным чата ----------------------
+class SearchIndex:
+    """Индексы чатов для /search.
+
+    Индекс чата строится при первом поиске (один проход по storage.export_rows) и
+    дальше обновляется подписчиком хранилища при каждой записи. В памяти держится
+    не больше max_chats индексов, давно не использованные вытесняются и при
+    следующем поиске строятся заново."""
+
+    def __init__(self, max_chats: int = 1000):
+        self.max_chats = max_chats
+        self._chats = OrderedDict()  # chat_id -> ChatIndex
+        self._building = {}          # chat_id -> была ли запись во время построения
+        self.builds = 0
+
+    def __len__(self) -> int:
+        return len(self._chats)
+
+    def on_storage_change(self, chat_id: int, kind: str, record) -> None:
+        if chat_id in self._building:
+            self._building[chat_id] = True
+        if record is None:
+            # Сжатие истории (storage.compact): индекс чата строится заново при следующем поиске
+            self._chats.pop(chat_id, None)
+            return
+        index = self._chats.get(chat_id)
+        if index is not None:
+            doc = document(kind, record)
+            if doc is not None:
+                index.add(doc)
+
+    async def _build(self, storage, chat_id: int) -> ChatIndex:
+        index = ChatIndex()
+        self._building[chat_id] = False
+        try:
+            for kind in INDEXED_KINDS:
+                async for row in storage.export_rows(chat_id, kind):
+                    index.add(document(kind, row))
+            changed = self._building[chat_id]
+        finally:
+            del self._building[chat_id]
+        self.builds += 1
+        if not changed:
+            # Если данные менялись во время построения, индекс используется один раз
+            # и не сохраняется — следующий поиск построит его заново
+            self._chats[chat_id] = index
+            if len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        return index
+
+    async def search(self, storage, chat_id: int, query: str, offset: int = 0, limit: int = 10) -> tuple:
+        """Совпадения запроса в чате: (всего, [(вид, дата, текст)] начиная с offset)."""
+        index = self._chats.get(chat_id)
+        if index is None:
+            index = await self._build(storage, chat_id)
+        else:
+            self._chats.move_to_end(chat_id)
+        found = index.search(terms(query))
+        return len(found), [index.docs[doc_id] for doc_id in found[offset:offset + limit]]
@@ -0,0 +1,206 @@
+"""Запуск бота в нескольких процессах.
+
+Передний процесс получает обновления (long polling или вебхук) и по chat_id
+раздаёт их N рабочим процессам через multiprocessing-очереди. Каждый рабочий —
+обычное приложение из bot.build_application со своей частью хранилища
+(bot.db → bot.0-of-4.db, ...) и своими состояниями диалогов: все обновления
+одного чата всегда попадают в один и тот же процесс и в том же порядке.
+
+Раздел хранилища определяется chat_id % N, поэтому при смене --workers данные
+остаются в файлах со старым N. Общий лимит отправки (--global-rate) делится
+между рабочими поровну.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+
+from telegram import Bot, Update
+
+from webhook import WebhookServer
+
+logger = logging.getLogger(__name__)
+
+POLL_TIMEOUT = 30
+SUPERVISE_INTERVAL = 1.0
+STOP_TIMEOUT = 10.0
+
+
+def shard_of(chat_id: int, workers: int) -> int:
+    return chat_id % workers
+
+
+def shard_path(db_path: str, index: int, workers: int) -> str:
+    if db_path == "memory":
+        return db_path
+    stem, ext = os.path.splitext(db_path)
+    return f"{stem}.{index}-of-{workers}{ext}"
+
+
+def update_shard(update: Update, workers: int) -> int:
+    """Чат обновления; для обновлений без чата (inline-запросы) — пользователь."""
+    if update.effective_chat is not None:
+        return shard_of(update.effective_chat.id, workers)
+    if update.effective_user is not None:
+        return shard_of(update.effective_user.id, workers)
+    return 0
+
+
+# ---------------------- Рабочий процесс ----------------------
+def worker_main(index: int, workers: int, config, queue) -> None:
+    # Ctrl+C из терминала получают все процессы группы; рабочие останавливаются
+    # только по сигналу переднего процесса, дообработав свою очередь
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import bot
+    from storage import create_storage
+
+    config.db_path = shard_path(config.db_path, index, workers)
+    if config.state_path:
+        config.state_path = shard_path(config.state_path, index, workers)
+    config.global_rate = config.global_rate / workers
+    if config.metrics_port:
+        config.metrics_port += index
+    bot.use_storage(create_storage(config.db_path))
+    application = bot.build_application(config)
+    logger.info("Рабочий %d/%d запущен, хранилище %s", index, workers, config.db_path)
+    asyncio.run(serve_worker(application, queue))
+
+
+async def serve_worker(application, queue) -> None:
+    loop = asyncio.get_running_loop()
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    try:
+        await application.start()
+        while True:
+            data = await loop.run_in_executor(None, queue.get)
+            if data is None:
+                break
+            application.update_queue.put_nowait(Update.de_json(data, application.bot))
+        await application.update_queue.join()
+    finally:
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+# ---------------------- Передний процесс ----------------------
+class ShardedWebhookServer(WebhookServer):
+    """Вебхук переднего процесса: application здесь — Front."""
+
+    async def deliver(self, update: Update, data: dict) -> None:
+        self.application.dispatch(update, data)
+
+
+class Front:
+    """Получает обновления и раскладывает их по очередям рабочих процессов."""
+
+    def __init__(self, config):
+        self.config = config
+        self.workers = config.workers
+        kwargs = {"base_url": config.api_base_url} if config.api_base_url else {}
+        self.bot = Bot(config.token, **kwargs)
+        self._context = multiprocessing.get_context("spawn")
+        self.queues = [self._context.Queue() for _ in range(self.workers)]
+        self.processes = [None] * self.workers
+        self.dispatched = [0] * self.workers
+        self.offset = None
+        self._stopping = False
+
+    def dispatch(self, update: Update, data: dict) -> None:
+        index = update_shard(update, self.workers)
+        self.dispatched[index] += 1
+        self.queues[index].put(data)
+
+    def _spawn(self, index: int) -> None:
+        process = self._context.Process(target=worker_main, name=f"bot-worker-{index}",
+                                        args=(index, self.workers, self.config, self.queues[index]))
+        process.start()
+        self.processes[index] = process
+
+    async def supervise(self) -> None:
+        """Перезапускает упавшие рабочие процессы; их очередь при этом сохраняется."""
+        while not self._stopping:
+            for index, process in enumerate(self.processes):
+                if not process.is_alive() and not self._stopping:
+                    logger.error("Рабочий %d завершился с кодом %s, перезапуск", index, process.exitcode)
+                    self._spawn(index)
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+
+    async def poll(self) -> None:
+        await self.bot.delete_webhook()
+        while True:
+            try:
+                updates = await self.bot.get_updates(offset=self.offset, timeout=POLL_TIMEOUT,
+                                                     allowed_updates=Update.ALL_TYPES)
+            except Exception as exc:
+                logger.warning("Ошибка getUpdates: %s", exc)
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                self.dispatch(update, update.to_dict())
+                self.offset = update.update_id + 1
+
+    async def serve(self) -> None:
+        config = self.config
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        for index in range(self.workers):
+            self._spawn(index)
+        await self.bot.initialize()
+        tasks = [asyncio.create_task(self.supervise(), name="supervise")]
+        server = None
+        try:
+            if config.mode == "webhook":
+                server = ShardedWebhookServer(self, config.webhook_path, config.webhook_secret)
+                await server.start(config.webhook_listen, config.webhook_port)
+                if config.webhook_url:
+                    await self.bot.set_webhook(
+                        url=config.webhook_url,
+                        secret_token=config.webhook_secret or None,
+                        allowed_updates=Update.ALL_TYPES,
+                        max_connections=max(1, min(config.concurrency * self.workers, 100)),
+                    )
+            else:
+                tasks.append(asyncio.create_task(self.poll(), name="poll"))
+            logger.info("Обновления распределяются между %d рабочими процессами", self.workers)
+            await stop.wait()
+        finally:
+            self._stopping = True
+            if server is not None:
+                await server.stop()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.offset is not None:
+                # Подтверждаем полученные обновления, чтобы после перезапуска они не пришли снова
+                try:
+                    await self.bot.get_updates(offset=self.offset, timeout=0)
+                except Exception as exc:
+                    logger.warning("Не удалось подтвердить обновления: %s", exc)
+            await self.bot.shutdown()
+            await self.stop_workers()
+
+    async def stop_workers(self) -> None:
+        for queue in self.queues:
+            queue.put(None)
+        loop = asyncio.get_running_loop()
+        for index, process in enumerate(self.processes):
+            await loop.run_in_executor(None, process.join, STOP_TIMEOUT)
+            if process.is_alive():
+                logger.warning("Рабочий %d не остановился за %s с, завершаем принудительно", index, STOP_TIMEOUT)
+                process.terminate()
+        logger.info("Обработано обновлений по рабочим: %s", self.dispatched)
+
+
+def run_sharded(config) -> None:
+    asyncio.run(Front(config).serve())
@@ -0,0 +1,1092 @@
+import asyncio
+import datetime
+import itertools
+import json
+import logging
+import sqlite3
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------- Базовый интерфейс хранилища ----------------------
+class Storage:
+    """Интерфейс хранилища данных бота. Все методы асинхронные, чтобы
+    реализации с дисковым вводом-выводом не блокировали цикл событий.
+
+    После каждой записи вызываются подписчики listener(chat_id, kind, record), где kind —
+    "schedule", "events", "questions", "phone", "sweets" или "badwords", а record —
+    записанные данные: (day, text), (id, date, description), (id, text),
+    (date, hours) или (date, text) соответственно; даты — строки "YYYY-MM-DD"."""
+
+    def __init__(self):
+        self._listeners = []
+
+    def add_listener(self, listener) -> None:
+        self._listeners.append(listener)
+
+    def _notify(self, chat_id: int, kind: str, record=None) -> None:
+        for listener in self._listeners:
+            listener(chat_id, kind, record)
+
+    async def open(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    # Все данные разделены по чатам: чтение и запись затрагивают только раздел chat_id.
+
+    # Расписание
+    async def get_schedule(self, chat_id: int, day: str):
+        raise NotImplementedError
+
+    async def set_schedule(self, chat_id: int, day: str, text: str) -> None:
+        raise NotImplementedError
+
+    # События
+    async def add_event(self, chat_id: int, date, description: str) -> int:
+        """Добавляет событие и возвращает его id."""
+        raise NotImplementedError
+
+    async def list_upcoming_events(self, since) -> list:
+        """События всех чатов с датой не раньше since: (chat_id, id, "YYYY-MM-DD", description)."""
+        raise NotImplementedError
+
+    def iter_events(self, chat_id: int, start: int = 0, reverse: bool = False):
+        """Асинхронный генератор событий (id, "YYYY-MM-DD", description) в порядке добавления.
+        Вперёд — начиная с id >= start, назад (reverse) — с id < start по убыванию."""
+        raise NotImplementedError
+
+    # Вопросы
+    async def add_question(self, chat_id: int, text: str) -> None:
+        raise NotImplementedError
+
+    def iter_questions(self, chat_id: int, start: int = 0, reverse: bool = False):
+        """Асинхронный генератор вопросов (id, text); курсор start — как в iter_events."""
+        raise NotImplementedError
+
+    # Зависимости
+    async def add_phone_usage(self, chat_id: int, date, hours: float) -> None:
+        raise NotImplementedError
+
+    async def phone_daily_totals(self, chat_id: int, start, end) -> list:
+        """Суммы часов по дням в диапазоне дат [start, end]:
+        список пар ("YYYY-MM-DD", сумма) в порядке возрастания даты."""
+        raise NotImplementedError
+
+    async def phone_total(self, chat_id: int, start, end) -> float:
+        """Суммарные часы за диапазон дат [start, end]."""
+        raise NotImplementedError
+
+    async def add_sweets_entry(self, chat_id: int, date, item: str) -> None:
+        raise NotImplementedError
+
+    async def list_sweets_entries(self, chat_id: int, start, end) -> list:
+        """Записи о сладком за [start, end]: пары ("YYYY-MM-DD", item) по возрастанию даты."""
+        raise NotImplementedError
+
+    async def add_bad_word(self, chat_id: int, date, word: str) -> None:
+        raise NotImplementedError
+
+    async def list_bad_words(self, chat_id: int, start, end) -> list:
+        """Плохие слова за [start, end]: пары ("YYYY-MM-DD", word) по возрастанию даты."""
+        raise NotImplementedError
+
+    async def daily_counts(self, chat_id: int, kind: str, start, end) -> list:
+        """Число записей по дням за [start, end] для "sweets" или "badwords":
+        пары ("YYYY-MM-DD", число) по возрастанию даты, дни без записей пропущены."""
+        raise NotImplementedError
+
+    # Хранение истории
+    async def chats_after(self, chat_id: int, limit: int) -> list:
+        """До limit чатов с данными, у которых chat_id больше заданного, по возрастанию —
+        чтобы обходить все чаты порциями."""
+        raise NotImplementedError
+
+    async def compact(self, chat_id: int, raw_before, weekly_before, events_before, max_rows: int) -> dict:
+        """Сжимает историю чата (None отключает шаг):
+        - записи сладкого и плохих слов раньше raw_before остаются только числом по дням,
+          отдельные часы телефона — только суммой по дням;
+        - суммы по дням раньше weekly_before (понедельник) сводятся в суммы по неделям,
+          записанные на понедельник;
+        - события раньше events_before уходят в архив: их нет в списке событий,
+          но они выгружаются и находятся поиском.
+        За вызов обрабатывается не больше max_rows строк каждого вида на каждом шаге (целыми
+        днями, при сведении в недели — целыми неделями), остаток — при следующем вызове;
+        уже свёрнутые недели повторно не читаются. Подписчики получают (chat_id, вид, None) по каждому
+        изменённому виду. Возвращает {вид: число свёрнутых или перенесённых строк}."""
+        raise NotImplementedError
+
+    # Массовая запись и выгрузка
+    async def bulk_insert(self, chat_id: int, batch: dict) -> dict:
+        """Записывает сразу много строк одной транзакцией. batch — {вид: [строки]}, строки
+        по видам: schedule (day, text), events ("YYYY-MM-DD", description),
+        questions (text,), phone ("YYYY-MM-DD", hours), sweets и badwords ("YYYY-MM-DD", text).
+        Подписчики получают каждую запись, как при обычной записи.
+        Возвращает {вид: число записанных строк}."""
+        raise NotImplementedError
+
+    async def existing_counts(self, chat_id: int, kind: str, keys: list) -> dict:
+        """Сколько таких строк уже есть в чате, для импорта без дублей. Ключи — строки
+        bulk_insert для events (вместе с архивом), questions, sweets и badwords; для phone —
+        даты "YYYY-MM-DD", а значения — суммы часов за день. Возвращает {ключ: число};
+        ключей без совпадений в ответе может не быть, лишние не мешают."""
+        raise NotImplementedError
+
+    def export_rows(self, chat_id: int, kind: str):
+        """Асинхронный генератор всех строк вида kind в формате bulk_insert; для phone —
+        суммы по дням, для events — вместе с архивом. Свёрнутые compact записи сладкого и
+        плохих слов (только числа по дням) не выгружаются. Строки читаются порциями,
+        весь раздел в память не загружается."""
+        raise NotImplementedError
+
+
+# ---------------------- Хранилище в памяти ----------------------
+class DailySeries:
+    """Временной ряд с суммами по дням.
+
+    Дни хранятся порядковыми номерами (date.toordinal()) в отсортированном массиве,
+    рядом — суммы за каждый день и префиксные суммы. Запрос за диапазон дат
+    находится бисекцией: O(log n + размер окна), без разбора строк."""
+
+    __slots__ = ("days", "totals", "prefix", "rolled")
+
+    def __init__(self):
+        self.days = array("l")
+        self.totals = array("d")
+        self.prefix = array("d", [0.0])  # prefix[i] — сумма totals[:i]
+        self.rolled = 0  # days[:rolled] уже сведены в недели (rollup_weeks)
+
+    def add(self, day: int, value: float) -> None:
+        days = self.days
+        if days and days[-1] == day:
+            # Частый случай: ещё одна запись за последний день
+            self.totals[-1] += value
+            self.prefix[-1] += value
+            return
+        if not days or days[-1] < day:
+            days.append(day)
+            self.totals.append(value)
+            self.prefix.append(self.prefix[-1] + value)
+            return
+        # Запись задним числом: вставка в середину и пересчёт хвоста префиксов
+        i = bisect_left(days, day)
+        if i < len(days) and days[i] == day:
+            self.totals[i] += value
+        else:
+            days.insert(i, day)
+            self.totals.insert(i, value)
+            self.prefix.insert(i + 1, 0.0)
+            if i < self.rolled:
+                # День вставлен в уже свёрнутую часть — rollup_weeks просмотрит её с этого места
+                self.rolled = i
+        prefix = self.prefix
+        for j in range(i, len(days)):
+            prefix[j + 1] = prefix[j] + self.totals[j]
+
+    def _bounds(self, start: int, end: int):
+        return bisect_left(self.days, start), bisect_right(self.days, end)
+
+    def range(self, start: int, end: int):
+        lo, hi = self._bounds(start, end)
+        return zip(self.days[lo:hi], self.totals[lo:hi])
+
+    def total(self, start: int, end: int) -> float:
+        lo, hi = self._bounds(start, end)
+        return self.prefix[hi] - self.prefix[lo]
+
+    def rollup_weeks(self, before: int, max_rows: int) -> int:
+        """Сводит дни раньше before (понедельник) в суммы по неделям на понедельник недели.
+        Уже свёрнутое начало ряда (до rolled) не просматривается, так что такт не дорожает
+        с возрастом истории; за вызов обрабатывается не больше max_rows дней, целыми
+        неделями. Возвращает, на сколько элементов стал короче ряд."""
+        days = self.days
+        lo = bisect_left(days, before)
+        # date.fromordinal(day).weekday() == (day + 6) % 7
+        first = next((i for i in range(self.rolled, lo) if (days[i] + 6) % 7), None)
+        if first is None:
+            self.rolled = max(self.rolled, lo)
+            return 0
+        start = days[first] - (days[first] + 6) % 7
+        i = bisect_left(days, start)
+        if lo - i > max_rows:
+            end = days[i + max_rows] - (days[i + max_rows] + 6) % 7
+            # Если max_rows меньше недели, первая неделя всё равно сворачивается целиком
+            lo = bisect_left(days, max(end, start + 7))
+        weeks = {}
+        for day, total in zip(days[i:lo], self.totals[i:lo]):
+            monday = day - (day + 6) % 7
+            weeks[monday] = weeks.get(monday, 0.0) + total
+        # Переписывается и неделя из одного дня: сумма переезжает на понедельник
+        days[i:lo] = array("l", weeks)
+        self.totals[i:lo] = array("d", weeks.values())
+        # Префиксы до i не меняются, пересчитывается только хвост
+        self.prefix[i + 1:] = array("d", itertools.accumulate(self.totals[i:], initial=self.prefix[i]))[1:]
+        self.rolled = i + len(weeks)
+        return lo - i - len(weeks)
+
+
+class DatedLog:
+    """Журнал текстовых записей по дням (сладкое, плохие слова).
+
+    Вместо словаря на каждую запись — массив порядковых номеров дней и
+    параллельный список интернированных строк (повторяющиеся тексты хранятся
+    один раз). Записи упорядочены по дате, окно дат находится бисекцией."""
+
+    __slots__ = ("days", "texts")
+
+    def __init__(self):
+        self.days = array("l")
+        self.texts = []
+
+    def add(self, day: int, text: str) -> None:
+        text = sys.intern(text)
+        if not self.days or self.days[-1] <= day:
+            self.days.append(day)
+            self.texts.append(text)
+        else:
+            i = bisect_right(self.days, day)
+            self.days.insert(i, day)
+            self.texts.insert(i, text)
+
+    def range(self, start: int, end: int):
+        lo, hi = bisect_left(self.days, start), bisect_right(self.days, end)
+        return zip(self.days[lo:hi], self.texts[lo:hi])
+
+    def drop_before(self, day: int, max_rows: int):
+        """Удаляет записи раньше day, но не больше max_rows (целыми днями);
+        возвращает дни удалённых записей."""
+        i = bisect_left(self.days, day)
+        if i > max_rows:
+            # В самом старом дне больше max_rows записей — он удаляется целиком
+            i = bisect_left(self.days, self.days[max_rows]) or bisect_right(self.days, self.days[0])
+        dropped = self.days[:i]
+        del self.days[:i]
+        del self.texts[:i]
+        return dropped
+
+    def __len__(self):
+        return len(self.days)
+
+
+class ChatData:
+    """Раздел данных одного чата."""
+
+    __slots__ = ("schedule", "events", "archived_events", "questions", "phone_usage",
+                 "sweets_entries", "bad_words_entries", "sweets_rolled", "bad_words_rolled")
+
+    def __init__(self):
+        self.schedule = {}
+        self.events = []
+        self.archived_events = []
+        self.questions = []
+        self.phone_usage = DailySeries()
+        self.sweets_entries = DatedLog()
+        self.bad_words_entries = DatedLog()
+        # Число записей по дням (по неделям) для записей, свёрнутых compact
+        self.sweets_rolled = DailySeries()
+        self.bad_words_rolled = DailySeries()
+
+
+EMPTY_CHAT = ChatData()
+
+
+class MemoryStorage(Storage):
+    """Прежнее поведение: всё хранится в словарях и списках процесса.
+    Используется для тестов и запуска без диска."""
+
+    def __init__(self):
+        super().__init__()
+        self.chats = {}
+        self._ids = itertools.count(1)
+
+    def _chat(self, chat_id):
+        # Для записи: раздел создаётся при первом обращении
+        data = self.chats.get(chat_id)
+        if data is None:
+            data = self.chats[chat_id] = ChatData()
+        return data
+
+    def _view(self, chat_id):
+        # Для чтения: пустой раздел не создаём
+        return self.chats.get(chat_id, EMPTY_CHAT)
+
+    async def get_schedule(self, chat_id, day):
+        return self._view(chat_id).schedule.get(day)
+
+    async def set_schedule(self, chat_id, day, text):
+        self._chat(chat_id).schedule[day] = text
+        self._notify(chat_id, "schedule", (day, text))
+
+    async def add_event(self, chat_id, date, description):
+        event = (next(self._ids), date.isoformat(), description)
+        self._chat(chat_id).events.append(event)
+        self._notify(chat_id, "events", event)
+        return event[0]
+
+    async def list_upcoming_events(self, since):
+        since = since.isoformat()
+        return [(chat_id, event_id, date, description)
+                for chat_id, data in self.chats.items()
+                for event_id, date, description in data.events if date >= since]
+
+    def iter_events(self, chat_id, start=0, reverse=False):
+        return _iter_from(self._view(chat_id).events, start, reverse)
+
+    async def add_question(self, chat_id, text):
+        question = (next(self._ids), text)
+        self._chat(chat_id).questions.append(question)
+        self._notify(chat_id, "questions", question)
+
+    def iter_questions(self, chat_id, start=0, reverse=False):
+        return _iter_from(self._view(chat_id).questions, start, reverse)
+
+    async def add_phone_usage(self, chat_id, date, hours):
+        self._chat(chat_id).phone_usage.add(date.toordinal(), hours)
+        self._notify(chat_id, "phone", (date.isoformat(), hours))
+
+    async def phone_daily_totals(self, chat_id, start, end):
+        series = self._view(chat_id).phone_usage
+        return [(datetime.date.fromordinal(day).isoformat(), total)
+                for day, total in series.range(start.toordinal(), end.toordinal())]
+
+    async def phone_total(self, chat_id, start, end):
+        return self._view(chat_id).phone_usage.total(start.toordinal(), end.toordinal())
+
+    async def add_sweets_entry(self, chat_id, date, item):
+        self._chat(chat_id).sweets_entries.add(date.toordinal(), item)
+        self._notify(chat_id, "sweets", (date.isoformat(), item))
+
+    async def list_sweets_entries(self, chat_id, start, end):
+        return _log_range(self._view(chat_id).sweets_entries, start, end)
+
+    async def add_bad_word(self, chat_id, date, word):
+        self._chat(chat_id).bad_words_entries.add(date.toordinal(), word)
+        self._notify(chat_id, "badwords", (date.isoformat(), word))
+
+    async def list_bad_words(self, chat_id, start, end):
+        return _log_range(self._view(chat_id).bad_words_entries, start, end)
+
+    async def daily_counts(self, chat_id, kind, start, end):
+        data = self._view(chat_id)
+        if kind == "sweets":
+            log, rolled = data.sweets_entries, data.sweets_rolled
+        else:
+            log, rolled = data.bad_words_entries, data.bad_words_rolled
+        start, end = start.toordinal(), end.toordinal()
+        counts = {day: int(total) for day, total in rolled.range(start, end)}
+        lo, hi = bisect_left(log.days, start), bisect_right(log.days, end)
+        for day, group in itertools.groupby(log.days[lo:hi]):
+            counts[day] = counts.get(day, 0) + sum(1 for _ in group)
+        return [(datetime.date.fromordinal(day).isoformat(), count) for day, count in sorted(counts.items())]
+
+    async def chats_after(self, chat_id, limit):
+        chats = sorted(self.chats)
+        i = bisect_right(chats, chat_id)
+        return chats[i:i + limit]
+
+    async def compact(self, chat_id, raw_before, weekly_before, events_before, max_rows):
+        data = self.chats.get(chat_id)
+        if data is None:
+            return {}
+        changed = {}
+        if raw_before is not None:
+            for kind, log, rolled in (("sweets", data.sweets_entries, data.sweets_rolled),
+                                      ("badwords", data.bad_words_entries, data.bad_words_rolled)):
+                dropped = log.drop_before(raw_before.toordinal(), max_rows)
+                for day, group in itertools.groupby(dropped):
+                    rolled.add(day, sum(1 for _ in group))
+                if dropped:
+                    changed[kind] = len(dropped)
+        if weekly_before is not None:
+            for kind, series in (("phone", data.phone_usage), ("sweets", data.sweets_rolled),
+                                 ("badwords", data.bad_words_rolled)):
+                removed = series.rollup_weeks(weekly_before.toordinal(), max_rows)
+                if removed:
+                    changed[kind] = changed.get(kind, 0) + removed
+        if events_before is not None:
+            cutoff = events_before.isoformat()
+            past = [event for event in data.events if event[1] < cutoff][:max_rows]
+            if past:
+                archived = {event[0] for event in past}
+                data.events = [event for event in data.events if event[0] not in archived]
+                data.archived_events.extend(past)
+                changed["events"] = len(past)
+        for kind in changed:
+            self._notify(chat_id, kind)
+        return changed
+
+    async def bulk_insert(self, chat_id, batch):
+        data = self._chat(chat_id)
+        fromisoformat = datetime.date.fromisoformat
+        counts = {}
+        for kind, rows in batch.items():
+            if kind in ("phone", "sweets", "badwords"):
+                # По возрастанию даты записи ложатся в конец рядов, без вставок в середину
+                rows = sorted(rows, key=itemgetter(0))
+            for row in rows:
+                if kind == "schedule":
+                    data.schedule[row[0]] = row[1]
+                    record = row
+                elif kind == "events":
+                    record = (next(self._ids), row[0], row[1])
+                    data.events.append(record)
+                elif kind == "questions":
+                    record = (next(self._ids), row[0])
+                    data.questions.append(record)
+                elif kind == "phone":
+                    data.phone_usage.add(fromisoformat(row[0]).toordinal(), row[1])
+                    record = row
+                elif kind == "sweets":
+                    data.sweets_entries.add(fromisoformat(row[0]).toordinal(), row[1])
+                    record = row
+                else:
+                    data.bad_words_entries.add(fromisoformat(row[0]).toordinal(), row[1])
+                    record = row
+                self._notify(chat_id, kind, record)
+            counts[kind] = len(rows)
+        return counts
+
+    async def existing_counts(self, chat_id, kind, keys):
+        data = self._view(chat_id)
+        if kind == "questions":
+            wanted = set(keys)
+            return Counter(row for row in ((text,) for _, text in data.questions) if row in wanted)
+        dates = [key if kind == "phone" else key[0] for key in keys]
+        start, end = datetime.date.fromisoformat(min(dates)), datetime.date.fromisoformat(max(dates))
+        if kind == "phone":
+            return dict(await self.phone_daily_totals(chat_id, start, end))
+        if kind == "events":
+            start, end = start.isoformat(), end.isoformat()
+            return Counter((date, description) for _, date, description in data.archived_events + data.events
+                           if start <= date <= end)
+        log = data.sweets_entries if kind == "sweets" else data.bad_words_entries
+        return Counter(_log_range(log, start, end))
+
+    async def export_rows(self, chat_id, kind):
+        data = self._view(chat_id)
+        fromordinal = datetime.date.fromordinal
+        if kind == "schedule":
+            rows = sorted(data.schedule.items())
+        elif kind == "events":
+            rows = ((date, description) for _, date, description in data.archived_events + data.events)
+        elif kind == "questions":
+            rows = ((text,) for _, text in data.questions)
+        elif kind == "phone":
+            rows = ((fromordinal(day).isoformat(), total)
+                    for day, total in zip(data.phone_usage.days, data.phone_usage.totals))
+        else:
+            log = data.sweets_entries if kind == "sweets" else data.bad_words_entries
+            rows = ((fromordinal(day).isoformat(), text) for day, text in zip(log.days, log.texts))
+        for row in rows:
+            yield row
+
+
+async def _iter_from(rows, start, reverse):
+    # Записи упорядочены по id (первый элемент кортежа), курсор находится бисекцией
+    i = bisect_left(rows, start, key=itemgetter(0))
+    if reverse:
+        for j in range(i - 1, -1, -1):
+            yield rows[j]
+    else:
+        while i < len(rows):
+            yield rows[i]
+            i += 1
+
+
+def _log_range(log, start, end):
+    # Даты переводятся в строки только для записей внутри окна
+    fromordinal = datetime.date.fromordinal
+    return [(fromordinal(day).isoformat(), text) for day, text in log.range(start.toordinal(), end.toordinal())]
+
+
+def _monday_of(day: str) -> str:
+    date = datetime.date.fromisoformat(day)
+    return (date - datetime.timedelta(days=date.weekday())).isoformat()
+
+
+# ---------------------- SQLite ----------------------
+# Схема задаётся списком миграций; номер применённой хранится в PRAGMA user_version.
+MIGRATIONS = [
+    """
+    CREATE TABLE schedule (
+        day TEXT PRIMARY KEY,
+        chat_id INTEGER NOT NULL,
+        text TEXT NOT NULL
+    );
+    CREATE TABLE events (
+        id INTEGER PRIMARY KEY,
+        chat_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        description TEXT NOT NULL
+    );
+    CREATE INDEX events_chat_date ON events (chat_id, date);
+    CREATE TABLE questions (
+        id INTEGER PRIMARY KEY,
+        chat_id INTEGER NOT NULL,
+        text TEXT NOT NULL
+    );
+    CREATE INDEX questions_chat ON questions (chat_id);
+    CREATE TABLE phone_usage (
+        id INTEGER PRIMARY KEY,
+        chat_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        hours REAL NOT NULL
+    );
+    CREATE INDEX phone_usage_chat_date ON phone_usage (chat_id, date);
+    CREATE TABLE sweets (
+        id INTEGER PRIMARY KEY,
+        chat_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        item TEXT NOT NULL
+    );
+    CREATE INDEX sweets_chat_date ON sweets (chat_id, date);
+    CREATE TABLE bad_words (
+        id INTEGER PRIMARY KEY,
+        chat_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        word TEXT NOT NULL
+    );
+    CREATE INDEX bad_words_chat_date ON bad_words (chat_id, date);
+    """,
+    # Расписание разделяется по чатам: ключ (chat_id, day)
+    """
+    CREATE TABLE schedule_v2 (
+        chat_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (chat_id, day)
+    ) WITHOUT ROWID;
+    INSERT INTO schedule_v2 (chat_id, day, text) SELECT chat_id, day, text FROM schedule;
+    DROP TABLE schedule;
+    ALTER TABLE schedule_v2 RENAME TO schedule;
+    CREATE INDEX questions_chat_id ON questions (chat_id, id);
+    DROP INDEX questions_chat;
+    """,
+    # Предагрегированные суммы телефона по дням, обновляются при каждой записи
+    """
+    CREATE TABLE phone_daily (
+        chat_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        total REAL NOT NULL,
+        PRIMARY KEY (chat_id, day)
+    ) WITHOUT ROWID;
+    INSERT INTO phone_daily (chat_id, day, total)
+        SELECT chat_id, date, SUM(hours) FROM phone_usage GROUP BY chat_id, date;
+    """,
+    # Постраничный просмотр событий идёт по курсору (chat_id, id)
+    """
+    CREATE INDEX events_chat_id ON events (chat_id, id);
+    """,
+    # Напоминания при запуске читают будущие события всех чатов
+    """
+    CREATE INDEX events_date ON events (date);
+    """,
+    # Хранение истории: число свёрнутых записей сладкого и плохих слов по дням
+    # и архив прошедших событий
+    """
+    CREATE TABLE tracker_daily (
+        chat_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        day TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (chat_id, kind, day)
+    ) WITHOUT ROWID;
+    CREATE TABLE events_archive (
+        id INTEGER PRIMARY KEY,
+        chat_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        description TEXT NOT NULL
+    );
+    CREATE INDEX events_archive_chat_id ON events_archive (chat_id, id);
+    """,
+    # Импорт сверяет события с уже имеющимися по дате, в том числе в архиве
+    """
+    CREATE INDEX events_archive_chat_date ON events_archive (chat_id, date);
+    """,
+]
+
+# Размер порции строк, которую генераторы iter_* читают из базы за один запрос
+ITER_CHUNK = 50
+
+# Запросы держим константами: sqlite3 кэширует подготовленные выражения по тексту SQL,
+# поэтому повторные вызовы не компилируют запрос заново.
+SQL_GET_SCHEDULE = "SELECT text FROM schedule WHERE chat_id = ? AND day = ?"
+SQL_SET_SCHEDULE = ("INSERT INTO schedule (chat_id, day, text) VALUES (?, ?, ?) "
+                    "ON CONFLICT (chat_id, day) DO UPDATE SET text = excluded.text")
+SQL_ADD_EVENT = "INSERT INTO events (chat_id, date, description) VALUES (?, ?, ?)"
+SQL_EVENTS_FROM = "SELECT id, date, description FROM events WHERE chat_id = ? AND id >= ? ORDER BY id LIMIT ?"
+SQL_EVENTS_BEFORE = "SELECT id, date, description FROM events WHERE chat_id = ? AND id < ? ORDER BY id DESC LIMIT ?"
+SQL_UPCOMING_EVENTS = "SELECT chat_id, id, date, description FROM events WHERE date >= ?"
+SQL_ADD_QUESTION = "INSERT INTO questions (chat_id, text) VALUES (?, ?)"
+SQL_QUESTIONS_FROM = "SELECT id, text FROM questions WHERE chat_id = ? AND id >= ? ORDER BY id LIMIT ?"
+SQL_QUESTIONS_BEFORE = "SELECT id, text FROM questions WHERE chat_id = ? AND id < ? ORDER BY id DESC LIMIT ?"
+SQL_ADD_PHONE = "INSERT INTO phone_usage (chat_id, date, hours) VALUES (?, ?, ?)"
+SQL_ADD_PHONE_DAILY = ("INSERT INTO phone_daily (chat_id, day, total) VALUES (?, ?, ?) "
+                       "ON CONFLICT (chat_id, day) DO UPDATE SET total = total + excluded.total")
+SQL_PHONE_DAILY_RANGE = ("SELECT day, total FROM phone_daily "
+                         "WHERE chat_id = ? AND day BETWEEN ? AND ? ORDER BY day")
+SQL_PHONE_TOTAL = "SELECT COALESCE(SUM(total), 0) FROM phone_daily WHERE chat_id = ? AND day BETWEEN ? AND ?"
+SQL_ADD_SWEETS = "INSERT INTO sweets (chat_id, date, item) VALUES (?, ?, ?)"
+SQL_LIST_SWEETS = "SELECT date, item FROM sweets WHERE chat_id = ? AND date BETWEEN ? AND ? ORDER BY date, id"
+SQL_ADD_BAD_WORD = "INSERT INTO bad_words (chat_id, date, word) VALUES (?, ?, ?)"
+SQL_LIST_BAD_WORDS = "SELECT date, word FROM bad_words WHERE chat_id = ? AND date BETWEEN ? AND ? ORDER BY date, id"
+SQL_DAILY_COUNTS = {
+    kind: (f"SELECT day, SUM(n) FROM ("
+           f"SELECT date AS day, COUNT(*) AS n FROM {table} WHERE chat_id = ? AND date BETWEEN ? AND ? "
+           f"GROUP BY date UNION ALL "
+           f"SELECT day, count FROM tracker_daily WHERE chat_id = ? AND kind = '{kind}' AND day BETWEEN ? AND ?"
+           f") GROUP BY day ORDER BY day")
+    for kind, table in (("sweets", "sweets"), ("badwords", "bad_words"))
+}
+
+# Хранение истории. Следующий чат ищется по индексам, начинающимся с chat_id:
+# MIN(chat_id) с условием — это один спуск по дереву индекса
+SQL_NEXT_CHAT = ("SELECT MIN(c) FROM ("
+                 + " UNION ALL ".join(f"SELECT MIN(chat_id) AS c FROM {table} WHERE chat_id > :after"
+                                      for table in ("schedule", "events", "events_archive", "questions",
+                                                    "phone_daily", "sweets", "bad_words", "tracker_daily"))
+                 + ")")
+# Дата, до которой (не включая) наберётся не больше max_rows строк; NULL — если влезает всё
+SQL_ROWS_LIMIT_DATE = {
+    table: f"SELECT date FROM {table} WHERE chat_id = ? AND date < ? ORDER BY date LIMIT 1 OFFSET ?"
+    for table in ("phone_usage", "sweets", "bad_words", "events")
+}
+SQL_ROLL_RAW = {
+    kind: (f"INSERT INTO tracker_daily (chat_id, kind, day, count) "
+           f"SELECT chat_id, '{kind}', date, COUNT(*) FROM {table} WHERE chat_id = ? AND date < ? GROUP BY date "
+           f"ON CONFLICT (chat_id, kind, day) DO UPDATE SET count = count + excluded.count")
+    for kind, table in (("sweets", "sweets"), ("badwords", "bad_words"))
+}
+SQL_OLDEST_DATE = {
+    table: f"SELECT MIN(date) FROM {table} WHERE chat_id = ?"
+    for table in ("sweets", "bad_words")
+}
+SQL_DELETE_BEFORE = {
+    table: f"DELETE FROM {table} WHERE chat_id = ? AND date < ?"
+    for table in ("phone_usage", "sweets", "bad_words", "events")
+}
+SQL_ARCHIVE_EVENTS = ("INSERT INTO events_archive (id, chat_id, date, description) "
+                      "SELECT id, chat_id, date, description FROM events WHERE chat_id = ? AND date < ?")
+SQL_EXPORT_ARCHIVED_EVENTS = ("SELECT id, date, description FROM events_archive WHERE chat_id = ? AND id > ? "
+                              "ORDER BY id LIMIT ?")
+
+# Импорт без дублей: сколько таких строк уже есть (по окну дат порции или списку текстов)
+SQL_EXISTING = {
+    "events": ("SELECT date, description, COUNT(*) FROM ("
+               "SELECT date, description FROM events WHERE chat_id = :chat AND date BETWEEN :start AND :end "
+               "UNION ALL SELECT date, description FROM events_archive "
+               "WHERE chat_id = :chat AND date BETWEEN :start AND :end) GROUP BY date, description"),
+    "questions": ("SELECT text, COUNT(*) FROM questions "
+                  "WHERE chat_id = :chat AND text IN (SELECT value FROM json_each(:texts)) GROUP BY text"),
+    "phone": "SELECT day, total FROM phone_daily WHERE chat_id = :chat AND day BETWEEN :start AND :end",
+    "sweets": ("SELECT date, item, COUNT(*) FROM sweets "
+               "WHERE chat_id = :chat AND date BETWEEN :start AND :end GROUP BY date, item"),
+    "badwords": ("SELECT date, word, COUNT(*) FROM bad_words "
+                 "WHERE chat_id = :chat AND date BETWEEN :start AND :end GROUP BY date, word"),
+}
+
+# Массовая запись: для видов без id — executemany
+SQL_BULK = {
+    "schedule": SQL_SET_SCHEDULE,
+    "phone": SQL_ADD_PHONE,
+    "sweets": SQL_ADD_SWEETS,
+    "badwords": SQL_ADD_BAD_WORD,
+}
+# Выгрузка порциями по курсору — ключу последней строки предыдущей порции;
+# сладкое и плохие слова идут по индексу (chat_id, date) с курсором (date, id)
+EXPORT_CHUNK = 500
+SQL_EXPORT = {
+    "schedule": "SELECT day, text FROM schedule WHERE chat_id = ? AND day > ? ORDER BY day LIMIT ?",
+    "events": "SELECT id, date, description FROM events WHERE chat_id = ? AND id > ? ORDER BY id LIMIT ?",
+    "questions": "SELECT id, text FROM questions WHERE chat_id = ? AND id > ? ORDER BY id LIMIT ?",
+    "phone": "SELECT day, total FROM phone_daily WHERE chat_id = ? AND day > ? ORDER BY day LIMIT ?",
+    "sweets": ("SELECT date, id, item FROM sweets WHERE chat_id = ? AND (date, id) > (?, ?) "
+               "ORDER BY date, id LIMIT ?"),
+    "badwords": ("SELECT date, id, word FROM bad_words WHERE chat_id = ? AND (date, id) > (?, ?) "
+                 "ORDER BY date, id LIMIT ?"),
+}
+
+
+class SQLiteStorage(Storage):
+    """Хранилище в SQLite (режим WAL).
+
+    Все обращения к базе выполняются в одном выделенном потоке, поэтому цикл
+    событий не ждёт диска. Записи копятся в открытой транзакции и фиксируются
+    пачкой: после batch_size изменений или через flush_interval секунд."""
+
+    def __init__(self, path: str, batch_size: int = 100, flush_interval: float = 1.0):
+        super().__init__()
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._conn = None
+        self._executor = None
+        self._pending = 0
+        self._flush_handle = None
+        self._flush_task = None
+        # (таблица, chat_id, вид) -> день, до которого в таблице уже только понедельники;
+        # меняется только в потоке базы
+        self._weekly_from = {}
+
+    # ----- Служебное -----
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                               cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+            conn.executescript("BEGIN;" + script + f"PRAGMA user_version = {number}; COMMIT;")
+            logger.info("Применена миграция схемы №%d", number)
+        self._conn = conn
+
+    def _execute_write(self, statements, after=None):
+        if not self._conn.in_transaction:
+            self._conn.execute("BEGIN")
+        row_id = None
+        for sql, params in statements:
+            cursor = self._conn.execute(sql, params)
+            if row_id is None:
+                row_id = cursor.lastrowid
+        if after is not None:
+            after()
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._commit()
+            return row_id, False
+        return row_id, True
+
+    def _commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+        self._pending = 0
+
+    def _fetchall(self, sql, params=()):
+        return self._conn.execute(sql, params).fetchall()
+
+    async def _write(self, sql, params, *more, after=None):
+        # Несколько выражений одного изменения выполняются вместе: (sql, params), ...
+        # after() вызывается в потоке базы сразу после них.
+        # Возвращает rowid строки, вставленной первым выражением.
+        row_id, needs_flush = await self._run(self._execute_write, ((sql, params),) + more, after)
+        if needs_flush and self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.flush_interval, self._schedule_flush)
+        return row_id
+
+    def _schedule_flush(self):
+        self._flush_handle = None
+        # Ссылка на задачу держится до её завершения, иначе сборщик мусора может её удалить
+        self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+        self._flush_task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task):
+        self._flush_task = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Не удалось зафиксировать транзакцию", exc_info=task.exception())
+
+    async def flush(self) -> None:
+        await self._run(self._commit)
+
+    # ----- Жизненный цикл -----
+    async def open(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        await self._run(self._connect)
+
+    async def close(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._flush_task is not None:
+            # Ошибку фоновой фиксации уже записал _flush_done
+            await asyncio.wait((self._flush_task,))
+        await self.flush()
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=True)
+
+    # ----- Данные -----
+    async def get_schedule(self, chat_id, day):
+        rows = await self._run(self._fetchall, SQL_GET_SCHEDULE, (chat_id, day))
+        return rows[0][0] if rows else None
+
+    async def set_schedule(self, chat_id, day, text):
+        await self._write(SQL_SET_SCHEDULE, (chat_id, day, text))
+        self._notify(chat_id, "schedule", (day, text))
+
+    async def _iter_chunks(self, sql_from, sql_before, chat_id, start, reverse):
+        # Строки читаются порциями по ITER_CHUNK, следующая порция — только если генератор
+        # продолжают итерировать
+        sql = sql_before if reverse else sql_from
+        while True:
+            rows = await self._run(self._fetchall, sql, (chat_id, start, ITER_CHUNK))
+            for row in rows:
+                yield row
+            if len(rows) < ITER_CHUNK:
+                return
+            start = rows[-1][0] if reverse else rows[-1][0] + 1
+
+    async def add_event(self, chat_id, date, description):
+        event_id = await self._write(SQL_ADD_EVENT, (chat_id, date.isoformat(), description))
+        self._notify(chat_id, "events", (event_id, date.isoformat(), description))
+        return event_id
+
+    async def list_upcoming_events(self, since):
+        return await self._run(self._fetchall, SQL_UPCOMING_EVENTS, (since.isoformat(),))
+
+    def iter_events(self, chat_id, start=0, reverse=False):
+        return self._iter_chunks(SQL_EVENTS_FROM, SQL_EVENTS_BEFORE, chat_id, start, reverse)
+
+    async def add_question(self, chat_id, text):
+        question_id = await self._write(SQL_ADD_QUESTION, (chat_id, text))
+        self._notify(chat_id, "questions", (question_id, text))
+
+    def iter_questions(self, chat_id, start=0, reverse=False):
+        return self._iter_chunks(SQL_QUESTIONS_FROM, SQL_QUESTIONS_BEFORE, chat_id, start, reverse)
+
+    async def add_phone_usage(self, chat_id, date, hours):
+        day = date.isoformat()
+        await self._write(SQL_ADD_PHONE, (chat_id, day, hours),
+                          (SQL_ADD_PHONE_DAILY, (chat_id, day, hours)),
+                          after=lambda: self._lower_weekly("phone_daily", chat_id, None, day))
+        self._notify(chat_id, "phone", (day, hours))
+
+    async def phone_daily_totals(self, chat_id, start, end):
+        return await self._run(self._fetchall, SQL_PHONE_DAILY_RANGE,
+                               (chat_id, start.isoformat(), end.isoformat()))
+
+    async def phone_total(self, chat_id, start, end):
+        rows = await self._run(self._fetchall, SQL_PHONE_TOTAL,
+                               (chat_id, start.isoformat(), end.isoformat()))
+        return rows[0][0]
+
+    async def add_sweets_entry(self, chat_id, date, item):
+        await self._write(SQL_ADD_SWEETS, (chat_id, date.isoformat(), item))
+        self._notify(chat_id, "sweets", (date.isoformat(), item))
+
+    async def list_sweets_entries(self, chat_id, start, end):
+        return await self._run(self._fetchall, SQL_LIST_SWEETS, (chat_id, start.isoformat(), end.isoformat()))
+
+    async def add_bad_word(self, chat_id, date, word):
+        await self._write(SQL_ADD_BAD_WORD, (chat_id, date.isoformat(), word))
+        self._notify(chat_id, "badwords", (date.isoformat(), word))
+
+    async def list_bad_words(self, chat_id, start, end):
+        return await self._run(self._fetchall, SQL_LIST_BAD_WORDS, (chat_id, start.isoformat(), end.isoformat()))
+
+    async def daily_counts(self, chat_id, kind, start, end):
+        params = (chat_id, start.isoformat(), end.isoformat())
+        return await self._run(self._fetchall, SQL_DAILY_COUNTS[kind], params + params)
+
+    # ----- Хранение истории -----
+    def _chats_after(self, chat_id, limit):
+        chats = []
+        while len(chats) < limit:
+            chat_id = self._conn.execute(SQL_NEXT_CHAT, {"after": chat_id}).fetchone()[0]
+            if chat_id is None:
+                break
+            chats.append(chat_id)
+        return chats
+
+    async def chats_after(self, chat_id, limit):
+        return await self._run(self._chats_after, chat_id, limit)
+
+    def _limit_date(self, table, chat_id, before, max_rows):
+        # Граница (не включая), до которой наберётся не больше max_rows строк; день не делится
+        sql = SQL_ROWS_LIMIT_DATE[table]
+        row = self._conn.execute(sql, (chat_id, before, max_rows)).fetchone()
+        if row is None:
+            return before
+        first = self._conn.execute(sql, (chat_id, before, 0)).fetchone()
+        if row[0] > first[0]:
+            return row[0]
+        # В самом старом дне больше max_rows строк — он обрабатывается целиком
+        return (datetime.date.fromisoformat(row[0]) + datetime.timedelta(days=1)).isoformat()
+
+    def _lower_weekly(self, table, chat_id, kind, day):
+        # Запись за день в уже свёрнутой части: следующее сворачивание начнёт с него
+        key = (table, chat_id, kind)
+        if day < self._weekly_from.get(key, ""):
+            self._weekly_from[key] = day
+
+    def _rollup_weeks(self, table, chat_id, kind, before, max_rows):
+        # Суммы по дням раньше before → суммы по неделям на понедельник; как в
+        # DailySeries.rollup_weeks — с первой недели, где есть не только понедельник,
+        # не больше max_rows дней целыми неделями. Уже свёрнутое начало (_weekly_from)
+        # не просматривается
+        conn = self._conn
+        key = "chat_id = ? AND kind = ?" if kind else "chat_id = ?"
+        params = (chat_id, kind) if kind else (chat_id,)
+        value = "count" if kind else "total"
+        watermark = (table, chat_id, kind)
+        row = conn.execute(f"SELECT day FROM {table} WHERE {key} AND day >= ? AND day < ? "
+                           f"AND strftime('%w', day) <> '1' ORDER BY day LIMIT 1",
+                           params + (self._weekly_from.get(watermark, ""), before)).fetchone()
+        if row is None:
+            self._weekly_from[watermark] = max(self._weekly_from.get(watermark, ""), before)
+            return 0
+        start = _monday_of(row[0])
+        row = conn.execute(f"SELECT day FROM {table} WHERE {key} AND day >= ? AND day < ? "
+                           f"ORDER BY day LIMIT 1 OFFSET ?", params + (start, before, max_rows)).fetchone()
+        if row is not None:
+            end = _monday_of(row[0])
+            if end == start:
+                # Если max_rows меньше недели, первая неделя всё равно сворачивается целиком
+                end = (datetime.date.fromisoformat(start) + datetime.timedelta(weeks=1)).isoformat()
+            before = min(before, end)
+        bounds = params + (start, before)
+        rows = conn.execute(f"SELECT day, {value} FROM {table} WHERE {key} AND day >= ? AND day < ?",
+                            bounds).fetchall()
+        weeks = {}
+        for day, total in rows:
+            monday = _monday_of(day)
+            weeks[monday] = weeks.get(monday, 0) + total
+        # Переписывается и неделя из одного дня: сумма переезжает на понедельник
+        conn.execute(f"DELETE FROM {table} WHERE {key} AND day >= ? AND day < ?", bounds)
+        columns = "chat_id, kind, day, count" if kind else "chat_id, day, total"
+        conn.executemany(f"INSERT INTO {table} ({columns}) VALUES ({', '.join('?' * (len(params) + 2))})",
+                         [params + week for week in weeks.items()])
+        self._weekly_from[watermark] = before
+        return len(rows) - len(weeks)
+
+    def _execute_compact(self, chat_id, raw_before, weekly_before, events_before, max_rows):
+        conn = self._conn
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        conn.execute("SAVEPOINT compact")
+        changed = {}
+        try:
+            if raw_before is not None:
+                for kind, table in (("phone", "phone_usage"), ("sweets", "sweets"), ("badwords", "bad_words")):
+                    before = self._limit_date(table, chat_id, raw_before, max_rows)
+                    if kind in SQL_ROLL_RAW:
+                        oldest = conn.execute(SQL_OLDEST_DATE[table], (chat_id,)).fetchone()[0]
+                        if oldest is not None and oldest < before:
+                            self._lower_weekly("tracker_daily", chat_id, kind, oldest)
+                        conn.execute(SQL_ROLL_RAW[kind], (chat_id, before))
+                    removed = conn.execute(SQL_DELETE_BEFORE[table], (chat_id, before)).rowcount
+                    # Часы телефона остаются в phone_daily: отчёты и выгрузка не меняются
+                    if removed and kind != "phone":
+                        changed[kind] = removed
+            if weekly_before is not None:
+                for kind, table in (("phone", "phone_daily"), ("sweets", "tracker_daily"),
+                                    ("badwords", "tracker_daily")):
+                    removed = self._rollup_weeks(table, chat_id, kind if table == "tracker_daily" else None,
+                                                 weekly_before, max_rows)
+                    if removed:
+                        changed[kind] = changed.get(kind, 0) + removed
+            if events_before is not None:
+                before = self._limit_date("events", chat_id, events_before, max_rows)
+                conn.execute(SQL_ARCHIVE_EVENTS, (chat_id, before))
+                moved = conn.execute(SQL_DELETE_BEFORE["events"], (chat_id, before)).rowcount
+                if moved:
+                    changed["events"] = moved
+        except Exception:
+            conn.execute("ROLLBACK TO compact")
+            conn.execute("RELEASE compact")
+            # Отметки могли уйти дальше откаченных строк — при следующем проходе чат просматривается заново
+            for table, kind in (("phone_daily", None), ("tracker_daily", "sweets"), ("tracker_daily", "badwords")):
+                self._weekly_from.pop((table, chat_id, kind), None)
+            raise
+        conn.execute("RELEASE compact")
+        self._commit()
+        return changed
+
+    async def compact(self, chat_id, raw_before, weekly_before, events_before, max_rows):
+        changed = await self._run(self._execute_compact, chat_id,
+                                  *(date.isoformat() if date is not None else None
+                                    for date in (raw_before, weekly_before, events_before)), max_rows)
+        for kind in changed:
+            self._notify(chat_id, kind)
+        return changed
+
+    def _execute_bulk(self, chat_id, batch):
+        # Отдельная точка сохранения: при ошибке откатывается только эта пачка,
+        # а не накопленные в открытой транзакции мелкие записи
+        conn = self._conn
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        conn.execute("SAVEPOINT bulk")
+        records = {}
+        try:
+            for kind, rows in batch.items():
+                if kind == "events":
+                    records[kind] = [(conn.execute(SQL_ADD_EVENT, (chat_id, date, description)).lastrowid,
+                                      date, description) for date, description in rows]
+                elif kind == "questions":
+                    records[kind] = [(conn.execute(SQL_ADD_QUESTION, (chat_id, text)).lastrowid, text)
+                                     for text, in rows]
+                else:
+                    params = [(chat_id, *row) for row in rows]
+                    conn.executemany(SQL_BULK[kind], params)
+                    if kind == "phone":
+                        conn.executemany(SQL_ADD_PHONE_DAILY, params)
+                        if rows:
+                            self._lower_weekly("phone_daily", chat_id, None, min(day for day, _ in rows))
+                    records[kind] = rows
+        except Exception:
+            conn.execute("ROLLBACK TO bulk")
+            conn.execute("RELEASE bulk")
+            raise
+        conn.execute("RELEASE bulk")
+        self._commit()
+        return records
+
+    async def bulk_insert(self, chat_id, batch):
+        records = await self._run(self._execute_bulk, chat_id, batch)
+        for kind, rows in records.items():
+            for record in rows:
+                self._notify(chat_id, kind, record)
+        return {kind: len(rows) for kind, rows in records.items()}
+
+    async def existing_counts(self, chat_id, kind, keys):
+        if kind == "questions":
+            params = {"chat": chat_id, "texts": json.dumps([text for text, in keys], ensure_ascii=False)}
+        else:
+            dates = [key if kind == "phone" else key[0] for key in keys]
+            params = {"chat": chat_id, "start": min(dates), "end": max(dates)}
+        rows = await self._run(self._fetchall, SQL_EXISTING[kind], params)
+        if kind == "phone":
+            return dict(rows)
+        return {row[:-1]: row[-1] for row in rows}
+
+    async def export_rows(self, chat_id, kind):
+        # События выгружаются вместе с архивом: сначала архив, затем действующие
+        sqls = (SQL_EXPORT_ARCHIVED_EVENTS, SQL_EXPORT[kind]) if kind == "events" else (SQL_EXPORT[kind],)
+        dated_log = kind in ("sweets", "badwords")
+        for sql in sqls:
+            if dated_log:
+                cursor = ("", 0)
+            elif kind in ("events", "questions"):
+                cursor = (0,)
+            else:
+                cursor = ("",)
+            while True:
+                rows = await self._run(self._fetchall, sql, (chat_id, *cursor, EXPORT_CHUNK))
+                for row in rows:
+                    if dated_log:
+                        yield row[0], row[2]
+                    elif kind in ("events", "questions"):
+                        yield row[1:]
+                    else:
+                        yield row
+                if len(rows) < EXPORT_CHUNK:
+                    break
+                cursor = rows[-1][:2] if dated_log else rows[-1][:1]
+
+
+def create_storage(path: str) -> Storage:
+    """"memory" — хранилище в памяти, иначе путь к файлу SQLite."""
+    if path == "memory":
+        return MemoryStorage()
+    return SQLiteStorage(path)
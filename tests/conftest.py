@@ -0,0 +1,22 @@
+import asyncio
+
+import pytest
+
+from storage import MemoryStorage, SQLiteStorage
+
+
+@pytest.fixture
+def run():
+    """Выполняет корутину в отдельном цикле событий теста."""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+# Один и тот же контракт проверяется на обоих хранилищах
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, run, tmp_path):
+    storage = MemoryStorage() if request.param == "memory" else SQLiteStorage(str(tmp_path / "bot.db"))
+    run(storage.open())
+    yield storage
+    run(storage.close())
@@ -0,0 +1,62 @@
+import datetime
+
+import pytest
+
+from batch_entry import EntryError, looks_like_batch, parse_batch, parse_hours
+
+TODAY = datetime.date(2026, 10, 17)
+
+
+def test_phone_lines_with_dates_and_units():
+    rows, errors = parse_batch("phone", "2026-10-12 3.5\nвчера 2,5 ч\n\n1 час\nпозавчера: 4", TODAY)
+    assert rows == [("2026-10-12", 3.5), ("2026-10-16", 2.5), ("2026-10-17", 1.0), ("2026-10-15", 4.0)]
+    assert errors == []
+
+
+def test_bad_lines_are_reported_with_line_numbers():
+    rows, errors = parse_batch("phone", "2026-10-12 3\nмного\n2026-13-40 1", TODAY)
+    assert rows == [("2026-10-12", 3.0)]
+    assert [number for number, _ in errors] == [2, 3]
+
+
+def test_text_kinds():
+    rows, errors = parse_batch("sweets", "торт\nВчера — конфета\n2026-10-01", TODAY)
+    assert rows == [("2026-10-17", "торт"), ("2026-10-16", "конфета")]
+    assert [number for number, _ in errors] == [3]
+
+    rows, errors = parse_batch("events", "2026-10-20 Врач\nбез даты", TODAY)
+    assert rows == [("2026-10-20", "Врач")]
+    assert [number for number, _ in errors] == [2]
+
+    rows, errors = parse_batch("questions", "Первый?\n  \nВторой?", TODAY)
+    assert rows == [("Первый?",), ("Второй?",)]
+
+
+def test_schedule_continuation_lines():
+    text = "понедельник: Зарядка\nработа\nВторник — Бассейн\n2026-10-20:\nВрач\nанализы"
+    rows, errors = parse_batch("schedule", text, TODAY)
+    assert rows == [("Понедельник", "Зарядка\nработа"), ("Вторник", "Бассейн"), ("2026-10-20", "Врач\nанализы")]
+    assert errors == []
+
+    rows, errors = parse_batch("schedule", "Зарядка\nСреда:", TODAY)
+    assert rows == []
+    assert [number for number, _ in errors] == [1, None]
+
+
+def test_looks_like_batch():
+    assert looks_like_batch("3\n4", TODAY)
+    assert looks_like_batch("вчера 3", TODAY)
+    assert not looks_like_batch("3.5", TODAY)
+    assert not looks_like_batch("шоколадка", TODAY)
+
+
+@pytest.mark.parametrize("text", ["nan", "inf", "-1", "-0.5", "1e309", "", "три"])
+def test_parse_hours_rejects_non_finite_and_negative(text):
+    with pytest.raises(EntryError):
+        parse_hours(text)
+
+
+def test_parse_hours():
+    assert parse_hours("3.5") == 3.5
+    assert parse_hours(" 3,5 ч ") == 3.5
+    assert parse_hours("0") == 0.0
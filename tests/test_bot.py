@@ -0,0 +1,31 @@
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import bot
+from storage import MemoryStorage
+
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+def make_update(text, chat_id=1):
+    return SimpleNamespace(message=FakeMessage(text), effective_chat=SimpleNamespace(id=chat_id))
+
+
+# ---------------------- Ввод часов телефона ----------------------
+@pytest.mark.parametrize("text", ["nan", "inf", "-infinity", "-2", "много"])
+def test_phone_input_rejects_invalid_hours(run, monkeypatch, text):
+    monkeypatch.setattr(bot, "storage", MemoryStorage())
+    update = make_update(text)
+    assert run(bot.dep_phone_input_received(update, None)) == bot.PHONE_INPUT
+    assert update.message.replies and update.message.replies[-1].startswith("Ошибка")
+    today = datetime.date.today()
+    assert run(bot.storage.phone_total(1, today, today)) == 0
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+import pytest
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+
+from fake_api import FakeBotAPI
+from message_cache import RenderedMessages
+
+MENU = InlineKeyboardMarkup([[InlineKeyboardButton("События", callback_data="menu:events")]])
+OTHER = InlineKeyboardMarkup([[InlineKeyboardButton("Назад", callback_data="menu:main")]])
+
+
+@pytest.fixture
+def api(run):
+    api = FakeBotAPI()
+    run(api.start())
+    yield api
+    run(api.stop())
+
+
+def press(bot, message):
+    """Нажатие кнопки под message: правка идёт через настоящий Bot к имитатору API."""
+    async def edit_message_text(text, reply_markup=None, parse_mode=None):
+        return await bot.edit_message_text(text, chat_id=message.chat_id, message_id=message.message_id,
+                                           reply_markup=reply_markup, parse_mode=parse_mode)
+    return SimpleNamespace(message=message, edit_message_text=edit_message_text)
+
+
+def test_unchanged_edits_are_skipped(api, run):
+    rendered = RenderedMessages()
+
+    async def scenario():
+        async with Bot("1:test", base_url=api.base_url) as bot:
+            chat = SimpleNamespace(reply_text=lambda *args, **kwargs: bot.send_message(42, *args, **kwargs))
+            sent = await rendered.reply(chat, "Главное меню", reply_markup=MENU)
+            await rendered.edit(press(bot, sent), "Главное меню", reply_markup=MENU)
+            await rendered.edit(press(bot, sent), "События", reply_markup=OTHER)
+            await rendered.edit(press(bot, sent), "События", reply_markup=OTHER)
+            await rendered.edit(press(bot, sent), "События", reply_markup=MENU)
+
+    run(scenario())
+    assert api.calls["editMessageText"] == 2
+    assert rendered.skipped == 2
+
+
+def test_unknown_message_is_compared_with_its_content(api, run):
+    rendered = RenderedMessages()
+
+    async def scenario():
+        async with Bot("1:test", base_url=api.base_url) as bot:
+            # Сообщение отправлено до перезапуска: отпечатка нет, но содержимое пришло с нажатием
+            message = await bot.send_message(42, "Главное меню", reply_markup=MENU)
+            await rendered.edit(press(bot, message), "Главное меню", reply_markup=MENU)
+            await rendered.edit(press(bot, message), "<b>Главное меню</b>", reply_markup=MENU, parse_mode="HTML")
+
+    run(scenario())
+    assert api.calls["editMessageText"] == 1
+    assert rendered.skipped == 1
+
+
+def test_not_modified_error_counts_as_skip(run):
+    rendered = RenderedMessages()
+    message = SimpleNamespace(chat_id=1, message_id=5, text="старое", reply_markup=None)
+
+    async def not_modified(*args, **kwargs):
+        raise BadRequest("Message is not modified: specified new message content is the same")
+
+    async def missing(*args, **kwargs):
+        raise BadRequest("Message to edit not found")
+
+    assert run(rendered.edit(SimpleNamespace(message=message, edit_message_text=not_modified), "новое")) is None
+    assert rendered.skipped == 1
+    with pytest.raises(BadRequest):
+        run(rendered.edit(SimpleNamespace(message=message, edit_message_text=missing), "третье"))
@@ -0,0 +1,98 @@
+import datetime
+
+import persistence
+from persistence import JournalPersistence, state_path_for
+
+
+def reopen(path, run) -> JournalPersistence:
+    journal = JournalPersistence(path)
+    run(journal.get_user_data())
+    return journal
+
+
+def test_round_trip_of_user_data_and_conversations(run, tmp_path):
+    path = str(tmp_path / "bot.state.jsonl")
+    journal = reopen(path, run)
+
+    async def write():
+        await journal.update_user_data(1, {"search_query": "торт", "since": datetime.date(2026, 10, 12)})
+        await journal.update_user_data(2, {"search_query": "врач"})
+        await journal.update_user_data(1, {"search_query": "пирог", "since": datetime.date(2026, 10, 12)})
+        await journal.drop_user_data(2)
+        await journal.update_conversation("phone", (5, 5), 100)
+        await journal.update_conversation("events", (5, 5), 300)
+        await journal.update_conversation("events", (5, 5), None)
+        await journal.flush()
+    run(write())
+
+    journal = reopen(path, run)
+    assert run(journal.get_conversations("phone")) == {(5, 5): 100}
+    assert run(journal.get_conversations("events")) == {}
+    user_data = {}
+    run(journal.refresh_user_data(1, user_data))
+    assert user_data == {"search_query": "пирог", "since": datetime.date(2026, 10, 12)}
+    dropped = {}
+    run(journal.refresh_user_data(2, dropped))
+    assert dropped == {}
+    # Значение, записанное в этом процессе до восстановления, новее журнала
+    fresh = {"search_query": "новое"}
+    journal = reopen(path, run)
+    run(journal.refresh_user_data(1, fresh))
+    assert fresh["search_query"] == "новое" and fresh["since"] == datetime.date(2026, 10, 12)
+
+
+def test_unchanged_user_data_is_not_rewritten(run, tmp_path):
+    path = str(tmp_path / "bot.state.jsonl")
+    journal = reopen(path, run)
+    run(journal.update_user_data(1, {"a": 1}))
+    run(journal.update_user_data(1, {"a": 1}))
+    run(journal.update_conversation("phone", (1, 1), 100))
+    run(journal.update_conversation("phone", (1, 1), 100))
+    run(journal.flush())
+    with open(path, encoding="utf-8") as file:
+        assert len(file.readlines()) == 2
+
+
+def test_compaction_keeps_only_latest_records(run, tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "COMPACT_MIN_LINES", 10)
+    path = str(tmp_path / "bot.state.jsonl")
+    journal = reopen(path, run)
+
+    async def write():
+        for i in range(30):
+            await journal.update_user_data(1, {"n": i})
+            await journal.update_conversation("phone", (7, 7), 100 + i % 2)
+        await journal.update_user_data(2, {"n": "второй"})
+        await journal.flush()
+    run(write())
+
+    with open(path, encoding="utf-8") as file:
+        lines = file.readlines()
+    assert len(lines) <= 10
+    assert not (tmp_path / "bot.state.jsonl.tmp").exists()
+    journal = reopen(path, run)
+    assert run(journal.get_conversations("phone")) == {(7, 7): 101}
+    first, second = {}, {}
+    run(journal.refresh_user_data(1, first))
+    run(journal.refresh_user_data(2, second))
+    assert first == {"n": 29} and second == {"n": "второй"}
+
+
+def test_torn_last_line_is_dropped(run, tmp_path):
+    path = str(tmp_path / "bot.state.jsonl")
+    journal = reopen(path, run)
+    run(journal.update_conversation("phone", (1, 1), 100))
+    run(journal.flush())
+    with open(path, "ab") as file:
+        file.write(b"c phone 2,2 10")  # сбой посреди записи
+
+    journal = reopen(path, run)
+    assert run(journal.get_conversations("phone")) == {(1, 1): 100}
+    run(journal.update_conversation("phone", (3, 3), 200))
+    run(journal.flush())
+    assert run(reopen(path, run).get_conversations("phone")) == {(1, 1): 100, (3, 3): 200}
+
+
+def test_state_path_for():
+    assert state_path_for("data/bot.db") == "data/bot.state.jsonl"
+    assert state_path_for("memory") == ""
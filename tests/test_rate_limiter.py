@@ -0,0 +1,93 @@
+import asyncio
+import datetime
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from rate_limiter import BACKGROUND, INTERACTIVE, PriorityRateLimiter
+
+
+def request(limiter, log, name, endpoint="sendMessage", chat_id=1, priority=INTERACTIVE):
+    async def callback():
+        log.append(name)
+        return name
+    return limiter.process_request(callback, (), {}, endpoint, {"chat_id": chat_id}, {"priority": priority})
+
+
+def test_retry_after_pauses_the_chat_and_retries(run):
+    limiter = PriorityRateLimiter()
+    attempts = []
+
+    async def callback():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RetryAfter(datetime.timedelta(seconds=0.3))
+        return "ok"
+
+    async def scenario():
+        await limiter.initialize()
+        result = await limiter.process_request(callback, (), {}, "sendMessage", {"chat_id": 7}, None)
+        await limiter.shutdown()
+        return result
+
+    assert run(scenario()) == "ok"
+    assert len(attempts) == 2 and attempts[1] - attempts[0] >= 0.3
+    assert limiter.retries == 1 and limiter.sent[INTERACTIVE] == 1
+
+
+def test_retry_after_gives_up_after_max_retries(run):
+    limiter = PriorityRateLimiter(max_retries=1)
+
+    async def callback():
+        raise RetryAfter(datetime.timedelta(seconds=0.01))
+
+    async def scenario():
+        await limiter.initialize()
+        try:
+            await limiter.process_request(callback, (), {}, "editMessageText", {"chat_id": 7}, None)
+        finally:
+            await limiter.shutdown()
+
+    with pytest.raises(RetryAfter):
+        run(scenario())
+    assert limiter.retries == 1
+
+
+def test_interactive_requests_overtake_queued_background(run):
+    limiter = PriorityRateLimiter(global_rate=20)
+    log = []
+
+    async def scenario():
+        await limiter.initialize()
+        # Правки не ждут токен чата: упираемся только в общий лимит
+        for i in range(20):
+            await request(limiter, log, f"warmup {i}", endpoint="editMessageText")
+        queued = [asyncio.create_task(request(limiter, log, f"bg {i}", "editMessageText", priority=BACKGROUND))
+                  for i in range(3)]
+        await asyncio.sleep(0)
+        queued += [asyncio.create_task(request(limiter, log, f"user {i}", "editMessageText"))
+                   for i in range(3)]
+        await asyncio.sleep(0)
+        assert limiter.depth == {INTERACTIVE: 3, BACKGROUND: 3}
+        await asyncio.gather(*queued)
+        await limiter.shutdown()
+
+    run(scenario())
+    assert log[20:] == ["user 0", "user 1", "user 2", "bg 0", "bg 1", "bg 2"]
+    assert limiter.sent == {INTERACTIVE: 23, BACKGROUND: 3}
+
+
+def test_unlimited_methods_pass_through(run):
+    limiter = PriorityRateLimiter(global_rate=1)
+    log = []
+
+    async def scenario():
+        await limiter.initialize()
+        for i in range(5):
+            await request(limiter, log, i, endpoint="answerCallbackQuery")
+        await limiter.shutdown()
+
+    started = time.monotonic()
+    run(scenario())
+    assert log == [0, 1, 2, 3, 4] and time.monotonic() - started < 0.5
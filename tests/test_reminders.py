@@ -0,0 +1,54 @@
+import asyncio
+import datetime
+import time
+
+from reminders import ReminderScheduler
+from storage import MemoryStorage
+
+
+class FakeBot:
+    rate_limiter = None
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+def test_reminders_due_together_are_sent_once_per_chat(run):
+    storage = MemoryStorage()
+    bot = FakeBot()
+    scheduler = ReminderScheduler(storage, bot)
+    today = datetime.date.today()
+    base = time.time() + 0.1
+    # Сегодняшние события срабатывают одновременно через 0.1 с, завтрашние — намного позже
+    scheduler.due_time = lambda date: base + (date - today).days * 3600
+
+    async def scenario():
+        await scheduler.start()
+        await storage.add_event(1, today, "Врач")
+        await storage.add_event(2, today, "Встреча")
+        await storage.add_event(1, today, "Аптека")
+        await storage.add_event(1, today + datetime.timedelta(days=1), "Завтра")
+        await asyncio.sleep(0.3)
+        await scheduler.stop()
+
+    run(scenario())
+    assert sorted(chat_id for chat_id, _ in bot.sent) == [1, 2]
+    texts = dict(bot.sent)
+    assert texts[1].count("•") == 2 and "Врач" in texts[1] and "Аптека" in texts[1]
+    assert texts[2].count("•") == 1
+    assert len(scheduler) == 1  # завтрашнее ещё ждёт
+
+
+def test_pop_due_takes_only_due_items_in_time_order():
+    scheduler = ReminderScheduler(MemoryStorage(), FakeBot())
+    today = datetime.date.today()
+    for event_id, days in ((1, 3), (2, 1), (3, 2), (4, 1)):
+        scheduler.schedule(1, event_id, (today + datetime.timedelta(days=days)).isoformat(), f"e{event_id}")
+    scheduler.schedule(1, 5, (today - datetime.timedelta(days=1)).isoformat(), "прошло")
+
+    batch = scheduler.pop_due(scheduler.due_time(today + datetime.timedelta(days=2)))
+    assert [item[1] for item in batch] == [2, 4, 3]
+    assert len(scheduler) == 1
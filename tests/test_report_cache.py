@@ -0,0 +1,56 @@
+import datetime
+
+from report_cache import ReportCache
+from storage import MemoryStorage
+
+
+def test_hit_miss_and_day_rollover():
+    cache = ReportCache()
+    today = datetime.date(2026, 10, 17)
+    cache.put(1, "phone", {"text": "отчёт"}, day=today)
+    assert cache.get(1, "phone", day=today) == {"text": "отчёт"}
+    assert cache.get(1, "phone", day=today + datetime.timedelta(days=1)) is None
+    assert cache.get(2, "phone", day=today) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_keys_within_a_view_and_invalidation():
+    cache = ReportCache()
+    cache.put(1, "events", "страница 1", key=0)
+    cache.put(1, "events", "страница 2", key=7)
+    cache.put(1, "questions", "вопросы")
+    assert cache.get(1, "events", key=7) == "страница 2"
+    cache.invalidate(1, "events")
+    assert cache.get(1, "events", key=0) is None
+    assert cache.get(1, "questions") == "вопросы"
+
+
+def test_least_recently_used_view_is_evicted():
+    cache = ReportCache(max_entries=2)
+    cache.put(1, "events", "a")
+    cache.put(2, "events", "b")
+    cache.get(1, "events")
+    cache.put(3, "events", "c")
+    assert cache.get(2, "events") is None
+    assert cache.get(1, "events") == "a"
+
+
+def test_get_or_render_renders_once_until_a_write(run):
+    cache = ReportCache()
+    storage = MemoryStorage()
+    # Как в боте: запись в хранилище сбрасывает отчёты своего вида
+    storage.add_listener(lambda chat_id, kind, record: cache.invalidate(chat_id, kind))
+    renders = []
+
+    async def render():
+        renders.append(1)
+        return f"вопросов: {len([row async for row in storage.iter_questions(1)])}"
+
+    async def scenario():
+        assert await cache.get_or_render(1, "questions", render) == "вопросов: 0"
+        assert await cache.get_or_render(1, "questions", render) == "вопросов: 0"
+        await storage.add_question(1, "Как дела?")
+        assert await cache.get_or_render(1, "questions", render) == "вопросов: 1"
+
+    run(scenario())
+    assert len(renders) == 2
@@ -0,0 +1,129 @@
+import datetime
+import itertools
+
+from retention import RetentionEngine
+from storage import DailySeries, SQLiteStorage
+
+TODAY = datetime.date(2026, 10, 15)  # четверг
+START = TODAY - datetime.timedelta(days=200)  # воскресенье
+FIRST_MONDAY = START - datetime.timedelta(days=6)  # сюда сворачивается первый день
+
+
+def day(offset: int) -> str:
+    return (START + datetime.timedelta(days=offset)).isoformat()
+
+
+def is_monday(date: str) -> bool:
+    return datetime.date.fromisoformat(date).weekday() == 0
+
+
+# ---------------------- Горизонты ----------------------
+def test_cutoffs_align_weekly_to_monday():
+    engine = RetentionEngine(None, raw_days=30, weekly_days=60, events_days=0)
+    raw_before, weekly_before, events_before = engine.cutoffs(TODAY)
+    assert raw_before == TODAY - datetime.timedelta(days=30)
+    assert weekly_before.weekday() == 0 and weekly_before <= TODAY - datetime.timedelta(days=60)
+    assert events_before is None
+    assert not RetentionEngine(None, 0, 0, 0).enabled
+
+
+# ---------------------- Такт ----------------------
+def test_tick_stays_within_rows_per_chat(storage, run):
+    engine = RetentionEngine(storage, raw_days=0, weekly_days=30, events_days=0,
+                             chats_per_tick=1, rows_per_chat=20)
+    weekly_before = engine.cutoffs(TODAY)[1]
+
+    async def scenario():
+        for chat_id in (1, 2):
+            await storage.bulk_insert(chat_id, {"phone": [(day(i), 1.0) for i in range(200)]})
+        old = await storage.phone_daily_totals(1, FIRST_MONDAY, weekly_before - datetime.timedelta(days=1))
+
+        # Один такт — один чат и не больше rows_per_chat строк
+        assert await engine.tick(TODAY) == 1
+        assert 0 < engine.compacted["phone"] <= 20
+        rows = await storage.phone_daily_totals(1, FIRST_MONDAY, weekly_before - datetime.timedelta(days=1))
+        assert len(old) - len(rows) == engine.compacted["phone"]
+        assert len(await storage.phone_daily_totals(2, START, TODAY)) == 200
+
+        # Следующие такты досворачивают историю, сумма не меняется
+        for _ in range(40):
+            await engine.tick(TODAY)
+        for chat_id in (1, 2):
+            rows = await storage.phone_daily_totals(chat_id, FIRST_MONDAY, TODAY)
+            assert sum(total for _, total in rows) == 200.0
+            assert all(is_monday(date) for date, _ in rows if date < weekly_before.isoformat())
+        done = sum(engine.compacted.values())
+        await engine.tick(TODAY)
+        await engine.tick(TODAY)
+        assert sum(engine.compacted.values()) == done
+    run(scenario())
+
+
+def test_backdated_entries_are_rolled_after_full_pass(storage, run):
+    engine = RetentionEngine(storage, raw_days=20, weekly_days=30, events_days=0, rows_per_chat=1000)
+    weekly_before = engine.cutoffs(TODAY)[1]
+
+    async def scenario():
+        await storage.bulk_insert(1, {"phone": [(day(i), 1.0) for i in range(200)],
+                                      "sweets": [(day(i), "торт") for i in range(200)]})
+        await engine.tick(TODAY)
+        assert engine.compacted["phone"] > 0
+
+        # Запись задним числом в уже свёрнутую часть тоже сворачивается
+        tuesday = next(day(i) for i in range(7) if datetime.date.fromisoformat(day(i)).weekday() == 1)
+        await storage.add_phone_usage(1, datetime.date.fromisoformat(tuesday), 2.0)
+        await storage.add_sweets_entry(1, datetime.date.fromisoformat(tuesday), "пирог")
+        await engine.tick(TODAY)
+
+        end = weekly_before - datetime.timedelta(days=1)
+        phone = await storage.phone_daily_totals(1, FIRST_MONDAY, end)
+        sweets = await storage.daily_counts(1, "sweets", FIRST_MONDAY, end)
+        assert tuesday not in dict(phone) and tuesday not in dict(sweets)
+        assert all(is_monday(date) for date, _ in phone + sweets)
+        assert sum(total for _, total in await storage.phone_daily_totals(1, FIRST_MONDAY, TODAY)) == 202.0
+        assert sum(n for _, n in await storage.daily_counts(1, "sweets", FIRST_MONDAY, TODAY)) == 201
+    run(scenario())
+
+
+# ---------------------- Отметка свёрнутой части ----------------------
+def test_daily_series_skips_rolled_prefix():
+    series = DailySeries()
+    monday = datetime.date(2026, 1, 5).toordinal()
+    for offset in range(70):
+        series.add(monday + offset, 1.0)
+    before = monday + 42
+
+    assert series.rollup_weeks(before, 14) == 12  # две недели
+    assert series.rolled == 2 and list(series.days[:2]) == [monday, monday + 7]
+    while series.rollup_weeks(before, 14):
+        pass
+    assert series.rolled == 6
+    assert series.total(monday, monday + 6) == 7.0 and series.total(monday, monday + 69) == 70.0
+
+    # Вставка в свёрнутую часть сдвигает отметку назад
+    series.add(monday + 8, 3.0)
+    assert series.rolled == 2
+    assert series.rollup_weeks(before, 14) == 1
+    assert series.rolled == 6 and series.total(monday + 7, monday + 13) == 10.0
+    assert list(series.prefix) == list(itertools.accumulate(series.totals, initial=0.0))
+
+
+def test_sqlite_watermark_follows_rollup(run, tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "bot.db"))
+    weekly_before = datetime.date(2026, 6, 1)  # понедельник
+    key = ("phone_daily", 1, None)
+
+    async def scenario():
+        await storage.open()
+        await storage.bulk_insert(1, {"phone": [(day(i), 1.0) for i in range(200)]})
+        while await storage.compact(1, None, weekly_before, None, 30):
+            pass
+        assert storage._weekly_from[key] == weekly_before.isoformat()
+
+        # Запись задним числом отодвигает отметку, следующий проход её сворачивает
+        await storage.add_phone_usage(1, datetime.date.fromisoformat(day(10)), 1.0)
+        assert storage._weekly_from[key] == day(10)
+        assert await storage.compact(1, None, weekly_before, None, 30) == {"phone": 1}
+        assert storage._weekly_from[key] == weekly_before.isoformat()
+        await storage.close()
+    run(scenario())
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+
+from router import CallbackRouter, parse_callback
+
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+def press(data):
+    return SimpleNamespace(callback_query=SimpleNamespace(data=data, message=FakeMessage()),
+                           effective_chat=SimpleNamespace(id=1))
+
+
+def test_parse_callback():
+    assert parse_callback("menu:events") == ("menu", "events", "")
+    assert parse_callback("sched:view:Понедельник") == ("sched", "view", "Понедельник")
+    assert parse_callback("search:page:10:extra") == ("search", "page", "10:extra")
+    assert parse_callback("") == ("", "", "")
+
+
+def test_dispatch_by_namespace_and_action(run):
+    router = CallbackRouter()
+    calls = []
+
+    async def view(update, context):
+        calls.append(update.callback_query.data)
+        return "done"
+
+    router.route("events", "view", view)
+    assert run(router.dispatch(press("events:view:42"), None)) == "done"
+    assert calls == ["events:view:42"]
+    with pytest.raises(ValueError):
+        router.route("events", "view", view)
+
+
+def test_unroutable_press_is_counted_and_answered(run):
+    router = CallbackRouter()
+    update = press("old:button")
+    assert run(router.dispatch(update, None)) is None
+    assert router.unroutable == 1
+    assert update.callback_query.message.replies
+
+
+def test_wrap_routes_and_matcher(run):
+    router = CallbackRouter()
+    wrapped = []
+
+    async def view(update, context):
+        return "view"
+
+    def wrap(callback):
+        async def wrapper(update, context):
+            wrapped.append(callback.__name__)
+            return await callback(update, context)
+        return wrapper
+
+    router.route("ques", "view", view)
+    router.wrap_routes(wrap)
+    assert run(router.dispatch(press("ques:view:"), None)) == "view"
+    assert wrapped == ["view"]
+
+    match = CallbackRouter.matcher("events", "add", "input")
+    assert match("events:add") and match("events:input:1")
+    assert not match("events:view") and not match(None)
@@ -0,0 +1,35 @@
+import pytest
+
+from search_index import ChatIndex, stem, terms
+
+
+@pytest.mark.parametrize("forms", [
+    ("торт", "торта", "тортами", "торту"),
+    ("шоколадка", "шоколадки", "шоколадкой"),
+    ("встреча", "встречи", "встречу"),
+    ("врач", "врача", "врачом"),
+])
+def test_word_forms_share_a_stem(forms):
+    assert len({stem(form) for form in forms}) == 1
+
+
+def test_short_words_are_kept():
+    assert stem("еда") == "еда"
+    assert stem("чай") == "чай"
+
+
+def test_terms_normalize_case_and_yo():
+    assert terms("Ёлки, ЁЛКИ и елки!") == {stem("елки"), "и"}
+
+
+def test_chat_index_search_and_schedule_overwrite():
+    index = ChatIndex()
+    index.add(("sweets", "2026-10-12", "шоколадный торт"))
+    index.add(("events", "2026-10-20", "Купить торт к празднику"))
+    index.add(("schedule", "Понедельник", "Зарядка"))
+    index.add(("schedule", "Понедельник", "Бассейн"))
+
+    assert [index.docs[i][1] for i in index.search(terms("торты"))] == ["2026-10-20", "2026-10-12"]
+    assert index.search(terms("торт праздник")) == index.search(terms("праздника"))
+    assert index.search(terms("зарядка")) == []
+    assert [index.docs[i][2] for i in index.search(terms("бассейн"))] == ["Бассейн"]
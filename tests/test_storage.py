@@ -0,0 +1,209 @@
+import asyncio
+import datetime
+import sqlite3
+
+from storage import SQLiteStorage
+
+DAY = datetime.date(2026, 10, 12)  # понедельник
+
+
+def day(offset: int) -> datetime.date:
+    return DAY + datetime.timedelta(days=offset)
+
+
+async def collect(rows) -> list:
+    return [row async for row in rows]
+
+
+# ---------------------- Разделы чатов ----------------------
+def test_chats_are_isolated(storage, run):
+    async def scenario():
+        await storage.set_schedule(1, "Понедельник", "Зарядка")
+        await storage.add_event(1, DAY, "Врач")
+        await storage.add_question(1, "Как дела?")
+        await storage.add_phone_usage(1, DAY, 2.0)
+        await storage.add_sweets_entry(1, DAY, "торт")
+        await storage.add_bad_word(1, DAY, "блин")
+
+        assert await storage.get_schedule(1, "Понедельник") == "Зарядка"
+        assert await storage.get_schedule(2, "Понедельник") is None
+        assert await collect(storage.iter_events(2)) == []
+        assert await collect(storage.iter_questions(2)) == []
+        assert await storage.phone_total(2, DAY, DAY) == 0
+        assert await storage.list_sweets_entries(2, DAY, DAY) == []
+        assert await storage.list_bad_words(2, DAY, DAY) == []
+        assert [row[1:] for row in await collect(storage.iter_events(1))] == [("2026-10-12", "Врач")]
+        assert await storage.chats_after(-1, 10) == [1]
+    run(scenario())
+
+
+# ---------------------- Телефон ----------------------
+def test_backdated_phone_usage_keeps_totals(storage, run):
+    async def scenario():
+        await storage.add_phone_usage(1, day(10), 1.0)
+        await storage.add_phone_usage(1, day(2), 2.0)   # задним числом, в начало
+        await storage.add_phone_usage(1, day(6), 3.0)   # задним числом, в середину
+        await storage.add_phone_usage(1, day(6), 0.5)   # тот же день
+        await storage.add_phone_usage(1, day(10), 4.0)
+
+        assert await storage.phone_daily_totals(1, day(0), day(20)) == [
+            ("2026-10-14", 2.0), ("2026-10-18", 3.5), ("2026-10-22", 5.0)]
+        assert await storage.phone_daily_totals(1, day(3), day(9)) == [("2026-10-18", 3.5)]
+        assert await storage.phone_total(1, day(0), day(20)) == 10.5
+        assert await storage.phone_total(1, day(2), day(6)) == 5.5
+        assert await storage.phone_total(1, day(6), day(10)) == 8.5
+        assert await storage.phone_total(1, day(11), day(20)) == 0
+    run(scenario())
+
+
+# ---------------------- Сладкое и плохие слова ----------------------
+def test_dated_logs_return_inclusive_windows(storage, run):
+    async def scenario():
+        await storage.add_sweets_entry(1, day(5), "торт")
+        await storage.add_sweets_entry(1, day(1), "конфета")
+        await storage.add_sweets_entry(1, day(3), "пирог")
+        await storage.add_sweets_entry(1, day(3), "торт")
+        await storage.add_bad_word(1, day(0), "блин")
+        await storage.add_bad_word(1, day(7), "ёлки")
+
+        assert await storage.list_sweets_entries(1, day(1), day(3)) == [
+            ("2026-10-13", "конфета"), ("2026-10-15", "пирог"), ("2026-10-15", "торт")]
+        assert await storage.list_sweets_entries(1, day(4), day(4)) == []
+        assert await storage.list_bad_words(1, day(0), day(6)) == [("2026-10-12", "блин")]
+        assert await storage.daily_counts(1, "sweets", day(0), day(10)) == [
+            ("2026-10-13", 1), ("2026-10-15", 2), ("2026-10-17", 1)]
+        assert await storage.daily_counts(1, "badwords", day(1), day(10)) == [("2026-10-19", 1)]
+    run(scenario())
+
+
+# ---------------------- Курсоры ----------------------
+def test_event_and_question_cursors(storage, run):
+    async def scenario():
+        events = [await storage.add_event(1, day(i), f"событие {i}") for i in range(5)]
+        await storage.add_event(2, DAY, "чужое")
+        for i in range(5):
+            await storage.add_question(1, f"вопрос {i}")
+
+        rows = await collect(storage.iter_events(1))
+        assert [row[0] for row in rows] == events
+        assert [row[2] for row in await collect(storage.iter_events(1, events[2]))] == [
+            "событие 2", "событие 3", "событие 4"]
+        assert [row[2] for row in await collect(storage.iter_events(1, events[2], reverse=True))] == [
+            "событие 1", "событие 0"]
+
+        questions = await collect(storage.iter_questions(1))
+        assert [text for _, text in questions] == [f"вопрос {i}" for i in range(5)]
+        cursor = questions[3][0]
+        assert [text for _, text in await collect(storage.iter_questions(1, cursor))] == ["вопрос 3", "вопрос 4"]
+        assert [text for _, text in await collect(storage.iter_questions(1, cursor, reverse=True))] == [
+            "вопрос 2", "вопрос 1", "вопрос 0"]
+
+        upcoming = await storage.list_upcoming_events(day(3))
+        assert sorted((chat_id, date) for chat_id, _, date, _ in upcoming) == [
+            (1, "2026-10-15"), (1, "2026-10-16")]
+    run(scenario())
+
+
+# ---------------------- Массовая запись и выгрузка ----------------------
+BATCH = {
+    "schedule": [("Вторник", "Бассейн"), ("2026-10-20", "Врач")],
+    "events": [("2026-10-14", "Встреча")],
+    "questions": [("Что купить?",)],
+    "phone": [("2026-10-13", 1.5), ("2026-10-12", 2.0), ("2026-10-13", 0.5)],
+    "sweets": [("2026-10-13", "торт"), ("2026-10-12", "конфета")],
+    "badwords": [("2026-10-12", "блин")],
+}
+
+
+def test_bulk_insert_and_export(storage, run):
+    seen = []
+    storage.add_listener(lambda chat_id, kind, record: seen.append((chat_id, kind)))
+
+    async def scenario():
+        counts = await storage.bulk_insert(1, BATCH)
+        assert counts == {kind: len(rows) for kind, rows in BATCH.items()}
+        assert sorted(seen) == sorted((1, kind) for kind, rows in BATCH.items() for _ in rows)
+
+        assert await storage.get_schedule(1, "Вторник") == "Бассейн"
+        assert await storage.phone_total(1, day(0), day(1)) == 4.0
+        assert await storage.list_sweets_entries(1, day(0), day(1)) == [
+            ("2026-10-12", "конфета"), ("2026-10-13", "торт")]
+
+        exported = {kind: await collect(storage.export_rows(1, kind)) for kind in BATCH}
+        assert sorted(exported["schedule"]) == sorted(BATCH["schedule"])
+        assert exported["events"] == BATCH["events"]
+        assert exported["questions"] == BATCH["questions"]
+        assert exported["phone"] == [("2026-10-12", 2.0), ("2026-10-13", 2.0)]
+        assert exported["sweets"] == [("2026-10-12", "конфета"), ("2026-10-13", "торт")]
+        assert exported["badwords"] == BATCH["badwords"]
+        assert await collect(storage.export_rows(2, "events")) == []
+    run(scenario())
+
+
+# ---------------------- Сжатие истории ----------------------
+def test_compact_rolls_up_and_archives(storage, run):
+    changes = []
+    storage.add_listener(lambda chat_id, kind, record: changes.append((kind, record)))
+    start = DAY - datetime.timedelta(weeks=20)
+
+    async def scenario():
+        await storage.bulk_insert(1, {
+            "phone": [((start + datetime.timedelta(days=i)).isoformat(), 1.0) for i in range(140)],
+            "sweets": [((start + datetime.timedelta(days=i)).isoformat(), "торт") for i in range(140)
+                       for _ in range(i % 3)],
+            "events": [("2026-01-01", "Старое"), ("2026-12-01", "Будущее")],
+        })
+        changes.clear()
+        counts_before = await storage.daily_counts(1, "sweets", start, DAY)
+        raw_before, weekly_before = DAY - datetime.timedelta(weeks=4), DAY - datetime.timedelta(weeks=8)
+
+        # Первый вызов ограничен max_rows, остальное — следующими вызовами
+        first = await storage.compact(1, raw_before, weekly_before, day(0), 10)
+        assert 0 < first["phone"] <= 10
+        while await storage.compact(1, raw_before, weekly_before, day(0), 10):
+            pass
+        assert ("events", None) in changes and ("sweets", None) in changes
+
+        # Сырые записи раньше raw_before остались только числами по дням
+        assert await storage.list_sweets_entries(1, start, raw_before - datetime.timedelta(days=1)) == []
+        counts_after = await storage.daily_counts(1, "sweets", start, DAY)
+        assert sum(n for _, n in counts_after) == sum(n for _, n in counts_before)
+        recent = raw_before.isoformat()
+        assert [row for row in counts_after if row[0] >= recent] == [
+            row for row in counts_before if row[0] >= recent]
+
+        # Раньше weekly_before — только суммы на понедельник
+        phone = await storage.phone_daily_totals(1, start, DAY)
+        assert sum(total for _, total in phone) == 140.0
+        old = [date for date, _ in phone if date < weekly_before.isoformat()]
+        assert old and all(datetime.date.fromisoformat(date).weekday() == 0 for date in old)
+        assert (old[0], 7.0) in phone
+
+        # Прошедшее событие ушло в архив, но выгружается
+        assert [row[2] for row in await collect(storage.iter_events(1))] == ["Будущее"]
+        assert await collect(storage.export_rows(1, "events")) == [
+            ("2026-01-01", "Старое"), ("2026-12-01", "Будущее")]
+
+        # Повторный вызов ничего не меняет
+        assert await storage.compact(1, raw_before, weekly_before, day(0), 10) == {}
+    run(scenario())
+
+
+# ---------------------- Фиксация транзакций SQLite ----------------------
+def test_failed_background_flush_is_logged(run, tmp_path, caplog):
+    storage = SQLiteStorage(str(tmp_path / "bot.db"), flush_interval=0.01)
+
+    def fail():
+        raise sqlite3.OperationalError("disk I/O error")
+
+    async def scenario():
+        await storage.open()
+        await storage.add_question(1, "Как дела?")
+        commit, storage._commit = storage._commit, fail
+        await asyncio.sleep(0.1)
+        storage._commit = commit
+        await storage.close()
+
+    run(scenario())
+    assert "Не удалось зафиксировать транзакцию" in caplog.text
+    assert "disk I/O error" in caplog.text
@@ -0,0 +1,108 @@
+import datetime
+
+import pytest
+
+import transfer
+from transfer import FORMATS, KINDS, RowError, detect_format, export_to_file, import_file, parse_record
+
+
+@pytest.mark.parametrize("record, expected", [
+    ({"kind": "phone", "date": "2026-10-12", "value": "3.5"}, ("phone", ("2026-10-12", 3.5))),
+    ({"kind": "phone", "date": "2026-10-12", "value": 2}, ("phone", ("2026-10-12", 2.0))),
+    ({"kind": "sweets", "date": " 2026-10-12 ", "text": " торт "}, ("sweets", ("2026-10-12", "торт"))),
+    ({"kind": "badwords", "date": "2026-10-12", "text": "блин"}, ("badwords", ("2026-10-12", "блин"))),
+    ({"kind": "events", "date": "2026-10-20", "text": "Врач"}, ("events", ("2026-10-20", "Врач"))),
+    ({"kind": "schedule", "date": "Понедельник", "text": "Зарядка, работа"},
+     ("schedule", ("Понедельник", "Зарядка, работа"))),
+    ({"kind": "schedule", "date": "2026-10-20", "text": "Врач"}, ("schedule", ("2026-10-20", "Врач"))),
+    ({"kind": "questions", "date": "", "text": "Как дела?", "value": ""}, ("questions", ("Как дела?",))),
+])
+def test_parse_record(record, expected):
+    assert parse_record(record) == expected
+
+
+@pytest.mark.parametrize("record", [
+    {"kind": "phone", "date": "2026-10-12", "value": "много"},
+    {"kind": "phone", "date": "2026-10-12", "value": "nan"},
+    {"kind": "phone", "date": "2026-10-12"},
+    {"kind": "phone", "date": "12.10.2026", "value": "1"},
+    {"kind": "sweets", "date": "2026-10-12", "text": ""},
+    {"kind": "schedule", "date": "Someday", "text": "Зарядка"},
+    {"kind": "questions", "text": "  "},
+    {"kind": "unknown", "date": "2026-10-12", "text": "x"},
+    {},
+])
+def test_parse_record_rejects_bad_rows(record):
+    with pytest.raises(RowError):
+        parse_record(record)
+
+
+def test_detect_format():
+    assert detect_format("data.CSV", b"{") == "csv"
+    assert detect_format("data.ndjson", b"kind") == "jsonl"
+    assert detect_format("", b'  {"kind": "phone"}') == "jsonl"
+    assert detect_format(None, b"kind,date,text,value") == "csv"
+
+
+# ---------------------- Выгрузка и загрузка ----------------------
+SAMPLE = {
+    "schedule": [("Понедельник", "Зарядка, работа"), ("2026-10-20", "Врач")],
+    "events": [("2026-10-14", "Встреча"), ("2026-10-14", "Встреча"), ("2026-11-01", "Отпуск")],
+    "questions": [("Как дела?",), ("Что купить?",)],
+    "phone": [("2026-10-12", 1.5), ("2026-10-12", 2.0), ("2026-10-13", 0.25)],
+    "sweets": [("2026-10-12", "торт"), ("2026-10-12", "торт"), ("2026-10-13", "конфета")],
+    "badwords": [("2026-10-12", "блин")],
+}
+
+
+async def snapshot(storage, chat_id) -> dict:
+    return {kind: sorted([row async for row in storage.export_rows(chat_id, kind)]) for kind in KINDS}
+
+
+async def round_trip(storage, source, target, fmt, tmp_path) -> tuple:
+    path = tmp_path / f"export.{fmt}"
+    with open(path, "wb") as file:
+        await export_to_file(storage, source, KINDS, fmt, file)
+    return await import_file(storage, target, str(path), fmt)
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_reimporting_own_export_changes_nothing(storage, run, tmp_path, monkeypatch, fmt):
+    monkeypatch.setattr(transfer, "CHUNK_ROWS", 2)  # сверка через границы порций
+
+    async def scenario():
+        await storage.bulk_insert(1, SAMPLE)
+        before = await snapshot(storage, 1)
+        totals, reader, skipped = await round_trip(storage, 1, 1, fmt, tmp_path)
+        assert reader.errors == 0
+        # Только расписание перезаписывается (с тем же текстом), остальное пропущено
+        assert totals == dict(dict.fromkeys(KINDS, 0), schedule=2)
+        assert skipped == sum(len(rows) for kind, rows in SAMPLE.items() if kind != "schedule") - 1
+        assert await snapshot(storage, 1) == before
+        assert await storage.phone_total(1, datetime.date(2026, 10, 12), datetime.date(2026, 10, 13)) == 3.75
+
+    run(scenario())
+
+
+def test_import_into_another_chat_copies_everything(storage, run, tmp_path, monkeypatch):
+    monkeypatch.setattr(transfer, "CHUNK_ROWS", 2)
+
+    async def scenario():
+        await storage.bulk_insert(1, SAMPLE)
+        _, _, skipped = await round_trip(storage, 1, 2, "csv", tmp_path)
+        assert skipped == 0
+        assert await snapshot(storage, 2) == await snapshot(storage, 1)
+
+    run(scenario())
+
+
+def test_import_adds_only_what_is_missing(storage, run, tmp_path):
+    async def scenario():
+        await storage.bulk_insert(1, SAMPLE)
+        await storage.bulk_insert(2, {"phone": [("2026-10-12", 1.0)], "sweets": [("2026-10-12", "торт")],
+                                      "events": [("2026-10-14", "Встреча")]})
+        totals, _, _ = await round_trip(storage, 1, 2, "jsonl", tmp_path)
+        assert totals["sweets"] == 2 and totals["events"] == 2
+        assert await snapshot(storage, 2) == await snapshot(storage, 1)
+
+    run(scenario())
@@ -0,0 +1,88 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from telegram import Update
+
+from update_processor import ChatOrderedUpdateProcessor
+from webhook import SECRET_HEADER, WebhookServer
+
+SECRET = "s3cret"
+
+
+def message_update(update_id: int, chat_id: int, text: str = "/start") -> dict:
+    return {"update_id": update_id,
+            "message": {"message_id": update_id, "date": 0, "text": text,
+                        "chat": {"id": chat_id, "type": "private"}}}
+
+
+async def post(port: int, body: bytes, headers: dict = None, method: str = "POST", path: str = "/telegram") -> int:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    head = {"Content-Length": str(len(body)), "Connection": "close", **(headers or {})}
+    lines = [f"{method} {path} HTTP/1.1"] + [f"{name}: {value}" for name, value in head.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    writer.close()
+    return status
+
+
+# ---------------------- Вебхук ----------------------
+@pytest.fixture
+def webhook(run):
+    application = SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+    server = WebhookServer(application, "/telegram", SECRET)
+    run(server.start("127.0.0.1", 0))
+    yield server
+    run(server.stop())
+
+
+def test_posted_update_is_queued(webhook, run):
+    body = json.dumps(message_update(1, 42)).encode()
+    assert run(post(webhook.http.port, body, {SECRET_HEADER: SECRET})) == 200
+    update = webhook.application.update_queue.get_nowait()
+    assert update.update_id == 1 and update.effective_chat.id == 42
+
+
+@pytest.mark.parametrize("headers, body, method, path, status", [
+    ({SECRET_HEADER: "wrong"}, b"{}", "POST", "/telegram", 403),
+    ({}, b"{}", "POST", "/telegram", 403),
+    ({SECRET_HEADER: SECRET}, b"not json", "POST", "/telegram", 400),
+    ({SECRET_HEADER: SECRET}, b"", "GET", "/telegram", 405),
+    ({SECRET_HEADER: SECRET}, b"{}", "POST", "/other", 404),
+    ({SECRET_HEADER: SECRET, "Content-Length": "-1"}, b"", "POST", "/telegram", 400),
+    ({SECRET_HEADER: SECRET, "Content-Length": "x"}, b"", "POST", "/telegram", 400),
+])
+def test_rejected_requests(webhook, run, headers, body, method, path, status):
+    assert run(post(webhook.http.port, body, headers, method, path)) == status
+    assert webhook.application.update_queue.empty()
+
+
+# ---------------------- Порядок обработки ----------------------
+def test_updates_of_one_chat_run_in_order_and_chats_run_concurrently(run):
+    processor = ChatOrderedUpdateProcessor(8)
+    log = []
+    running = {"now": 0, "max": 0}
+
+    async def handle(chat_id, number, delay):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(delay)
+        log.append((chat_id, number))
+        running["now"] -= 1
+
+    async def scenario():
+        tasks = []
+        for number in range(4):
+            for chat_id, delay in ((1, 0.02 - number * 0.005), (2, 0.001)):
+                update = Update.de_json(message_update(number, chat_id), None)
+                tasks.append(asyncio.create_task(
+                    processor.process_update(update, handle(chat_id, number, delay))))
+        await asyncio.gather(*tasks)
+
+    run(scenario())
+    for chat_id in (1, 2):
+        assert [number for chat, number in log if chat == chat_id] == [0, 1, 2, 3]
+    assert running["max"] == 2  # по одному обновлению каждого чата одновременно
+    assert processor._chat_locks == {}
@@ -0,0 +1,242 @@
+"""Импорт и выгрузка данных трекеров файлами CSV и JSON Lines.
+
+Одна схема для всех видов данных и обоих форматов:
+
+    kind,date,text,value
+    phone,2026-10-12,,3.5
+    sweets,2026-10-12,шоколадка,
+    schedule,Понедельник,"Зарядка, работа",
+    questions,,Как дела?,
+
+В JSON Lines — объект на строку с теми же полями: {"kind": "phone", "date": "2026-10-12",
+"value": 3.5}. Для schedule в date — день недели или дата YYYY-MM-DD.
+Файлы читаются и пишутся построчно, в хранилище уходят пачками по CHUNK_ROWS строк,
+поэтому файл целиком в память не загружается.
+
+Импорт не дублирует данные: строки, которые уже есть в чате, пропускаются (ImportMerge),
+так что повторная загрузка собственной выгрузки ничего не меняет.
+"""
+import asyncio
+import csv
+import datetime
+import io
+import json
+import math
+
+KINDS = ("schedule", "events", "questions", "phone", "sweets", "badwords")
+FORMATS = ("csv", "jsonl")
+FIELDS = ("kind", "date", "text", "value")
+WEEKDAYS = frozenset(("Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"))
+
+CHUNK_ROWS = 5000
+MAX_ERRORS_SHOWN = 5
+
+
+class RowError(ValueError):
+    pass
+
+
+# ---------------------- Разбор строки ----------------------
+def parse_date(value: str) -> str:
+    try:
+        return datetime.date.fromisoformat(value.strip()).isoformat()
+    except ValueError:
+        raise RowError(f"неверная дата {value!r}")
+
+
+def parse_record(record: dict) -> tuple:
+    """Проверяет запись {kind, date, text, value} и возвращает (вид, строка для bulk_insert)."""
+    kind = (record.get("kind") or "").strip()
+    date = str(record.get("date") or "").strip()
+    text = str(record.get("text") or "").strip()
+    if kind == "schedule":
+        day = date if date in WEEKDAYS else parse_date(date)
+        if not text:
+            raise RowError("пустое расписание")
+        return kind, (day, text)
+    if kind == "questions":
+        if not text:
+            raise RowError("пустой вопрос")
+        return kind, (text,)
+    if kind == "phone":
+        try:
+            hours = float(record.get("value"))
+        except (TypeError, ValueError):
+            raise RowError(f"неверное число часов {record.get('value')!r}")
+        if not math.isfinite(hours):
+            raise RowError(f"неверное число часов {record.get('value')!r}")
+        return kind, (parse_date(date), hours)
+    if kind in ("events", "sweets", "badwords"):
+        if not text:
+            raise RowError("пустой текст")
+        return kind, (parse_date(date), text)
+    raise RowError(f"неизвестный вид {kind!r}")
+
+
+def detect_format(file_name: str, head: bytes) -> str:
+    name = (file_name or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    return "jsonl" if head.lstrip().startswith(b"{") else "csv"
+
+
+# ---------------------- Импорт ----------------------
+class ImportReader:
+    """Читает загруженный файл порциями: next_chunk() возвращает {вид: [строки]}
+    не более чем на CHUNK_ROWS строк или None в конце файла. Вызывается в потоке."""
+
+    def __init__(self, path: str, fmt: str):
+        self._file = open(path, "r", encoding="utf-8-sig", newline="")
+        self._records = self._csv_records() if fmt == "csv" else self._jsonl_records()
+        self.line = 0
+        self.errors = 0
+        self.error_samples = []
+
+    def _csv_records(self):
+        reader = csv.DictReader(self._file)
+        for record in reader:
+            self.line = reader.line_num
+            yield record
+
+    def _jsonl_records(self):
+        for self.line, text in enumerate(self._file, 1):
+            if not text.strip():
+                continue
+            try:
+                yield json.loads(text)
+            except ValueError as exc:
+                yield RowError(f"неверный JSON ({exc.msg})")
+
+    def _error(self, exc: Exception) -> None:
+        self.errors += 1
+        if len(self.error_samples) < MAX_ERRORS_SHOWN:
+            self.error_samples.append(f"строка {self.line}: {exc}")
+
+    def next_chunk(self):
+        batch = {}
+        rows = 0
+        for record in self._records:
+            try:
+                if isinstance(record, RowError):
+                    raise record
+                if not isinstance(record, dict):
+                    raise RowError("ожидается объект")
+                kind, row = parse_record(record)
+            except RowError as exc:
+                self._error(exc)
+                continue
+            batch.setdefault(kind, []).append(row)
+            rows += 1
+            if rows >= CHUNK_ROWS:
+                break
+        return batch or None
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ImportMerge:
+    """Отбирает из порций импорта строки, которых ещё нет в чате.
+
+    Одинаковые строки считаются поштучно: n-я копия из файла записывается, только если
+    до импорта в чате было меньше n таких строк. Часы телефона — суммы по дням (так их
+    выдаёт выгрузка): за день дописывается только то, что сверх уже записанного.
+    Расписание не сверяется — запись дня и так заменяет прежнюю. Для каждой различной
+    строки файла держится пара чисел (по хэшу строки), сами строки не хранятся."""
+
+    def __init__(self, storage, chat_id: int):
+        self.storage = storage
+        self.chat_id = chat_id
+        self._before = {}  # хэш (вид, ключ) -> сколько было в чате до импорта
+        self._seen = {}    # хэш (вид, ключ) -> сколько встретилось в файле
+        self.skipped = 0
+
+    async def filter(self, batch: dict) -> dict:
+        result = {}
+        for kind, rows in batch.items():
+            if kind == "schedule":
+                result[kind] = rows
+                continue
+            phone = kind == "phone"
+            keys = [row[0] if phone else row for row in rows]
+            new = list(dict.fromkeys(key for key in keys if hash((kind, key)) not in self._before))
+            if new:
+                existing = await self.storage.existing_counts(self.chat_id, kind, new)
+                for key in new:
+                    self._before[hash((kind, key))] = existing.get(key, 0)
+            kept = []
+            for key, row in zip(keys, rows):
+                slot = hash((kind, key))
+                seen = self._seen.get(slot, 0)
+                self._seen[slot] = seen + (row[1] if phone else 1)
+                if phone:
+                    # Часть суммы файла за день сверх того, что было в чате
+                    extra = self._seen[slot] - max(seen, self._before[slot])
+                    if extra > 1e-9:
+                        kept.append((key, extra))
+                        continue
+                elif seen >= self._before[slot]:
+                    kept.append(row)
+                    continue
+                self.skipped += 1
+            if kept:
+                result[kind] = kept
+        return result
+
+
+async def import_file(storage, chat_id: int, path: str, fmt: str) -> tuple:
+    """Загружает файл в хранилище без дублей; возвращает ({вид: число записанных строк},
+    ImportReader с ошибками, число пропущенных уже имеющихся строк)."""
+    reader = ImportReader(path, fmt)
+    merge = ImportMerge(storage, chat_id)
+    totals = dict.fromkeys(KINDS, 0)
+    try:
+        while True:
+            try:
+                batch = await asyncio.to_thread(reader.next_chunk)
+            except (UnicodeDecodeError, csv.Error) as exc:
+                reader._error(RowError(f"файл не читается ({exc})"))
+                break
+            if batch is None:
+                break
+            batch = await merge.filter(batch)
+            if batch:
+                for kind, count in (await storage.bulk_insert(chat_id, batch)).items():
+                    totals[kind] += count
+    finally:
+        reader.close()
+    return totals, reader, merge.skipped
+
+
+# ---------------------- Выгрузка ----------------------
+def to_record(kind: str, row: tuple) -> dict:
+    if kind == "questions":
+        return {"kind": kind, "date": "", "text": row[0], "value": ""}
+    if kind == "phone":
+        return {"kind": kind, "date": row[0], "text": "", "value": row[1]}
+    return {"kind": kind, "date": row[0], "text": row[1], "value": ""}
+
+
+async def export_to_file(storage, chat_id: int, kinds, fmt: str, target) -> int:
+    """Пишет данные в открытый двоичный файл target построчно; возвращает число строк."""
+    text = io.TextIOWrapper(target, encoding="utf-8", newline="", write_through=False)
+    count = 0
+    try:
+        if fmt == "csv":
+            writer = csv.DictWriter(text, FIELDS)
+            writer.writeheader()
+            write = writer.writerow
+        else:
+            def write(record):
+                text.write(json.dumps({key: value for key, value in record.items() if value != ""},
+                                      ensure_ascii=False) + "\n")
+        for kind in kinds:
+            async for row in storage.export_rows(chat_id, kind):
+                write(to_record(kind, row))
+                count += 1
+        text.flush()
+    finally:
+        text.detach()  # сам файл закрывает вызывающий
+    return count
@@ -0,0 +1,43 @@
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+# ---------------------- Параллельная обработка обновлений ----------------------
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Обрабатывает до max_concurrent_updates обновлений одновременно, сохраняя
+    порядок внутри одного чата: обновления чата проходят через его замок (FIFO).
+
+    Замок чата берётся раньше общего семафора, поэтому очередь одного
+    "шумного" чата не занимает слоты, нужные остальным."""
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._chat_locks = {}  # chat_id -> [asyncio.Lock, число ожидающих]
+
+    async def process_update(self, update, coroutine) -> None:
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            await super().process_update(update, coroutine)
+            return
+        entry = self._chat_locks.get(chat.id)
+        if entry is None:
+            entry = self._chat_locks[chat.id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await super().process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[chat.id]
+
+    async def do_process_update(self, update, coroutine) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
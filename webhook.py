@@ -0,0 +1,98 @@
+"""Запуск бота в режиме вебхука на встроенном HTTP-сервере.
+
+Локальная проверка без Telegram: запустите бота с --mode webhook без --webhook-url
+и отправьте записанное обновление, например
+
+    curl -X POST -H "X-Telegram-Bot-Api-Secret-Token: $BOT_WEBHOOK_SECRET" \\
+         --data @update.json http://127.0.0.1:8443/telegram
+"""
+import asyncio
+import hmac
+import json
+import logging
+import signal
+
+from telegram import Update
+
+from httpd import HTTPServer, Response
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+
+class WebhookServer:
+    """Принимает обновления по HTTP POST и кладёт их в очередь приложения."""
+
+    def __init__(self, application, path: str, secret: str = ""):
+        self.application = application
+        self.bot = application.bot
+        self.path = path
+        self.secret = secret
+        self.http = HTTPServer(self.handle)
+
+    async def handle(self, request) -> Response:
+        if request.path != self.path:
+            return Response(404)
+        if request.method != "POST":
+            return Response(405)
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            logger.warning("Отклонён запрос вебхука с неверным секретом")
+            return Response(403)
+        try:
+            data = json.loads(request.body)
+            update = Update.de_json(data, self.bot)
+        except (ValueError, TypeError, KeyError):
+            logger.warning("Не удалось разобрать обновление из вебхука")
+            return Response(400)
+        await self.deliver(update, data)
+        return Response(200)
+
+    async def deliver(self, update: Update, data: dict) -> None:
+        await self.application.update_queue.put(update)
+
+    async def start(self, host: str, port: int) -> None:
+        await self.http.start(host, port)
+
+    async def stop(self) -> None:
+        await self.http.stop()
+
+
+async def serve_webhook(application, config) -> None:
+    """Аналог Application.run_webhook: initialize → post_init → сервер → start,
+    ожидание SIGINT/SIGTERM и корректная остановка в обратном порядке."""
+    if not config.webhook_secret:
+        logger.warning("Секрет вебхука не задан: запросы принимаются без проверки")
+    server = WebhookServer(application, config.webhook_path, config.webhook_secret)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    try:
+        await server.start(config.webhook_listen, config.webhook_port)
+        if config.webhook_url:
+            await application.bot.set_webhook(
+                url=config.webhook_url,
+                secret_token=config.webhook_secret or None,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=max(1, min(config.concurrency, 100)),
+            )
+        await application.start()
+        await stop.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def run_webhook(application, config) -> None:
+    asyncio.run(serve_webhook(application, config))